@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import time
+from telethon.errors import FloodWaitError
+
+backfill_logger = logging.getLogger(__name__)
+
+DEFAULT_BACKFILL_CONCURRENCY = 4
+# Upper bound on messages fetched per source, so a long outage cannot flood the target.
+DEFAULT_BACKFILL_MAX_MESSAGES = 1000
+
+
+class Backfiller:
+    """
+    Catches up on messages posted while the bot was down. For every source with a
+    high-water mark (the last message id the outbox recorded for it), the messages
+    after that id are fetched oldest-first with `iter_messages(min_id=...)` and passed
+    to `deliver(message)`, with up to `concurrency` sources fetched at once.
+    Live messages from a source that is still catching up are held back with `hold()`
+    and delivered right after its backfill, so each source stays in id order.
+    """
+
+    def __init__(
+        self,
+        client,
+        watermarks,
+        deliver,
+        concurrency=DEFAULT_BACKFILL_CONCURRENCY,
+        max_messages=DEFAULT_BACKFILL_MAX_MESSAGES,
+        max_flood_wait=300,
+    ):
+        self.client = client
+        self.watermarks = dict(watermarks)
+        self.deliver = deliver
+        self.concurrency = max(1, concurrency)
+        self.max_messages = max_messages
+        self.max_flood_wait = max_flood_wait
+        # Live messages held back per source that is still backfilling.
+        self._held = {chat_id: [] for chat_id in self.watermarks}
+        self.stats = {"sources": 0, "messages": 0, "held": 0, "seconds": 0.0}
+
+    def hold(self, chat_id, message):
+        """Holds a live message back if its source is still backfilling; returns True if held."""
+        held = self._held.get(chat_id)
+        if held is None:
+            return False
+        held.append(message)
+        self.stats["held"] += 1
+        return True
+
+    async def run(self):
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def backfill_with_limit(chat_id, watermark):
+            async with semaphore:
+                await self._backfill_source(chat_id, watermark)
+
+        await asyncio.gather(
+            *(
+                backfill_with_limit(chat_id, watermark)
+                for chat_id, watermark in self.watermarks.items()
+            )
+        )
+        self.stats["seconds"] = time.perf_counter() - started
+        backfill_logger.info(f"Backfill finished: {self.stats_summary()}")
+
+    async def _backfill_source(self, chat_id, watermark):
+        last_id = watermark
+        fetched = 0
+        try:
+            while fetched < self.max_messages:
+                try:
+                    async for message in self.client.iter_messages(
+                        chat_id,
+                        min_id=last_id,
+                        reverse=True,
+                        limit=self.max_messages - fetched,
+                    ):
+                        await self.deliver(message)
+                        last_id = message.id
+                        fetched += 1
+                    break
+                except FloodWaitError as e:
+                    if e.seconds > self.max_flood_wait:
+                        raise
+                    backfill_logger.warning(
+                        f"FloodWait of {e.seconds}s while backfilling source {chat_id}. Resuming after message {last_id} once it expires..."
+                    )
+                    await asyncio.sleep(e.seconds)
+            if fetched:
+                backfill_logger.info(
+                    f"Backfilled {fetched} message(s) from source {chat_id} (ids {watermark + 1}..{last_id})."
+                )
+            if fetched >= self.max_messages:
+                backfill_logger.warning(
+                    f"Backfill for source {chat_id} stopped at the limit of {self.max_messages} messages. Missed messages after {last_id} were not forwarded."
+                )
+        except Exception as e:
+            backfill_logger.error(
+                f"ERROR: Backfill for source {chat_id} failed after {fetched} message(s): {e}",
+                exc_info=True,
+            )
+        finally:
+            self.stats["sources"] += 1
+            self.stats["messages"] += fetched
+            # Release held live messages. The list is drained until empty before the
+            # source is removed, so messages arriving meanwhile still join the end.
+            held = self._held[chat_id]
+            while held:
+                message = held.pop(0)
+                if message.id > last_id:
+                    await self.deliver(message)
+            del self._held[chat_id]
+
+    def stats_summary(self):
+        seconds = self.stats["seconds"]
+        rate = self.stats["messages"] / seconds if seconds else 0.0
+        return (
+            f"sources={self.stats['sources']}, messages={self.stats['messages']}, held_live={self.stats['held']}, "
+            f"seconds={seconds:.2f}, messages_per_second={rate:.1f}"
+        )
@@ -0,0 +1,58 @@
+import asyncio
+import logging
+
+batcher_logger = logging.getLogger(__name__)
+
+
+class MessageBatcher:
+    """
+    Collects items under a key and hands each group to `flush_callback(key, items)` in
+    one call, either `window` seconds after the first item arrived or as soon as the
+    group reaches `max_size` items, whichever comes first. Used to turn bursts of
+    related messages (e.g. an album's photos) into a single outbound request.
+    """
+
+    def __init__(self, flush_callback, window, max_size):
+        self.flush_callback = flush_callback
+        self.window = window
+        self.max_size = max_size
+        self._pending = {}
+        self._timers = {}
+        self._tasks = set()
+
+    def add(self, key, item):
+        items = self._pending.setdefault(key, [])
+        items.append(item)
+        if len(items) >= self.max_size:
+            self._flush(key)
+        elif len(items) == 1:
+            self._timers[key] = asyncio.get_running_loop().call_later(
+                self.window, self._flush, key
+            )
+
+    def _flush(self, key):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        items = self._pending.pop(key, None)
+        if not items:
+            return
+        task = asyncio.create_task(self._run_callback(key, items))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_callback(self, key, items):
+        try:
+            await self.flush_callback(key, items)
+        except Exception as e:
+            batcher_logger.error(
+                f"Failed to flush batch of {len(items)} item(s) for {key}: {e}",
+                exc_info=True,
+            )
+
+    async def flush_all(self):
+        """Flushes every pending group immediately and waits for the callbacks to finish."""
+        for key in list(self._pending):
+            self._flush(key)
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
@@ -0,0 +1,1971 @@
+import asyncio
+import contextlib
+import glob
+import itertools
+import json
+import logging
+import os
+import random
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+from datetime import datetime, timezone
+
+from telethon.tl.types import (
+    PeerChannel,
+    MessageEntityBold,
+    MessageEntityMention,
+    MessageEntityTextUrl,
+    MessageEntityUrl,
+)
+from telethon import utils
+from telethon.errors import FloodWaitError
+
+# --- Import the modules under test ---
+# Adjust path so the bot's 'helpers' package is importable when run as a script.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from helpers.routing import build_routing_table, Route, MODE_FORWARD, MODE_COPY
+from helpers.content_filter import ContentFilter
+from helpers.text_transform import TextTransform, utf16_length
+from helpers.channel_resolver import resolve_source_channels
+from helpers.fake_client import FakeTelegramClient, FakeMessage, generate_messages
+from helpers.entity_cache import EntityCache
+from helpers.batcher import MessageBatcher
+from helpers.forwarding import (
+    send_to_target,
+    send_to_targets,
+    MAX_ALBUM_SIZE,
+    MAX_FORWARD_BATCH_SIZE,
+)
+from helpers.forward_queue import ForwardQueue, ForwardJob
+from helpers.send_scheduler import SendScheduler
+from helpers.media_copy import MediaCopier, MEDIA_PART_SIZE
+from helpers.media_pipe import MediaPipe
+from helpers.dedup import DedupIndex, content_key
+from helpers.outbox import Outbox, build_replay_jobs, STATE_SENT
+from helpers.backfill import Backfiller
+from helpers.event_loop import available_event_loops, install_event_loop_policy
+from helpers.metrics import MetricsRegistry, start_metrics_server
+from helpers.tracing import TRACER, Tracer, StageStatsSink
+from helpers.trace import TraceRecorder, read_trace, KIND_NEW, KIND_EDIT
+from helpers.logging_setup import configure_logging, stop_logging, TEXT_LOG_FORMAT
+
+sys.path.pop(0)  # Remove added path to keep sys.path clean
+
+ROUTING_SOURCE_COUNTS = [1, 10, 100, 1000, 10000]
+ROUTING_LOOKUPS = 100000
+
+RESOLVE_SOURCE_COUNT = 200
+RESOLVE_LATENCY_SECONDS = 0.02
+RESOLVE_CONCURRENCY_LIMITS = [1, 4, 16, 64]
+RESOLVE_MAX_FLOOD_WAIT_SECONDS = 5
+
+
+def _fake_source_configs(count):
+    """Builds `count` source configs and matching entities (channel ids start at 1000)."""
+    configs = []
+    entities = []
+    for i in range(count):
+        channel_id = 1000 + i
+        configs.append(
+            {"id": -1000000000000 - channel_id, "title": f"Source {i}"}
+        )
+        entities.append(PeerChannel(channel_id))
+    return configs, entities
+
+
+def bench_routing():
+    """
+    Measures per-event dispatch cost of the chat-id routing table against the old
+    linear scan over SOURCE_CHANNEL_CONFIGS, for 1 to 10,000 configured sources.
+    Every lookup targets the last configured source (worst case for the linear scan).
+    """
+    print("--- Routing: per-event source lookup cost ---")
+    print(f"{'sources':>8} {'table (ns/event)':>18} {'linear scan (ns/event)':>24}")
+    for count in ROUTING_SOURCE_COUNTS:
+        configs, entities = _fake_source_configs(count)
+        routing_table = build_routing_table(zip(entities, configs))
+        chat_id = configs[-1]["id"]
+
+        table_seconds = timeit.timeit(
+            lambda: routing_table.get(chat_id), number=ROUTING_LOOKUPS
+        )
+
+        # The pre-routing-table lookup, kept here as the baseline.
+        def linear_scan():
+            return next(
+                (c for c in configs if str(c.get("id")) == str(chat_id)),
+                None,
+            )
+
+        scan_runs = max(1, ROUTING_LOOKUPS // count // 10)
+        scan_seconds = timeit.timeit(linear_scan, number=scan_runs)
+
+        print(
+            f"{count:>8} {table_seconds / ROUTING_LOOKUPS * 1e9:>18.1f} {scan_seconds / scan_runs * 1e9:>24.1f}"
+        )
+
+
+def bench_resolve():
+    """
+    Measures startup source resolution time against a fake client with injected
+    latency. Half of the sources are private channels joined by invite hash, so they
+    cost two RPCs each. Startup time should scale with the concurrency limit rather
+    than the number of sources; the last rows inject FloodWaits to show the pause.
+    Fails unless every source is resolved, the concurrency limit is used but never
+    exceeded, a short FloodWait is waited out and retried, and one longer than
+    max_flood_wait skips only the channel that got it.
+    """
+    logging.getLogger("helpers.channel_resolver").setLevel(logging.WARNING)
+    source_configs = []
+    for i in range(RESOLVE_SOURCE_COUNT):
+        config = {"id": -1000000000000 - (1000 + i), "title": f"Source {i}"}
+        if i % 2:
+            config.update({"type": "private", "invite_hash": f"hash{i}"})
+        source_configs.append(config)
+
+    print(
+        f"--- Resolve: {RESOLVE_SOURCE_COUNT} sources, {RESOLVE_LATENCY_SECONDS * 1000:.0f} ms per RPC ---"
+    )
+    print(f"{'concurrency':>12} {'seconds':>10} {'resolved':>10} {'max in flight':>14}")
+    scenarios = [(limit, None) for limit in RESOLVE_CONCURRENCY_LIMITS]
+    scenarios.append((16, {"get_entity": [1]}))
+    scenarios.append((16, {"get_entity": [RESOLVE_MAX_FLOOD_WAIT_SECONDS + 1]}))
+    lookups = None
+    for limit, flood_waits in scenarios:
+        client = FakeTelegramClient(RESOLVE_LATENCY_SECONDS, flood_waits)
+        started = time.perf_counter()
+        resolved = asyncio.run(
+            resolve_source_channels(
+                client,
+                source_configs,
+                concurrency=limit,
+                max_flood_wait=RESOLVE_MAX_FLOOD_WAIT_SECONDS,
+            )
+        )
+        elapsed = time.perf_counter() - started
+        label = f"{limit}" + (f" +flood {flood_waits['get_entity'][0]}s" if flood_waits else "")
+        print(
+            f"{label:>12} {elapsed:>10.2f} {len(resolved):>10} {client.max_in_flight:>14}"
+        )
+        assert client.max_in_flight == min(limit, RESOLVE_SOURCE_COUNT), label
+        if not flood_waits:
+            assert len(resolved) == RESOLVE_SOURCE_COUNT, label
+            lookups = client.rpc_counts["get_entity"]
+        elif flood_waits["get_entity"][0] <= RESOLVE_MAX_FLOOD_WAIT_SECONDS:
+            # Waited out (the whole resolver pauses) and retried.
+            assert len(resolved) == RESOLVE_SOURCE_COUNT, label
+            assert client.rpc_counts["get_entity"] == lookups + 1, label
+            assert elapsed >= flood_waits["get_entity"][0], label
+        else:
+            assert len(resolved) == RESOLVE_SOURCE_COUNT - 1, label
+
+
+def bench_entity_cache():
+    """
+    Resolves the same sources twice through an on-disk EntityCache, reloading the cache
+    in between like a process restart. The warm start should make zero RPCs.
+    """
+    logging.getLogger("helpers.channel_resolver").setLevel(logging.WARNING)
+    logging.getLogger("helpers.entity_cache").setLevel(logging.WARNING)
+    source_configs = []
+    for i in range(RESOLVE_SOURCE_COUNT):
+        config = {"id": -1000000000000 - (1000 + i), "title": f"Source {i}"}
+        if i % 2:
+            config.update({"type": "private", "invite_hash": f"hash{i}"})
+        source_configs.append(config)
+
+    print(f"--- Entity cache: {RESOLVE_SOURCE_COUNT} sources, cold vs warm start ---")
+    print(f"{'start':>6} {'seconds':>10} {'RPCs':>6}  cache stats")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_path = os.path.join(tmp_dir, "entity_cache.json")
+        for label in ("cold", "warm"):
+            cache = EntityCache(cache_path, ttl_seconds=3600)
+            client = FakeTelegramClient(RESOLVE_LATENCY_SECONDS)
+            started = time.perf_counter()
+            asyncio.run(
+                resolve_source_channels(
+                    client, source_configs, concurrency=16, entity_cache=cache
+                )
+            )
+            elapsed = time.perf_counter() - started
+            cache.save()
+            print(
+                f"{label:>6} {elapsed:>10.3f} {sum(client.rpc_counts.values()):>6}  {cache.stats_summary()}"
+            )
+
+
+ALBUM_COUNT = 50
+ALBUM_SIZE = 10
+ALBUM_WINDOW_SECONDS = 0.05
+
+
+def bench_album():
+    """
+    Sends ALBUM_COUNT albums of ALBUM_SIZE items through the forwarding path, once
+    item-by-item (the old behaviour) and once through the album batcher, for both the
+    forward and the protected copy path, and compares the number of RPCs issued.
+    """
+    logging.getLogger("helpers.forwarding").setLevel(logging.WARNING)
+    target = FakeTelegramClient.make_channel(1, title="Target")
+    print(f"--- Album: {ALBUM_COUNT} albums x {ALBUM_SIZE} items ---")
+    print(f"{'path':>10} {'mode':>10} {'RPCs':>6}")
+
+    async def run(protected, batched):
+        client = FakeTelegramClient()
+        source_config = {"title": "Source", "protected_forwarding": protected}
+        album_messages = [
+            FakeMessage(
+                album * ALBUM_SIZE + i,
+                chat_id=-1001000,
+                media=object(),
+                grouped_id=album + 1,
+            )
+            for album in range(ALBUM_COUNT)
+            for i in range(ALBUM_SIZE)
+        ]
+        if batched:
+            async def flush(key, items):
+                await send_to_target(client, items, source_config, target)
+
+            batcher = MessageBatcher(flush, ALBUM_WINDOW_SECONDS, MAX_ALBUM_SIZE)
+            for message in album_messages:
+                batcher.add((message.chat_id, message.grouped_id), message)
+            await batcher.flush_all()
+        else:
+            for message in album_messages:
+                await send_to_target(client, [message], source_config, target)
+        return sum(client.rpc_counts.values())
+
+    for protected in (False, True):
+        for batched in (False, True):
+            rpcs = asyncio.run(run(protected, batched))
+            path = "copy" if protected else "forward"
+            mode = "batched" if batched else "per-item"
+            print(f"{path:>10} {mode:>10} {rpcs:>6}")
+
+
+QUEUE_SOURCE_COUNT = 50
+QUEUE_MESSAGES_PER_SOURCE = 20
+QUEUE_SEND_SECONDS = 0.005
+QUEUE_SLOW_UPLOAD_SECONDS = 2.0
+QUEUE_WORKER_COUNTS = [1, 4, 16]
+
+
+def bench_queue():
+    """
+    Replays a burst across QUEUE_SOURCE_COUNT sources where the first message of source 0
+    is a slow upload. Inline handling (the old behaviour, one update at a time) makes
+    everything wait behind it; the worker pool only delays source 0's own messages.
+    Reports when the last message of any other source was sent, and queue wait times.
+    """
+    print(
+        f"--- Queue: {QUEUE_SOURCE_COUNT} sources x {QUEUE_MESSAGES_PER_SOURCE} messages, one {QUEUE_SLOW_UPLOAD_SECONDS:.0f}s upload ---"
+    )
+    print(f"{'mode':>12} {'others done (s)':>16} {'max wait (s)':>13}")
+
+    burst = [
+        ForwardJob(-1001000 - source, [FakeMessage(i, chat_id=-1001000 - source)])
+        for i in range(QUEUE_MESSAGES_PER_SOURCE)
+        for source in range(QUEUE_SOURCE_COUNT)
+    ]
+
+    async def run(workers):
+        started = time.perf_counter()
+        others_done = 0.0
+
+        async def process(job):
+            nonlocal others_done
+            slow = job.chat_id == -1001000 and job.message_ids == [0]
+            await asyncio.sleep(QUEUE_SLOW_UPLOAD_SECONDS if slow else QUEUE_SEND_SECONDS)
+            if job.chat_id != -1001000:
+                others_done = time.perf_counter() - started
+
+        if workers is None:
+            for job in burst:
+                await process(job)
+            return others_done, others_done
+        queue = ForwardQueue(process, workers=workers, max_depth=len(burst))
+        queue.start()
+        for job in burst:
+            job.enqueued_at = time.time()
+            await queue.put(job)
+        await queue.stop()
+        return others_done, queue.stats["wait_seconds_max"]
+
+    for workers in [None] + QUEUE_WORKER_COUNTS:
+        others_done, max_wait = asyncio.run(run(workers))
+        label = "inline" if workers is None else f"{workers} workers"
+        print(f"{label:>12} {others_done:>16.2f} {max_wait:>13.2f}")
+
+
+SCHEDULER_MESSAGES = 200
+SCHEDULER_SERVER_LIMIT = 10
+SCHEDULER_WORKERS = 8
+# Pacing should settle under the server limit after a few FloodWaits, not keep hitting it.
+SCHEDULER_MAX_FLOOD_WAITS = 10
+
+
+def bench_scheduler():
+    """
+    Sends SCHEDULER_MESSAGES to one target through a fake server that allows
+    SCHEDULER_SERVER_LIMIT sends per second and answers anything faster with a 1s
+    FloodWait. Without the scheduler, FloodWaits are logged and the message is lost;
+    with it, the rate adapts and every message is delivered. Fails if the scheduler
+    loses a message, gives up on a FloodWait, does not lower the rate below the
+    server limit, runs into more than SCHEDULER_MAX_FLOOD_WAITS FloodWaits or
+    delivers a source's messages out of order.
+    """
+    logging.getLogger("helpers.forwarding").setLevel(logging.CRITICAL)
+    logging.getLogger("helpers.send_scheduler").setLevel(logging.ERROR)
+    target = FakeTelegramClient.make_channel(1, title="Target")
+    source_config = {"title": "Source"}
+    print(
+        f"--- Scheduler: {SCHEDULER_MESSAGES} messages, server limit {SCHEDULER_SERVER_LIMIT}/s, {SCHEDULER_WORKERS} workers ---"
+    )
+    print(f"{'mode':>10} {'delivered':>10} {'FloodWaits':>11} {'seconds':>8} {'msg/s':>7}")
+
+    async def run(use_scheduler):
+        client = FakeTelegramClient(send_rate_limit=SCHEDULER_SERVER_LIMIT)
+        scheduler = (
+            SendScheduler(rate=SCHEDULER_SERVER_LIMIT * 2, burst=5, max_rate=50)
+            if use_scheduler
+            else None
+        )
+        delivered = 0
+
+        async def process(job):
+            nonlocal delivered
+            if await send_to_target(
+                client, job.messages, source_config, target, scheduler=scheduler
+            ):
+                delivered += 1
+
+        queue = ForwardQueue(process, workers=SCHEDULER_WORKERS, max_depth=SCHEDULER_MESSAGES)
+        queue.start()
+        started = time.perf_counter()
+        for i in range(SCHEDULER_MESSAGES):
+            # Spread the messages over several sources so the workers run in parallel.
+            chat_id = -1001000 - i % SCHEDULER_WORKERS
+            await queue.put(ForwardJob(chat_id, [FakeMessage(i, chat_id=chat_id)]))
+        await queue.stop()
+        elapsed = time.perf_counter() - started
+        return delivered, client, scheduler, elapsed
+
+    for use_scheduler in (False, True):
+        delivered, client, scheduler, elapsed = asyncio.run(run(use_scheduler))
+        flood_waits = client.rpc_counts.get("flood_wait", 0)
+        label = "scheduler" if use_scheduler else "unpaced"
+        print(
+            f"{label:>10} {delivered:>10} {flood_waits:>11} {elapsed:>8.2f} {delivered / elapsed:>7.1f}"
+        )
+        if not use_scheduler:
+            assert flood_waits and delivered < SCHEDULER_MESSAGES, "the fake server never pushed back"
+            continue
+        assert delivered == SCHEDULER_MESSAGES, f"{SCHEDULER_MESSAGES - delivered} message(s) lost"
+        assert scheduler.stats["retries"] == scheduler.stats["flood_waits"] > 0
+        assert flood_waits <= SCHEDULER_MAX_FLOOD_WAITS, f"{flood_waits} FloodWaits"
+        bucket = scheduler.bucket_for(utils.get_peer_id(target))
+        assert bucket.ceiling is not None and bucket.rate < SCHEDULER_SERVER_LIMIT * 2
+        by_chat = {}
+        for chat_id, message_id, _ in client.delivered:
+            by_chat.setdefault(chat_id, []).append(message_id)
+        for chat_id, ids in by_chat.items():
+            assert ids == sorted(ids), f"source {chat_id} delivered out of order"
+        print(
+            f"scheduler settled at {bucket.rate:.2f}/s (last FloodWait at {bucket.ceiling:.2f}/s); "
+            f"per-source order kept for {len(by_chat)} sources"
+        )
+
+
+COALESCE_MESSAGES = 1000
+COALESCE_SOURCES = 5
+COALESCE_BURST_SIZE = 40
+COALESCE_WINDOW_SECONDS = 0.05
+
+
+def bench_coalesce():
+    """
+    Feeds COALESCE_MESSAGES messages, arriving in bursts of COALESCE_BURST_SIZE from
+    COALESCE_SOURCES sources, through the non-protected forward path with and without
+    coalescing, and reports the RPCs needed per 1,000 messages.
+    """
+    logging.getLogger("helpers.forwarding").setLevel(logging.WARNING)
+    target = FakeTelegramClient.make_channel(1, title="Target")
+    source_config = {"title": "Source"}
+    print(
+        f"--- Coalesce: {COALESCE_MESSAGES} messages in bursts of {COALESCE_BURST_SIZE} from {COALESCE_SOURCES} sources ---"
+    )
+    print(f"{'mode':>12} {'RPCs':>6} {'RPCs/1000 msgs':>15} {'order kept':>11}")
+
+    async def run(coalesce):
+        client = FakeTelegramClient()
+        forwarded = {}
+        original_forward = client.forward_messages
+
+        async def recording_forward(entity, messages, from_peer=None, **kwargs):
+            for message in messages:
+                forwarded.setdefault(message.chat_id, []).append(message.id)
+            return await original_forward(entity, messages, from_peer, **kwargs)
+
+        client.forward_messages = recording_forward
+
+        async def flush(key, items):
+            await send_to_target(client, items, source_config, target)
+
+        batcher = MessageBatcher(flush, COALESCE_WINDOW_SECONDS, MAX_FORWARD_BATCH_SIZE)
+        message_id = 0
+        while message_id < COALESCE_MESSAGES:
+            for source in range(COALESCE_SOURCES):
+                chat_id = -1001000 - source
+                for _ in range(COALESCE_BURST_SIZE // COALESCE_SOURCES):
+                    message = FakeMessage(message_id, chat_id=chat_id)
+                    message_id += 1
+                    if coalesce:
+                        batcher.add((chat_id,), message)
+                    else:
+                        await send_to_target(client, [message], source_config, target)
+            # Quiet gap between bursts, longer than the coalescing window.
+            await asyncio.sleep(COALESCE_WINDOW_SECONDS * 2)
+        await batcher.flush_all()
+        order_kept = all(ids == sorted(ids) for ids in forwarded.values())
+        return client.rpc_counts.get("forward_messages", 0), order_kept
+
+    for coalesce in (False, True):
+        rpcs, order_kept = asyncio.run(run(coalesce))
+        label = "coalesced" if coalesce else "per-message"
+        print(
+            f"{label:>12} {rpcs:>6} {rpcs * 1000 / COALESCE_MESSAGES:>15.0f} {str(order_kept):>11}"
+        )
+
+
+MEDIA_COPY_MESSAGES = 20
+MEDIA_COPY_FILE_SIZE = 5 * 1024 * 1024
+
+
+def bench_media_copy():
+    """
+    Copies MEDIA_COPY_MESSAGES documents of MEDIA_COPY_FILE_SIZE bytes from a normal and
+    from a content-protected source, and reports bytes transferred per copied message.
+    """
+    logging.getLogger("helpers.forwarding").setLevel(logging.WARNING)
+    logging.getLogger("helpers.media_copy").setLevel(logging.WARNING)
+    target = FakeTelegramClient.make_channel(1, title="Target")
+    source_config = {"title": "Source", "protected_forwarding": True}
+    print(
+        f"--- Media copy: {MEDIA_COPY_MESSAGES} x {MEDIA_COPY_FILE_SIZE // 1024} KiB documents ---"
+    )
+    print(f"{'source':>10} {'RPCs':>6} {'bytes/message':>14}  copier stats")
+
+    async def run(protected_media):
+        client = FakeTelegramClient(protected_media=protected_media)
+        copier = MediaCopier(client)
+        for i in range(MEDIA_COPY_MESSAGES):
+            message = FakeMessage(
+                i,
+                chat_id=-1001000,
+                media=FakeTelegramClient.make_document_media(MEDIA_COPY_FILE_SIZE, i + 1),
+            )
+            await send_to_target(
+                client, [message], source_config, target, media_copier=copier
+            )
+        transferred = client.bytes_downloaded + client.bytes_uploaded
+        return sum(client.rpc_counts.values()), transferred, copier.stats_summary()
+
+    for protected_media in (False, True):
+        rpcs, transferred, summary = asyncio.run(run(protected_media))
+        label = "protected" if protected_media else "normal"
+        print(
+            f"{label:>10} {rpcs:>6} {transferred // MEDIA_COPY_MESSAGES:>14}  {summary}"
+        )
+
+
+PIPE_FILE_SIZE = 1024 * 1024 * 1024
+PIPE_DOWNLOAD_LATENCY_SECONDS = 0.001
+PIPE_UPLOAD_LATENCY_SECONDS = 0.004
+PIPE_PARTS_IN_FLIGHT = [1, 4, 16]
+
+
+def bench_media_pipe():
+    """
+    Streams a 1 GiB synthetic file through the download-to-upload pipe with a fake
+    client (uploading a part is slower than downloading one, as on most links), and
+    reports wall time and peak traced memory for different in-flight part limits.
+    One part in flight is the old sequential download-then-upload loop.
+    """
+    media = FakeTelegramClient.make_document_media(PIPE_FILE_SIZE)
+    print(
+        f"--- Media pipe: {PIPE_FILE_SIZE // (1024 * 1024)} MiB file, {MEDIA_PART_SIZE // 1024} KiB parts, "
+        f"{PIPE_DOWNLOAD_LATENCY_SECONDS * 1000:.0f} ms download / {PIPE_UPLOAD_LATENCY_SECONDS * 1000:.0f} ms upload per part ---"
+    )
+    print(f"{'in flight':>10} {'seconds':>8} {'MiB/s':>7} {'peak MiB':>9} {'peak parts':>11}")
+    for parts_in_flight in PIPE_PARTS_IN_FLIGHT:
+        client = FakeTelegramClient(
+            latency=PIPE_DOWNLOAD_LATENCY_SECONDS,
+            upload_latency=PIPE_UPLOAD_LATENCY_SECONDS,
+        )
+        pipe = MediaPipe(client, parts_in_flight)
+        tracemalloc.start()
+        started = time.perf_counter()
+        asyncio.run(
+            pipe.transfer(media, 1, MEDIA_PART_SIZE, file_size=PIPE_FILE_SIZE, is_big=True)
+        )
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert client.bytes_uploaded == PIPE_FILE_SIZE
+        print(
+            f"{parts_in_flight:>10} {elapsed:>8.2f} {PIPE_FILE_SIZE / elapsed / 2**20:>7.0f} {peak / 2**20:>9.1f} {pipe.peak_parts_in_flight:>11}"
+        )
+
+
+DEDUP_SOURCE_COUNT = 5
+DEDUP_POSTS = 2000
+DEDUP_MEMORY_ENTRIES = [100, 10000]
+
+
+def bench_dedup():
+    """
+    Feeds DEDUP_POSTS posts, each reposted by all DEDUP_SOURCE_COUNT sources with
+    varying case and spacing (half with a shared document), through content_key and a
+    DedupIndex. Reports forward RPCs saved, hit rate and cost per check for a small
+    (mostly disk-backed) and a large (mostly in-memory) LRU, then reopens the store
+    like a restart and checks that reposts are still recognised, and that content
+    whose claim was discarded (dropped or failed) or never confirmed (a crash before
+    the send) is not.
+    """
+    logging.getLogger("helpers.dedup").setLevel(logging.WARNING)
+    messages = []
+    for post in range(DEDUP_POSTS):
+        media = None
+        if post % 2:
+            media = FakeTelegramClient.make_document_media(4096, document_id=post + 1)
+        for source in range(DEDUP_SOURCE_COUNT):
+            text = f"Breaking news item {post}: something happened"
+            if source % 2:
+                text = "  " + text.upper().replace(" ", "   ") + "\n"
+            messages.append(
+                FakeMessage(post, chat_id=-1001000 - source, text=text, media=media)
+            )
+
+    print(
+        f"--- Dedup: {DEDUP_POSTS} posts x {DEDUP_SOURCE_COUNT} sources ({len(messages)} messages) ---"
+    )
+    print(f"{'LRU size':>9} {'forwards':>9} {'saved':>6} {'us/check':>9}  index stats")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for memory_entries in DEDUP_MEMORY_ENTRIES:
+            path = os.path.join(tmp_dir, f"dedup_{memory_entries}.sqlite")
+            index = DedupIndex(path, ttl_seconds=3600, memory_entries=memory_entries)
+            forwarded = 0
+            started = time.perf_counter()
+            # Sources repost in an interleaved order, like several live feeds.
+            for source in range(DEDUP_SOURCE_COUNT):
+                for message in messages[source::DEDUP_SOURCE_COUNT]:
+                    key = content_key(message)
+                    if not index.claim(key):
+                        index.add(key)
+                        forwarded += 1
+            elapsed = time.perf_counter() - started
+            index.close()
+            print(
+                f"{memory_entries:>9} {forwarded:>9} {len(messages) - forwarded:>6} "
+                f"{elapsed / len(messages) * 1e6:>9.1f}  {index.stats_summary()}"
+            )
+
+        restarted = DedupIndex(path, ttl_seconds=3600)
+        repeats = sum(
+            restarted.claim(content_key(m)) for m in messages[::DEDUP_SOURCE_COUNT]
+        )
+        # Claimed but never sent: one half discarded, the other still claimed at shutdown.
+        unsent = [
+            content_key(FakeMessage(post, text=f"Unsent post {post} that never went out"))
+            for post in range(DEDUP_POSTS)
+        ]
+        for key in unsent:
+            restarted.claim(key)
+        for key in unsent[::2]:
+            restarted.discard(key)
+        suppressed_discarded = sum(restarted.claim(key) for key in unsent[::2])
+        restarted.close()
+        restarted = DedupIndex(path, ttl_seconds=3600)
+        suppressed_unsent = sum(restarted.claim(key) for key in unsent)
+        restarted.close()
+        print(f"after restart: {repeats}/{DEDUP_POSTS} reposts recognised from disk")
+        print(
+            f"unsent content suppressed: {suppressed_discarded}/{len(unsent[::2])} after discard, "
+            f"{suppressed_unsent}/{len(unsent)} after a restart"
+        )
+        assert repeats == DEDUP_POSTS
+        assert suppressed_discarded == 0 and suppressed_unsent == 0
+
+
+OUTBOX_MESSAGES = 20000
+OUTBOX_CONCURRENCY = [10, 100, 1000]
+
+
+def bench_outbox():
+    """
+    Records OUTBOX_MESSAGES messages in the write-ahead outbox from a varying number of
+    concurrent handlers and reports the event-loop time each record() call costs the
+    handler, total CPU time per message (including the commits) and entries per
+    fsynced commit. Every other message is marked sent right after it is recorded,
+    usually before its pending row is committed, so after reopening the outbox exactly
+    the unmarked half must come back as replay jobs.
+    """
+    logging.getLogger("helpers.outbox").setLevel(logging.WARNING)
+    print(f"--- Outbox: {OUTBOX_MESSAGES} messages ---")
+    print(
+        f"{'handlers':>9} {'seconds':>8} {'record us':>10} {'cpu us/msg':>11}  outbox stats"
+    )
+
+    async def run(path, concurrency):
+        outbox = Outbox(path)
+        outbox.start()
+        messages = [FakeMessage(i, chat_id=-1001000) for i in range(OUTBOX_MESSAGES)]
+        record_seconds = 0.0
+
+        async def handler(chunk):
+            nonlocal record_seconds
+            for message in chunk:
+                started = time.perf_counter()
+                outbox.record(message.chat_id, [message])
+                record_seconds += time.perf_counter() - started
+                if message.id % 2 == 0:
+                    outbox.mark(message.chat_id, [message.id], STATE_SENT)
+                # Like Telethon's update dispatch, other handlers run in between.
+                await asyncio.sleep(0)
+
+        await asyncio.gather(
+            *(handler(messages[i::concurrency]) for i in range(concurrency))
+        )
+        await outbox.stop()
+        return record_seconds, outbox.stats_summary()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for concurrency in OUTBOX_CONCURRENCY:
+            path = os.path.join(tmp_dir, f"outbox_{concurrency}.sqlite")
+            started = time.perf_counter()
+            cpu_started = time.process_time()
+            record_seconds, summary = asyncio.run(run(path, concurrency))
+            elapsed = time.perf_counter() - started
+            cpu = time.process_time() - cpu_started
+            print(
+                f"{concurrency:>9} {elapsed:>8.2f} {record_seconds / OUTBOX_MESSAGES * 1e6:>10.1f} "
+                f"{cpu / OUTBOX_MESSAGES * 1e6:>11.1f}  {summary}"
+            )
+
+        reopened = Outbox(path)
+        jobs = build_replay_jobs(reopened.pending(), {-1001000: {}})
+        replayed = [message_id for job in jobs for message_id in job.message_ids]
+        print(
+            f"after restart: {len(replayed)} unacknowledged message(s) in {len(jobs)} replay job(s)"
+        )
+        assert replayed == list(range(1, OUTBOX_MESSAGES, 2))
+
+
+BACKFILL_SOURCE_COUNT = 40
+BACKFILL_MISSED_MESSAGES = 250
+BACKFILL_PAGE_LATENCY_SECONDS = 0.05
+BACKFILL_CONCURRENCY_LIMITS = [1, 4, 16]
+
+
+def bench_backfill():
+    """
+    Backfills BACKFILL_MISSED_MESSAGES missed messages from each of
+    BACKFILL_SOURCE_COUNT sources (one fake history page takes
+    BACKFILL_PAGE_LATENCY_SECONDS) while live messages keep arriving, and reports
+    throughput per concurrency limit. Every source must come out complete and in id
+    order, with the live messages after the backfilled ones.
+    """
+    logging.getLogger("helpers.backfill").setLevel(logging.WARNING)
+    print(
+        f"--- Backfill: {BACKFILL_SOURCE_COUNT} sources x {BACKFILL_MISSED_MESSAGES} missed messages, "
+        f"{BACKFILL_PAGE_LATENCY_SECONDS * 1000:.0f} ms per page ---"
+    )
+    print(f"{'parallel':>9} {'seconds':>8} {'msgs/s':>8} {'RPCs':>5}  backfill stats")
+
+    async def run(concurrency):
+        client = FakeTelegramClient(BACKFILL_PAGE_LATENCY_SECONDS)
+        watermarks = {}
+        for i in range(BACKFILL_SOURCE_COUNT):
+            chat_id = -1001000 - i
+            watermarks[chat_id] = 1000
+            client.history[chat_id] = 1000 + BACKFILL_MISSED_MESSAGES
+        delivered = {chat_id: [] for chat_id in watermarks}
+
+        async def deliver(message):
+            delivered[message.chat_id].append(message.id)
+
+        backfiller = Backfiller(client, watermarks, deliver, concurrency=concurrency)
+        backfill = asyncio.create_task(backfiller.run())
+        # Live traffic during the backfill: the newest missed message arrives again as
+        # an event, followed by two genuinely new ones.
+        await asyncio.sleep(0)
+        for chat_id, last_id in client.history.items():
+            for message_id in (last_id, last_id + 1, last_id + 2):
+                message = FakeMessage(message_id, chat_id=chat_id)
+                if not backfiller.hold(chat_id, message):
+                    await deliver(message)
+        await backfill
+
+        for chat_id, ids in delivered.items():
+            expected = list(range(1001, client.history[chat_id] + 3))
+            assert ids == expected, f"source {chat_id} out of order or incomplete"
+        return sum(client.rpc_counts.values()), backfiller
+
+    for concurrency in BACKFILL_CONCURRENCY_LIMITS:
+        started = time.perf_counter()
+        rpcs, backfiller = asyncio.run(run(concurrency))
+        elapsed = time.perf_counter() - started
+        print(
+            f"{concurrency:>9} {elapsed:>8.2f} {backfiller.stats['messages'] / elapsed:>8.0f} {rpcs:>5}  {backfiller.stats_summary()}"
+        )
+
+
+ACCOUNT_COUNTS = [1, 2, 8, 32]
+ACCOUNT_SOURCE_COUNT = 10
+ACCOUNT_RPC_LATENCY_SECONDS = 0.001
+
+
+def bench_accounts():
+    """
+    Compares hosting accounts in separate processes (one interpreter plus Telethon
+    import each, like the old run.sh) with hosting them in one process: up to
+    max(ACCOUNT_COUNTS) real accounts (ForwarderAccount + run_account, with their
+    outbox, dedup index, queue and entity cache) are started one after another
+    against fake clients, reporting the current RSS and the start time of each
+    additional account.
+    """
+    probe = (
+        "import resource, time; started = time.perf_counter(); "
+        "import telethon, dotenv; "
+        "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, time.perf_counter() - started)"
+    )
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", probe], capture_output=True, text=True, check=True
+    ).stdout.split()
+    process_seconds = time.perf_counter() - started
+    process_kib = int(output[0])
+    print("--- Accounts: separate processes vs one multi-account process ---")
+    print(
+        f"one process per account: {process_kib / 1024:.1f} MiB RSS and {process_seconds:.2f}s start each, before loading any account"
+    )
+    print(
+        f"{'accounts':>9} {'processes MiB':>14} {'shared MiB':>11} "
+        f"{'extra MiB/account':>18} {'start ms/account':>17}"
+    )
+    source_configs, _ = _fake_source_configs(ACCOUNT_SOURCE_COUNT)
+
+    async def run(forwarder):
+        # Every account gets its own copy of the LOADTEST_ variables under its prefix.
+        template = {
+            name[len(LOAD_ENV_PREFIX) :]: value
+            for name, value in os.environ.items()
+            if name.startswith(LOAD_ENV_PREFIX)
+        }
+        prefixes = [f"ACCOUNTBENCH_{n}_" for n in range(1, max(ACCOUNT_COUNTS) + 1)]
+        for prefix in prefixes:
+            for name, value in template.items():
+                os.environ[f"{prefix}{name}"] = value
+        clients = []
+        tasks = []
+        start_seconds = []
+        base_mib = None
+        try:
+            for prefix in prefixes:
+                client = FakeTelegramClient(ACCOUNT_RPC_LATENCY_SECONDS)
+                started = time.perf_counter()
+                _, task = await _start_account(forwarder, client, prefix)
+                start_seconds.append(time.perf_counter() - started)
+                clients.append(client)
+                tasks.append(task)
+                # Let the new account's background tasks settle before measuring.
+                await asyncio.sleep(0.05)
+                if base_mib is None:
+                    base_mib = _rss_mib()
+                count = len(clients)
+                if count in ACCOUNT_COUNTS:
+                    shared_mib = _rss_mib()
+                    extra = (shared_mib - base_mib) / (count - 1) if count > 1 else 0.0
+                    # The first account pays for imports and warm-up; the average is over the others.
+                    extra_starts = start_seconds[1:] or start_seconds
+                    print(
+                        f"{count:>9} {process_kib * count / 1024:>14.1f} {shared_mib:>11.1f} "
+                        f"{extra:>18.2f} {sum(extra_starts) / len(extra_starts) * 1000:>17.1f}"
+                    )
+        finally:
+            for client in clients:
+                await client.disconnect()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for prefix in prefixes:
+                for name in template:
+                    os.environ.pop(f"{prefix}{name}", None)
+        return start_seconds
+
+    with tempfile.TemporaryDirectory() as state_dir:
+        with _forwarder_environment(source_configs, state_dir) as forwarder:
+            start_seconds = asyncio.run(run(forwarder))
+    print(f"first account started in {start_seconds[0] * 1000:.1f} ms")
+
+
+LOOP_DISPATCH_EVENTS = 50000
+LOOP_DISPATCH_BURST = 100
+LOOP_FORWARD_MESSAGES = 20000
+LOOP_FORWARD_SOURCES = 20
+LOOP_RPC_LATENCY_SECONDS = 0.001
+
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def bench_event_loop():
+    """
+    Runs the same two workloads on every installed event loop: event dispatch latency
+    (bursts of LOOP_DISPATCH_BURST updates handed from a reader task to a handler
+    task through a queue, like Telethon's update dispatch) and forwarding throughput
+    (LOOP_FORWARD_MESSAGES messages through the ForwardQueue and send_to_target
+    against the fake client, every RPC taking LOOP_RPC_LATENCY_SECONDS).
+    """
+    logging.getLogger("helpers.forwarding").setLevel(logging.WARNING)
+    logging.getLogger("helpers.forward_queue").setLevel(logging.WARNING)
+    target = FakeTelegramClient.make_channel(1, title="Target")
+
+    async def dispatch():
+        updates = asyncio.Queue()
+        latencies = []
+
+        async def handler():
+            for _ in range(LOOP_DISPATCH_EVENTS):
+                sent_at = await updates.get()
+                latencies.append(time.perf_counter() - sent_at)
+
+        consumer = asyncio.create_task(handler())
+        for _ in range(LOOP_DISPATCH_EVENTS // LOOP_DISPATCH_BURST):
+            for _ in range(LOOP_DISPATCH_BURST):
+                updates.put_nowait(time.perf_counter())
+            await asyncio.sleep(0)
+        await consumer
+        return sorted(latencies)
+
+    async def forward():
+        client = FakeTelegramClient(LOOP_RPC_LATENCY_SECONDS)
+        source_config = {"title": "Source"}
+
+        async def process_job(job):
+            return await send_to_target(client, job.messages, source_config, target)
+
+        queue = ForwardQueue(process_job, workers=8, max_depth=1000)
+        queue.start()
+        started = time.perf_counter()
+        for i in range(LOOP_FORWARD_MESSAGES):
+            chat_id = -1001000 - i % LOOP_FORWARD_SOURCES
+            await queue.put(ForwardJob(chat_id, [FakeMessage(i, chat_id=chat_id)]))
+        await queue.stop()
+        return time.perf_counter() - started
+
+    print(
+        f"--- Event loops: {LOOP_DISPATCH_EVENTS} dispatched events, {LOOP_FORWARD_MESSAGES} forwards "
+        f"({LOOP_RPC_LATENCY_SECONDS * 1000:.0f} ms fake RPCs) ---"
+    )
+    print(f"{'loop':>8} {'p50 us':>8} {'p99 us':>8} {'max us':>8} {'forwards/s':>11}")
+    try:
+        for name in available_event_loops():
+            install_event_loop_policy(name)
+            latencies = asyncio.run(dispatch())
+            elapsed = asyncio.run(forward())
+            print(
+                f"{name:>8} {_percentile(latencies, 0.5) * 1e6:>8.1f} {_percentile(latencies, 0.99) * 1e6:>8.1f} "
+                f"{latencies[-1] * 1e6:>8.1f} {LOOP_FORWARD_MESSAGES / elapsed:>11.0f}"
+            )
+    finally:
+        install_event_loop_policy("asyncio")
+    if "uvloop" not in available_event_loops():
+        print("(uvloop is not installed; pip install uvloop to compare it)")
+
+
+METRICS_RECORDS = 200000
+METRICS_SOURCE_COUNTS = [10, 100, 1000]
+
+
+def bench_metrics():
+    """
+    Times recording on pre-bound metric children (counter inc, histogram observe) and
+    counts the memory left allocated by METRICS_RECORDS records, then renders the
+    registry and scrapes it once over the HTTP exporter for a growing number of sources.
+    """
+    logging.getLogger("helpers.metrics").setLevel(logging.WARNING)
+    registry = MetricsRegistry()
+    received = registry.counter("received_total", "Received.", ("source", "target"))
+    latency = registry.histogram("latency_seconds", "Latency.", ("target",))
+    counter = received.labels("Source 0", "Target")
+    histogram = latency.labels("Target")
+    values = [(i % 1000) / 100 for i in range(1000)]
+
+    print(f"--- Metrics: {METRICS_RECORDS} records on the hot path ---")
+    for name, record in (
+        ("counter.inc()", lambda: counter.inc()),
+        ("histogram.observe()", lambda: histogram.observe(values[7])),
+    ):
+        elapsed = timeit.timeit(record, number=METRICS_RECORDS)
+        tracemalloc.start()
+        for _ in range(METRICS_RECORDS):
+            record()
+        retained, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(
+            f"{name:<20} {elapsed / METRICS_RECORDS * 1e9:>6.0f} ns/record, "
+            f"{retained} bytes retained after {METRICS_RECORDS} records"
+        )
+
+    print(f"{'sources':>8} {'series':>7} {'render ms':>10} {'scrape ms':>10} {'bytes':>8}")
+    for count in METRICS_SOURCE_COUNTS:
+        registry = MetricsRegistry()
+        families = [
+            registry.counter(f"{name}_total", name, ("source", "target"))
+            for name in ("received", "deduped", "forwarded", "copied", "failed")
+        ]
+        latency = registry.histogram("latency_seconds", "Latency.", ("target",))
+        for i in range(count):
+            for family in families:
+                family.labels(f"Source {i}", "Target").inc(i)
+        for value in values:
+            latency.labels("Target").observe(value)
+
+        started = time.perf_counter()
+        body = registry.render()
+        render_elapsed = time.perf_counter() - started
+
+        async def scrape():
+            server = await start_metrics_server(registry, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            started = time.perf_counter()
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"GET /metrics HTTP/1.0\r\n\r\n")
+            response = await reader.read()
+            writer.close()
+            elapsed = time.perf_counter() - started
+            server.close()
+            await server.wait_closed()
+            return response, elapsed
+
+        response, scrape_elapsed = asyncio.run(scrape())
+        assert response.startswith(b"HTTP/1.0 200 OK"), response[:100]
+        print(
+            f"{count:>8} {count * len(families) + 1:>7} {render_elapsed * 1000:>10.2f} "
+            f"{scrape_elapsed * 1000:>10.2f} {len(body):>8}"
+        )
+
+
+TRACING_SPANS = 200000
+TRACING_FORWARD_MESSAGES = 2000
+
+
+def bench_tracing():
+    """
+    Measures what one span costs with tracing disabled and enabled (against an empty
+    block), then forwards TRACING_FORWARD_MESSAGES messages from a normal and a
+    protected source through the ForwardQueue, SendScheduler and send_to_target
+    against the fake client with the shared TRACER enabled, and prints its per-stage
+    breakdown (the same table SIGUSR1 logs).
+    """
+    logging.getLogger("helpers.forwarding").setLevel(logging.WARNING)
+    logging.getLogger("helpers.forward_queue").setLevel(logging.WARNING)
+    print(f"--- Tracing: cost of {TRACING_SPANS} spans ---")
+
+    def empty():
+        pass
+
+    baseline = timeit.timeit(empty, number=TRACING_SPANS)
+    for enabled in (False, True):
+        tracer = Tracer(enabled=enabled)
+        tracer.add_sink(StageStatsSink())
+
+        def traced():
+            with tracer.span("stage"):
+                pass
+
+        elapsed = timeit.timeit(traced, number=TRACING_SPANS) - baseline
+        print(
+            f"{'enabled' if enabled else 'disabled':>8}: {elapsed / TRACING_SPANS * 1e9:>6.0f} ns/span"
+        )
+
+    target = FakeTelegramClient.make_channel(1, title="Target")
+    sources = {
+        -1001000: {"title": "Open source"},
+        -1001001: {"title": "Protected source", "protected_forwarding": True},
+    }
+
+    async def forward():
+        client = FakeTelegramClient(0.002)
+        scheduler = SendScheduler(rate=1000, burst=1000, max_rate=1000)
+        media_copier = MediaCopier(client)
+
+        async def process_job(job):
+            with TRACER.span("forward.send"):
+                return await send_to_target(
+                    client,
+                    job.messages,
+                    sources[job.chat_id],
+                    target,
+                    scheduler=scheduler,
+                    media_copier=media_copier,
+                )
+
+        queue = ForwardQueue(process_job, workers=8, max_depth=1000)
+        queue.start()
+        for i in range(TRACING_FORWARD_MESSAGES):
+            chat_id = -1001000 - i % 2
+            media = FakeTelegramClient.make_document_media(4096, document_id=i + 1)
+            await queue.put(ForwardJob(chat_id, [FakeMessage(i, chat_id=chat_id, media=media)]))
+        await queue.stop()
+
+    stage_stats = StageStatsSink()
+    TRACER.enabled = True
+    TRACER.add_sink(stage_stats)
+    try:
+        asyncio.run(forward())
+    finally:
+        TRACER.sinks.remove(stage_stats)
+        TRACER.enabled = False
+    print(f"--- Stage breakdown of {TRACING_FORWARD_MESSAGES} forwards (2 ms fake RPCs) ---")
+    print(stage_stats.summary())
+
+
+LOGGING_MESSAGES = 5000
+# Time one write to stdout takes when the terminal or pipe behind it is slow.
+LOGGING_WRITE_LATENCY_SECONDS = 0.0001
+
+
+class _SlowStream:
+    """A stdout stand-in whose writes block for LOGGING_WRITE_LATENCY_SECONDS each."""
+
+    def __init__(self):
+        self.lines = 0
+
+    def write(self, text):
+        time.sleep(LOGGING_WRITE_LATENCY_SECONDS)
+        self.lines += text.count("\n")
+
+    def flush(self):
+        pass
+
+
+def bench_logging():
+    """
+    Logs the two per-message INFO lines of send_to_target for LOGGING_MESSAGES
+    messages to a slow stdout stand-in, and reports the time spent on the calling
+    thread (the event loop, in the bot) per message and the lines written. Compares
+    the old synchronous StreamHandler with f-strings against configure_logging's
+    queue backend with lazy formatting, with and without the rate limiter.
+    """
+    bench_logger = logging.getLogger("benchmark.logging")
+    root = logging.getLogger()
+    saved_handlers, saved_level = root.handlers[:], root.level
+    description, title, target = "message", "Source channel", "Target channel"
+
+    def log_fstrings(i):
+        bench_logger.info(
+            f"New {description} detected in source channel '{title}' (ID: {i}). Attempting to forward..."
+        )
+        bench_logger.info(
+            f"{description.capitalize()} from '{title}' successfully handled and sent to '{target}'."
+        )
+
+    def log_lazy(i):
+        bench_logger.info(
+            "New %s detected in source channel '%s' (ID: %s). Attempting to forward...",
+            description,
+            title,
+            i,
+        )
+        bench_logger.info(
+            "%s from '%s' successfully handled and sent to '%s'.",
+            description.capitalize(),
+            title,
+            target,
+        )
+
+    print(
+        f"--- Logging: {LOGGING_MESSAGES} messages x 2 INFO lines, "
+        f"{LOGGING_WRITE_LATENCY_SECONDS * 1e6:.0f} us per stdout write ---"
+    )
+    print(f"{'backend':<28} {'us/message':>11} {'drain s':>8} {'lines':>7}")
+    scenarios = [
+        ("sync handler, f-strings", log_fstrings, None),
+        ("queue, lazy", log_lazy, {"rate_limit": 0}),
+        ("queue, lazy, json", log_lazy, {"rate_limit": 0, "log_format": "json"}),
+        ("queue, lazy, rate limited", log_lazy, {"rate_limit": 20}),
+    ]
+    try:
+        for name, log, options in scenarios:
+            stream = _SlowStream()
+            if options is None:
+                for handler in root.handlers[:]:
+                    root.removeHandler(handler)
+                handler = logging.StreamHandler(stream)
+                handler.setFormatter(logging.Formatter(TEXT_LOG_FORMAT))
+                root.addHandler(handler)
+                root.setLevel(logging.INFO)
+            else:
+                configure_logging(stream=stream, **options)
+            started = time.perf_counter()
+            for i in range(LOGGING_MESSAGES):
+                log(i)
+            elapsed = time.perf_counter() - started
+            stop_logging()
+            drained = time.perf_counter() - started
+            print(
+                f"{name:<28} {elapsed / LOGGING_MESSAGES * 1e6:>11.1f} {drained:>8.2f} {stream.lines:>7}"
+            )
+    finally:
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        for handler in saved_handlers:
+            root.addHandler(handler)
+        root.setLevel(saved_level)
+
+
+LOAD_SOURCE_COUNTS = [1, 10, 100, 1000]
+LOAD_MESSAGES = 2000
+LOAD_RPC_LATENCY_SECONDS = 0.005
+LOAD_FLOOD_WAIT_RATE = 0.01
+LOAD_PRIVATE_SOURCE_FRACTION = 0.05
+LOAD_ENV_PREFIX = "LOADTEST_"
+LOAD_TIMEOUT_SECONDS = 120
+
+
+def _rss_mib():
+    """Current resident set size of this process in MiB (peak RSS where /proc is missing)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _import_forwarder():
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+    try:
+        import telegram_channel_forwarder
+    finally:
+        sys.path.pop(0)
+    return telegram_channel_forwarder
+
+
+def _set_source_environment(source_configs):
+    """Sets the LOADTEST_SOURCE_CHANNEL_1.. variables to `source_configs` (and no more)."""
+    for i in itertools.count(1):
+        if os.environ.pop(f"{LOAD_ENV_PREFIX}SOURCE_CHANNEL_{i}", None) is None:
+            break
+    for i, source_config in enumerate(source_configs, start=1):
+        os.environ[f"{LOAD_ENV_PREFIX}SOURCE_CHANNEL_{i}"] = json.dumps(source_config)
+
+
+@contextlib.contextmanager
+def _forwarder_environment(source_configs, state_dir):
+    """
+    Configures the LOADTEST_ account with `source_configs` and one target, keeps its
+    state in `state_dir`, lifts send pacing and silences logging below ERROR, and
+    yields the imported forwarder module.
+    """
+    forwarder = _import_forwarder()
+    environment = {
+        "API_ID": "1",
+        "API_HASH": "hash",
+        "PHONE_NUMBER": "+10000000000",
+        "TARGET_CHANNEL_CONFIG": json.dumps({"id": -1000000000001, "title": "Target"}),
+    }
+    overrides = {
+        "SESSIONS_DIR": state_dir,
+        "SEND_RATE_PER_SECOND": 1e6,
+        "SEND_BURST": 1e6,
+        "MAX_SEND_RATE_PER_SECOND": 1e6,
+    }
+    saved = {name: getattr(forwarder, name) for name in overrides}
+    for name, value in environment.items():
+        os.environ[f"{LOAD_ENV_PREFIX}{name}"] = value
+    _set_source_environment(source_configs)
+    for name, value in overrides.items():
+        setattr(forwarder, name, value)
+    logging.disable(logging.ERROR)
+    try:
+        yield forwarder
+    finally:
+        logging.disable(logging.NOTSET)
+        for name in environment:
+            del os.environ[f"{LOAD_ENV_PREFIX}{name}"]
+        _set_source_environment([])
+        for name, value in saved.items():
+            setattr(forwarder, name, value)
+
+
+async def _start_account(forwarder, client, env_prefix=LOAD_ENV_PREFIX):
+    """Starts run_account() for the LOADTEST_ account; returns the account and its task once it listens."""
+    account = forwarder.ForwarderAccount(
+        {"env_prefix": env_prefix, "title": "Load test"}, client=client
+    )
+    task = asyncio.create_task(forwarder.run_account(account, asyncio.Lock()))
+    while not client.handlers:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.01)
+    return account, task
+
+
+async def _run_forwarder(client, source_configs, schedule, state_dir):
+    """
+    Runs the real run_account() of telegram_channel_forwarder.py against `client` for
+    an account with `source_configs`, emitting each (offset seconds, chat_id, message)
+    of `schedule` at its offset, and waits until every message from a resolved source
+    has been forwarded (or copied, for protected sources). Send pacing is lifted, so
+    the numbers show the bot's own overhead. Returns the emitted count, elapsed
+    seconds and sorted latencies from emit to the completed send RPC.
+    """
+    with _forwarder_environment(source_configs, state_dir) as forwarder:
+        _, task = await _start_account(forwarder, client)
+        emitted = {}
+        # Copies are logged by text, which is unique per message in these streams.
+        emitted_texts = {}
+        started = time.perf_counter()
+        for offset, chat_id, message in schedule:
+            delay = started + offset - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if not client.handles(chat_id):
+                continue  # Its source could not be resolved.
+            message.date = datetime.now(timezone.utc)
+            emitted[(chat_id, message.id)] = time.perf_counter()
+            emitted_texts[message.message] = (chat_id, message.id)
+            client.emit(chat_id, message)
+        deadline = time.monotonic() + LOAD_TIMEOUT_SECONDS
+        while len(client.delivered) < len(emitted) and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+
+        latencies = []
+        for chat_id, message_id, delivered_at in client.delivered:
+            key = (chat_id, message_id) if chat_id is not None else emitted_texts.get(message_id)
+            if key in emitted:
+                latencies.append(delivered_at - emitted[key])
+        latencies.sort()
+        elapsed = (client.delivered[-1][2] if client.delivered else time.perf_counter()) - started
+        await client.disconnect()
+        await task
+        return len(emitted), elapsed, latencies
+
+
+def bench_load():
+    """
+    Load-tests the whole bot offline: telegram_channel_forwarder.run_account (login,
+    channel resolution, handler, dedup, outbox, queue, scheduler and send_to_target)
+    runs against the fake client with LOAD_RPC_LATENCY_SECONDS per RPC, and a burst of
+    LOAD_MESSAGES synthetic messages is emitted over 1 to 1,000 sources. Reports
+    forwarded messages/s, emit-to-forward latency percentiles and process RSS, once
+    cleanly and once with LOAD_FLOOD_WAIT_RATE of the forwards answered with a 1s
+    FloodWait and LOAD_PRIVATE_SOURCE_FRACTION of the sources private (unresolvable).
+    """
+    print(
+        f"--- Load test: {LOAD_MESSAGES} messages through run_account, "
+        f"{LOAD_RPC_LATENCY_SECONDS * 1000:.0f} ms fake RPCs ---"
+    )
+    print(
+        f"{'sources':>8} {'errors':>7} {'forwarded':>10} {'msgs/s':>8} "
+        f"{'p50 ms':>8} {'p99 ms':>8} {'RSS MiB':>8}"
+    )
+    scenarios = [(count, False) for count in LOAD_SOURCE_COUNTS]
+    scenarios.append((100, True))
+    for source_count, inject_errors in scenarios:
+        source_configs, _ = _fake_source_configs(source_count)
+        chat_ids = [config["id"] for config in source_configs]
+        stream = generate_messages(chat_ids, LOAD_MESSAGES, seed=source_count)
+        schedule = [(0.0, chat_id, message) for chat_id, message in stream]
+        options = {}
+        if inject_errors:
+            private_count = max(1, int(source_count * LOAD_PRIVATE_SOURCE_FRACTION))
+            options = {
+                "error_rates": {
+                    "forward_messages": (
+                        LOAD_FLOOD_WAIT_RATE,
+                        lambda: FloodWaitError(request=None, capture=1),
+                    )
+                },
+                "private_chats": chat_ids[:private_count],
+            }
+        client = FakeTelegramClient(LOAD_RPC_LATENCY_SECONDS, **options)
+        with tempfile.TemporaryDirectory() as state_dir:
+            emitted, elapsed, latencies = asyncio.run(
+                _run_forwarder(client, source_configs, schedule, state_dir)
+            )
+        print(
+            f"{source_count:>8} {'yes' if inject_errors else 'no':>7} "
+            f"{len(latencies):>5}/{emitted:<4} {len(latencies) / elapsed:>8.0f} "
+            f"{_percentile(latencies, 0.5) * 1000:>8.1f} {_percentile(latencies, 0.99) * 1000:>8.1f} "
+            f"{_rss_mib():>8.1f}"
+        )
+
+
+RESTART_MESSAGES = 5
+RESTART_STALLED_SEND_SECONDS = 60
+
+
+def bench_restart():
+    """
+    Crash recovery with the "spill" queue policy: a one-worker, one-slot queue stalls on
+    its first send while RESTART_MESSAGES messages arrive, so all but the first spill to
+    disk, and the account then stops without finishing any of them. After a restart
+    against a healthy client, every message must be forwarded exactly once: the outbox
+    replays them, and the leftover spill file must not replay them a second time.
+    """
+    source_configs, _ = _fake_source_configs(1)
+    chat_id = source_configs[0]["id"]
+    print(f"--- Restart: {RESTART_MESSAGES} messages, {RESTART_MESSAGES - 1} spilled, then a crash ---")
+
+    async def crash(forwarder):
+        client = FakeTelegramClient()
+        account, task = await _start_account(forwarder, client)
+        client.latency = RESTART_STALLED_SEND_SECONDS
+        for message_id in range(1, RESTART_MESSAGES + 1):
+            client.emit(chat_id, FakeMessage(message_id, chat_id=chat_id))
+        forward_queue = account.components["forward_queue"]
+        while forward_queue.stats["spilled"] < RESTART_MESSAGES - 1:
+            await asyncio.sleep(0.01)
+        await client.disconnect()
+        await task
+        # The stalled worker is cancelled with the event loop, like a killed process.
+
+    async def restart(forwarder):
+        client = FakeTelegramClient()
+        _, task = await _start_account(forwarder, client)
+        deadline = time.monotonic() + LOAD_TIMEOUT_SECONDS
+        while len(client.delivered) < RESTART_MESSAGES and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        # Anything replayed twice would arrive right behind the first copies.
+        await asyncio.sleep(0.5)
+        await client.disconnect()
+        await task
+        return sorted(message_id for _, message_id, _ in client.delivered)
+
+    with tempfile.TemporaryDirectory() as state_dir:
+        with _forwarder_environment(source_configs, state_dir) as forwarder:
+            saved = (
+                forwarder.FORWARD_QUEUE_POLICY,
+                forwarder.FORWARD_WORKERS,
+                forwarder.FORWARD_QUEUE_MAX_DEPTH,
+            )
+            forwarder.FORWARD_QUEUE_POLICY = "spill"
+            forwarder.FORWARD_WORKERS = 1
+            forwarder.FORWARD_QUEUE_MAX_DEPTH = 1
+            try:
+                asyncio.run(crash(forwarder))
+                spill_files = glob.glob(os.path.join(state_dir, "*forward_spill.jsonl"))
+                processed = asyncio.run(restart(forwarder))
+            finally:
+                (
+                    forwarder.FORWARD_QUEUE_POLICY,
+                    forwarder.FORWARD_WORKERS,
+                    forwarder.FORWARD_QUEUE_MAX_DEPTH,
+                ) = saved
+    print(f"spill files left by the crash: {len(spill_files)}")
+    print(f"message ids forwarded after the restart: {processed}")
+    assert spill_files, "the crash did not leave a spill file behind"
+    assert processed == list(range(1, RESTART_MESSAGES + 1)), "not every message was forwarded exactly once"
+
+
+# A recorded trace to replay (sessions/<prefix>trace.jsonl); a synthetic one otherwise.
+REPLAY_TRACE = os.getenv("REPLAY_TRACE")
+REPLAY_SPEEDS = [float(speed) for speed in os.getenv("REPLAY_SPEEDS", "1,10,100").split(",")]
+REPLAY_SAMPLE_SOURCES = 20
+REPLAY_SAMPLE_SECONDS = 30
+REPLAY_RPC_LATENCY_SECONDS = 0.005
+
+
+def _write_sample_trace(path):
+    """
+    Writes a synthetic trace of about REPLAY_SAMPLE_SECONDS through TraceRecorder with a mix
+    like real channels: scattered posts, bursts of short texts, albums, large
+    documents and edits, from REPLAY_SAMPLE_SOURCES sources (two protected).
+    """
+    import random
+
+    rng = random.Random(7)
+    source_configs, _ = _fake_source_configs(REPLAY_SAMPLE_SOURCES)
+    for config in source_configs[:2]:
+        config["protected_forwarding"] = True
+    chat_ids = [config["id"] for config in source_configs]
+    recorder = TraceRecorder(path, dict(zip(chat_ids, source_configs)))
+    started = time.monotonic()
+    stream = generate_messages(chat_ids, 1500, album_fraction=0.05, seed=7)
+    now = 0.0
+    position = 0
+    while position < len(stream):
+        now += rng.expovariate(1500 / REPLAY_SAMPLE_SECONDS)
+        burst = rng.randint(5, 15) if rng.random() < 0.05 else 1
+        for chat_id, message in stream[position : position + burst]:
+            if burst > 1:
+                message.media = None
+                message.message = message.message[:30]
+            elif message.media is not None and rng.random() < 0.1:
+                message.media.document.size = rng.randint(50, 1500) * 2**20
+            recorder.record(chat_id, message, KIND_NEW, started + now)
+            if rng.random() < 0.05:
+                recorder.record(chat_id, message, KIND_EDIT, started + now + 5)
+        position += burst
+    recorder.close()
+
+
+def _trace_schedule(protected, events, speed):
+    """Turns trace events into a _run_forwarder schedule at `speed` times real time."""
+    source_configs, _ = _fake_source_configs(len(protected))
+    for config, is_protected in zip(source_configs, protected):
+        config["protected_forwarding"] = is_protected
+    next_ids = {}
+    schedule = []
+    edits = 0
+    for number, event in enumerate(events):
+        if event["kind"] != KIND_NEW:
+            edits += 1  # The bot does not forward edits.
+            continue
+        chat_id = source_configs[event["source"]]["id"]
+        message_id = next_ids.get(chat_id, 1)
+        next_ids[chat_id] = message_id + 1
+        media = None
+        if event["media"]:
+            media = FakeTelegramClient.make_document_media(
+                event["size"], document_id=number + 1
+            )
+        text = f"Replayed post {number}".ljust(event["text_length"], ".")
+        message = FakeMessage(
+            message_id,
+            chat_id=chat_id,
+            text=text,
+            media=media,
+            grouped_id=event["album"] or None,
+        )
+        schedule.append((event["offset"] / speed, chat_id, message))
+    schedule.sort(key=lambda item: item[0])
+    return source_configs, schedule, edits
+
+
+def bench_replay():
+    """
+    Replays a recorded traffic trace (REPLAY_TRACE, written by the bot with
+    trace_recording_enabled) through run_account against the fake client at each
+    of REPLAY_SPEEDS times real time, and reports forwarded messages/s and
+    emit-to-send latency percentiles, so throughput or latency regressions seen live
+    can be reproduced offline. Without REPLAY_TRACE a synthetic sample trace is used.
+    Album windows are not scaled, so album latency stays the real one.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = REPLAY_TRACE
+        if not path:
+            path = os.path.join(tmp_dir, "sample_trace.jsonl")
+            _write_sample_trace(path)
+        protected, events = read_trace(path)
+        span = events[-1]["offset"] if events else 0.0
+        print(
+            f"--- Replay: {len(events)} events from {len(protected)} sources over {span:.0f}s "
+            f"({'sample trace' if not REPLAY_TRACE else REPLAY_TRACE}), "
+            f"{REPLAY_RPC_LATENCY_SECONDS * 1000:.0f} ms fake RPCs ---"
+        )
+        print(
+            f"{'speed':>6} {'wall s':>7} {'sent':>10} {'edits':>6} {'msgs/s':>8} "
+            f"{'p50 ms':>8} {'p99 ms':>8}"
+        )
+        for speed in REPLAY_SPEEDS:
+            source_configs, schedule, edits = _trace_schedule(protected, events, speed)
+            client = FakeTelegramClient(REPLAY_RPC_LATENCY_SECONDS)
+            state_dir = os.path.join(tmp_dir, f"state_{speed}")
+            os.makedirs(state_dir)
+            emitted, elapsed, latencies = asyncio.run(
+                _run_forwarder(client, source_configs, schedule, state_dir)
+            )
+            print(
+                f"{speed:>5g}x {elapsed:>7.1f} {len(latencies):>5}/{emitted:<4} {edits:>6} "
+                f"{len(latencies) / elapsed:>8.0f} {_percentile(latencies, 0.5) * 1000:>8.1f} "
+                f"{_percentile(latencies, 0.99) * 1000:>8.1f}"
+            )
+
+
+FANOUT_TARGET_COUNTS = [1, 2, 5, 10]
+FANOUT_MESSAGES = 10
+FANOUT_FILE_SIZE = 4 * 1024 * 1024
+FANOUT_RPC_LATENCY_SECONDS = 0.005
+
+
+def bench_fanout():
+    """
+    Sends FANOUT_MESSAGES documents from one source to 1..10 targets with one call per
+    message, once as forwards and once as copies from a content-protected source, and
+    reports wall time, bytes transferred and uploads per message. Forwards to all
+    targets run concurrently; copies re-upload each file once, whatever the fan-out.
+    """
+    logging.getLogger("helpers.forwarding").setLevel(logging.WARNING)
+    logging.getLogger("helpers.media_copy").setLevel(logging.WARNING)
+    source_config = {"title": "Source"}
+    print(
+        f"--- Fan-out: {FANOUT_MESSAGES} x {FANOUT_FILE_SIZE // 1024} KiB documents, "
+        f"{FANOUT_RPC_LATENCY_SECONDS * 1000:.0f} ms fake RPCs ---"
+    )
+    print(
+        f"{'mode':>8} {'targets':>8} {'ms/message':>11} {'MiB/message':>12} "
+        f"{'uploads':>8} {'reused':>7}"
+    )
+
+    async def run(mode, target_count):
+        client = FakeTelegramClient(
+            FANOUT_RPC_LATENCY_SECONDS, protected_media=mode == MODE_COPY
+        )
+        copier = MediaCopier(client)
+        routes = [
+            Route(n, FakeTelegramClient.make_channel(n, title=f"Target {n}"), mode)
+            for n in range(1, target_count + 1)
+        ]
+        started = time.perf_counter()
+        for i in range(FANOUT_MESSAGES):
+            message = FakeMessage(
+                i,
+                chat_id=-1001000,
+                media=FakeTelegramClient.make_document_media(FANOUT_FILE_SIZE, i + 1),
+            )
+            results = await send_to_targets(
+                client, [message], source_config, routes, media_copier=copier
+            )
+            assert all(results)
+        elapsed = time.perf_counter() - started
+        transferred = client.bytes_downloaded + client.bytes_uploaded
+        return elapsed, transferred, copier.stats
+
+    for mode in (MODE_FORWARD, MODE_COPY):
+        for target_count in FANOUT_TARGET_COUNTS:
+            elapsed, transferred, stats = asyncio.run(run(mode, target_count))
+            print(
+                f"{mode:>8} {target_count:>8} {elapsed / FANOUT_MESSAGES * 1000:>11.1f} "
+                f"{transferred / FANOUT_MESSAGES / 2**20:>12.1f} "
+                f"{stats['reuploaded'] / FANOUT_MESSAGES:>8.1f} "
+                f"{stats['reused_across_targets']:>7}"
+            )
+
+
+FILTER_RULE_COUNTS = [10, 100, 1000, 10000]
+FILTER_MESSAGES = 200
+FILTER_MESSAGE_WORDS = 80
+
+
+def _random_word(rng, length):
+    return "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(length))
+
+
+def bench_content_filter():
+    """
+    Checks FILTER_MESSAGES messages of FILTER_MESSAGE_WORDS words against synthetic
+    rule sets of increasing size (one random keyword per rule, nearly all "drop",
+    plus one regex rule), once with a per-rule loop of precompiled case-insensitive
+    regexes and once with the compiled ContentFilter, and reports microseconds per
+    message, the compile time and that both agree on every message.
+    """
+    rng = random.Random(0)
+    vocabulary = [_random_word(rng, rng.randint(3, 9)) for _ in range(5000)]
+    messages = [
+        " ".join(rng.choice(vocabulary) for _ in range(FILTER_MESSAGE_WORDS))
+        for _ in range(FILTER_MESSAGES)
+    ]
+    print(
+        f"--- Content filter: {FILTER_MESSAGES} messages of ~{sum(map(len, messages)) // FILTER_MESSAGES} "
+        f"characters ---"
+    )
+    print(
+        f"{'rules':>7} {'per-rule us/msg':>16} {'compiled us/msg':>16} {'compile ms':>11} "
+        f"{'dropped':>8} {'agree':>6}"
+    )
+    for rule_count in FILTER_RULE_COUNTS:
+        # Keywords that never occur in the vocabulary, plus a few that do, so some
+        # messages are dropped and most are scanned to the end.
+        keywords = [_random_word(rng, 10) for _ in range(rule_count - 4)]
+        keywords += rng.sample(vocabulary, 3)
+        rules = [{"keywords": [keyword], "action": "drop"} for keyword in keywords]
+        rules.append({"regex": r"\bzz[a-z]+q\b", "targets": [2]})
+
+        naive_patterns = [
+            (re.compile(re.escape(keyword), re.IGNORECASE), ()) for keyword in keywords
+        ] + [(re.compile(r"\bzz[a-z]+q\b", re.IGNORECASE), (2,))]
+
+        def naive(text):
+            outcomes = set()
+            for pattern, outcome in naive_patterns:
+                if pattern.search(text):
+                    if not outcome:
+                        return ()
+                    outcomes.add(outcome)
+            return tuple(sorted(set().union(*outcomes))) if outcomes else (1, 2)
+
+        started = time.perf_counter()
+        content_filter = ContentFilter(rules, target_numbers=[1, 2])
+        compile_ms = (time.perf_counter() - started) * 1000
+        naive_seconds = min(
+            timeit.repeat(lambda: [naive(m) for m in messages], number=1, repeat=3)
+        )
+        compiled_seconds = min(
+            timeit.repeat(
+                lambda: [content_filter.targets(m) for m in messages], number=1, repeat=3
+            )
+        )
+        agree = all(naive(m) == content_filter.targets(m) for m in messages)
+        dropped = sum(1 for m in messages if not content_filter.targets(m))
+        print(
+            f"{rule_count:>7} {naive_seconds / FILTER_MESSAGES * 1e6:>16.1f} "
+            f"{compiled_seconds / FILTER_MESSAGES * 1e6:>16.1f} {compile_ms:>11.1f} "
+            f"{dropped:>8} {str(agree):>6}"
+        )
+
+
+TRANSFORM_MESSAGES = 200
+TRANSFORM_MESSAGE_WORDS = 600
+TRANSFORM_REPLACEMENT_COUNTS = [1, 5, 20]
+
+
+def _entity_message(rng, vocabulary):
+    """A long text with emoji, links and mentions, and its (UTF-16) entities."""
+    pieces = []
+    entities = []
+    length16 = 0
+    for _ in range(TRANSFORM_MESSAGE_WORDS):
+        roll = rng.random()
+        if roll < 0.03:
+            word, entity = f"https://example.com/{rng.choice(vocabulary)}", MessageEntityUrl
+        elif roll < 0.06:
+            word, entity = f"@{rng.choice(vocabulary)}_channel", MessageEntityMention
+        else:
+            word, entity = rng.choice(vocabulary), None
+            if roll < 0.12:
+                word += " \U0001F600"
+            elif roll < 0.18:
+                entity = MessageEntityBold
+        if entity is not None:
+            entities.append(entity(length16, utf16_length(word)))
+        elif roll < 0.2:
+            entities.append(MessageEntityTextUrl(length16, utf16_length(word), "https://x.y"))
+        pieces.append(word)
+        length16 += utf16_length(word) + 1
+    return " ".join(pieces), entities
+
+
+def bench_text_transform():
+    """
+    Rewrites TRANSFORM_MESSAGES long messages (~600 words with emoji, links, mentions
+    and ~120 entities) with strip_links, strip_mentions, a footer and a growing number
+    of word replacements: once with one single-rule TextTransform per rule applied in
+    turn (a pass over the text per rule) and once with all rules compiled into one
+    TextTransform, and reports messages per second and that both agree.
+    """
+    rng = random.Random(0)
+    vocabulary = [_random_word(rng, rng.randint(3, 9)) for _ in range(2000)]
+    messages = [_entity_message(rng, vocabulary) for _ in range(TRANSFORM_MESSAGES)]
+    print(
+        f"--- Text transform: {TRANSFORM_MESSAGES} messages of ~{sum(len(t) for t, _ in messages) // TRANSFORM_MESSAGES} "
+        f"characters and ~{sum(len(e) for _, e in messages) // TRANSFORM_MESSAGES} entities ---"
+    )
+    print(f"{'replacements':>12} {'per-rule msgs/s':>16} {'compiled msgs/s':>16} {'agree':>6}")
+    for replacement_count in TRANSFORM_REPLACEMENT_COUNTS:
+        replacements = [
+            (rf"\b{word}\b", word.upper()) for word in rng.sample(vocabulary, replacement_count)
+        ]
+        footer = "\n\nvia @mirror"
+        per_rule = [
+            TextTransform(strip_links=True),
+            TextTransform(strip_mentions=True),
+            *(TextTransform(replacements=[replacement]) for replacement in replacements),
+            TextTransform(footer=footer),
+        ]
+        compiled = TextTransform(
+            strip_links=True,
+            strip_mentions=True,
+            replacements=replacements,
+            footer=footer,
+        )
+
+        def chained(text, entities):
+            for text_transform in per_rule:
+                text, entities = text_transform.apply(text, entities)
+            return text, entities
+
+        def summary(result):
+            text, entities = result
+            return text, [(type(e), e.offset, e.length) for e in entities]
+
+        agree = all(
+            summary(chained(*message)) == summary(compiled.apply(*message))
+            for message in messages
+        )
+        chained_seconds = min(
+            timeit.repeat(lambda: [chained(*m) for m in messages], number=1, repeat=3)
+        )
+        compiled_seconds = min(
+            timeit.repeat(
+                lambda: [compiled.apply(*m) for m in messages], number=1, repeat=3
+            )
+        )
+        print(
+            f"{replacement_count:>12} {TRANSFORM_MESSAGES / chained_seconds:>16.0f} "
+            f"{TRANSFORM_MESSAGES / compiled_seconds:>16.0f} {str(agree):>6}"
+        )
+
+
+RELOAD_SOURCE_COUNT = 1000
+RELOAD_CHANGED_SOURCES = 100
+RELOAD_RPC_LATENCY_SECONDS = 0.005
+RELOAD_MESSAGE_INTERVAL_SECONDS = 0.002
+RELOAD_TRAFFIC_SECONDS = 2.0
+
+
+def bench_reload():
+    """
+    Runs the bot with RELOAD_SOURCE_COUNT sources under steady traffic, swaps
+    RELOAD_CHANGED_SOURCES of them for new ones in the environment and reloads while
+    messages keep arriving from every source. Reports startup against reload time and
+    the get_entity RPCs each needed (a restart resolves every source again, a reload
+    only the new ones), and checks that every message of the unchanged sources was
+    forwarded across the swap, the new sources are forwarded from the reload on and
+    the removed ones no longer are.
+    """
+    all_configs, _ = _fake_source_configs(RELOAD_SOURCE_COUNT + RELOAD_CHANGED_SOURCES)
+    initial = all_configs[:RELOAD_SOURCE_COUNT]
+    reloaded = all_configs[RELOAD_CHANGED_SOURCES:]
+    removed_ids = {config["id"] for config in all_configs[:RELOAD_CHANGED_SOURCES]}
+    added_ids = {config["id"] for config in all_configs[RELOAD_SOURCE_COUNT:]}
+    print(
+        f"--- Reload: {RELOAD_SOURCE_COUNT} sources, {RELOAD_CHANGED_SOURCES} replaced while "
+        f"a message arrives every {RELOAD_MESSAGE_INTERVAL_SECONDS * 1000:.0f} ms, "
+        f"{RELOAD_RPC_LATENCY_SECONDS * 1000:.0f} ms fake RPCs ---"
+    )
+
+    async def run(state_dir):
+        client = FakeTelegramClient(RELOAD_RPC_LATENCY_SECONDS)
+        with _forwarder_environment(initial, state_dir) as forwarder:
+            started = time.perf_counter()
+            account, task = await _start_account(forwarder, client)
+            startup_seconds = time.perf_counter() - started
+            startup_lookups = client.rpc_counts.get("get_entity", 0)
+
+            rng = random.Random(0)
+            chat_ids = [config["id"] for config in all_configs]
+            next_ids = dict.fromkeys(chat_ids, 1)
+            # chat id -> [(message id, whether the bot routed that chat when it arrived)]
+            emitted = {chat_id: [] for chat_id in chat_ids}
+
+            async def traffic():
+                deadline = time.perf_counter() + RELOAD_TRAFFIC_SECONDS
+                while time.perf_counter() < deadline:
+                    chat_id = rng.choice(chat_ids)
+                    message = FakeMessage(
+                        next_ids[chat_id],
+                        chat_id=chat_id,
+                        text=f"Reload post {next_ids[chat_id]} from {chat_id}",
+                        date=datetime.now(timezone.utc),
+                    )
+                    next_ids[chat_id] += 1
+                    emitted[chat_id].append((message.id, client.handles(chat_id)))
+                    client.emit(chat_id, message)
+                    await asyncio.sleep(RELOAD_MESSAGE_INTERVAL_SECONDS)
+
+            traffic_task = asyncio.create_task(traffic())
+            await asyncio.sleep(RELOAD_TRAFFIC_SECONDS / 4)
+            _set_source_environment(reloaded)
+            lookups_before = client.rpc_counts.get("get_entity", 0)
+            started = time.perf_counter()
+            await account.reload_sources()
+            reload_seconds = time.perf_counter() - started
+            reload_lookups = client.rpc_counts.get("get_entity", 0) - lookups_before
+            await traffic_task
+
+            # Messages of removed sources still queued at the swap may be dropped.
+            expected = {
+                (chat_id, message_id)
+                for chat_id, messages in emitted.items()
+                if chat_id not in removed_ids
+                for message_id, routed in messages
+                if routed
+            }
+            deadline = time.monotonic() + LOAD_TIMEOUT_SECONDS
+            while time.monotonic() < deadline:
+                delivered = {(chat_id, message_id) for chat_id, message_id, _ in client.delivered}
+                if expected <= delivered:
+                    break
+                await asyncio.sleep(0.05)
+            await client.disconnect()
+            await task
+
+        kept_ok = all(
+            (chat_id, message_id) in delivered
+            for chat_id, messages in emitted.items()
+            if chat_id not in removed_ids and chat_id not in added_ids
+            for message_id, _ in messages
+        )
+        added_after = sum(
+            1 for chat_id, message_id in delivered if chat_id in added_ids
+        )
+        removed_after = sum(
+            1
+            for chat_id in removed_ids
+            for message_id, routed in emitted[chat_id]
+            if not routed and (chat_id, message_id) in delivered
+        )
+        return (
+            startup_seconds,
+            startup_lookups,
+            reload_seconds,
+            reload_lookups,
+            kept_ok,
+            added_after,
+            removed_after,
+        )
+
+    with tempfile.TemporaryDirectory() as state_dir:
+        (
+            startup_seconds,
+            startup_lookups,
+            reload_seconds,
+            reload_lookups,
+            kept_ok,
+            added_after,
+            removed_after,
+        ) = asyncio.run(run(state_dir))
+    print(f"{'':>8} {'seconds':>8} {'get_entity':>11}")
+    print(f"{'startup':>8} {startup_seconds:>8.2f} {startup_lookups:>11}")
+    print(f"{'reload':>8} {reload_seconds:>8.2f} {reload_lookups:>11}")
+    print(
+        f"unchanged sources forwarded without a gap: {kept_ok}; "
+        f"new sources forwarded: {added_after} message(s); "
+        f"removed sources forwarded after the reload: {removed_after}"
+    )
+
+
+CHANNEL_STORE_COUNTS = [1000, 10000, 50000]
+CHANNEL_STORE_ENV_COUNTS = [1000, 10000]
+CHANNEL_STORE_OVERLAY = 1000
+CHANNEL_STORE_RUNS = 3
+
+
+def _channel_store_configs(count):
+    """Source configs in the mix seen in real stores: ids, usernames, invite hashes, routes."""
+    configs, _ = _fake_source_configs(count)
+    for i, config in enumerate(configs):
+        if i % 10 == 1:
+            del config["id"]
+            config["username"] = f"source_{i}"
+        elif i % 10 == 2:
+            config["type"] = "private"
+            config["invite_hash"] = f"hash{i}"
+        if i % 4 == 0:
+            config["targets"] = [{"target": 1, "mode": MODE_COPY}]
+    return configs
+
+
+def bench_channel_store():
+    """
+    Measures how long an account takes to load its source channels from a
+    SOURCE_CHANNELS_FILE of up to CHANNEL_STORE_COUNTS entries, against the same
+    sources as SOURCE_CHANNEL_N variables, and with CHANNEL_STORE_OVERLAY variables
+    overriding entries of a 10,000-entry file. The cost per entry should stay flat as
+    the file grows.
+    """
+    print(
+        f"--- Channel store: loading source channels (best of {CHANNEL_STORE_RUNS}) ---"
+    )
+    print(f"{'entries':>8} {'source':>12} {'ms':>9} {'us/entry':>9} {'loaded':>7}")
+    file_variable = f"{LOAD_ENV_PREFIX}SOURCE_CHANNELS_FILE"
+
+    def best_load(account):
+        best = None
+        for _ in range(CHANNEL_STORE_RUNS):
+            started = time.perf_counter()
+            configs = account.load_source_channel_configs()
+            seconds = time.perf_counter() - started
+            best = seconds if best is None else min(best, seconds)
+        return best, len(configs)
+
+    def report(count, source, seconds, loaded):
+        print(
+            f"{count:>8} {source:>12} {seconds * 1000:>9.1f} {seconds / count * 1e6:>9.1f} {loaded:>7}"
+        )
+
+    with tempfile.TemporaryDirectory() as state_dir:
+        all_configs = _channel_store_configs(max(CHANNEL_STORE_COUNTS))
+        with _forwarder_environment(all_configs[:1], state_dir) as forwarder:
+            account = forwarder.ForwarderAccount(
+                {"env_prefix": LOAD_ENV_PREFIX, "title": "Channel store"},
+                client=FakeTelegramClient(),
+            )
+            try:
+                for count in CHANNEL_STORE_COUNTS:
+                    path = os.path.join(state_dir, f"sources_{count}.jsonl")
+                    with open(path, "w", encoding="utf-8") as f:
+                        for config in all_configs[:count]:
+                            f.write(json.dumps(config) + "\n")
+                    _set_source_environment([])
+                    os.environ[file_variable] = path
+                    report(count, "file", *best_load(account))
+                    if count in CHANNEL_STORE_ENV_COUNTS:
+                        del os.environ[file_variable]
+                        _set_source_environment(all_configs[:count])
+                        report(count, "env vars", *best_load(account))
+                    if count == 10000:
+                        # Every tenth source overridden, every hundredth disabled.
+                        overlay = []
+                        for config in all_configs[: count : count // CHANNEL_STORE_OVERLAY]:
+                            config = dict(config, title=f"{config['title']} (env)")
+                            if len(overlay) % 10 == 0:
+                                config["active"] = False
+                            overlay.append(config)
+                        _set_source_environment(overlay)
+                        os.environ[file_variable] = path
+                        report(count, "file+overlay", *best_load(account))
+            finally:
+                os.environ.pop(file_variable, None)
+
+
+BENCHMARKS = {
+    "routing": bench_routing,
+    "resolve": bench_resolve,
+    "entity_cache": bench_entity_cache,
+    "album": bench_album,
+    "queue": bench_queue,
+    "scheduler": bench_scheduler,
+    "coalesce": bench_coalesce,
+    "media_copy": bench_media_copy,
+    "media_pipe": bench_media_pipe,
+    "dedup": bench_dedup,
+    "outbox": bench_outbox,
+    "restart": bench_restart,
+    "backfill": bench_backfill,
+    "accounts": bench_accounts,
+    "event_loop": bench_event_loop,
+    "metrics": bench_metrics,
+    "tracing": bench_tracing,
+    "logging": bench_logging,
+    "load": bench_load,
+    "replay": bench_replay,
+    "fanout": bench_fanout,
+    "content_filter": bench_content_filter,
+    "text_transform": bench_text_transform,
+    "reload": bench_reload,
+    "channel_store": bench_channel_store,
+}
+
+
+if __name__ == "__main__":
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    unknown = [name for name in selected if name not in BENCHMARKS]
+    if unknown:
+        print(f"ERROR: Unknown benchmark(s): {', '.join(unknown)}")
+        print(f"Available benchmarks: {', '.join(BENCHMARKS)}")
+        sys.exit(1)
+    for name in selected:
+        started = time.perf_counter()
+        BENCHMARKS[name]()
+        print(f"({name} finished in {time.perf_counter() - started:.2f}s)\n")
@@ -0,0 +1,229 @@
+import asyncio
+import logging
+import time
+from telethon.tl.functions.messages import ImportChatInviteRequest
+from telethon.errors import (
+    UserAlreadyParticipantError,
+    InviteHashExpiredError,
+    ChatIdInvalidError,
+    ChannelPrivateError,
+    UserNotParticipantError,
+    FloodWaitError,
+)
+
+resolver_logger = logging.getLogger(__name__)
+
+# Default number of source channels joined/resolved at the same time.
+DEFAULT_RESOLVE_CONCURRENCY = 8
+# FloodWait responses longer than this (in seconds) are not waited out; the channel is skipped instead.
+DEFAULT_MAX_FLOOD_WAIT_SECONDS = 300
+# FloodWaits up to this long (in seconds) are slept out by Telethon itself on every RPC,
+# so calls outside the resolver and the send scheduler (logins, media part transfers,
+# notifications) survive short ones; longer ones reach the resolver and scheduler,
+# which back off on them.
+DEFAULT_FLOOD_SLEEP_THRESHOLD_SECONDS = 5
+# How many times a single RPC is retried after FloodWait before the channel is skipped.
+MAX_FLOOD_WAIT_RETRIES = 3
+
+
+class FloodGate:
+    """
+    Shared pause point for all resolver tasks. When one task receives a FloodWait,
+    every task waits until the deadline passes instead of hammering the server and
+    collecting FloodWaits of its own.
+    """
+
+    def __init__(self):
+        self._open_at = 0.0
+
+    def close_for(self, seconds):
+        self._open_at = max(self._open_at, time.monotonic() + seconds)
+
+    async def wait(self):
+        delay = self._open_at - time.monotonic()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self._open_at - time.monotonic()
+
+
+async def call_with_flood_wait(
+    request_factory, flood_gate, channel_name, max_flood_wait=DEFAULT_MAX_FLOOD_WAIT_SECONDS
+):
+    """
+    Awaits `request_factory()` and retries it after sleeping out any FloodWait the
+    server returns. FloodWaits longer than `max_flood_wait` (or repeated more than
+    MAX_FLOOD_WAIT_RETRIES times) are re-raised so the caller can skip the channel.
+    """
+    for attempt in range(MAX_FLOOD_WAIT_RETRIES + 1):
+        await flood_gate.wait()
+        try:
+            return await request_factory()
+        except FloodWaitError as e:
+            if e.seconds > max_flood_wait or attempt == MAX_FLOOD_WAIT_RETRIES:
+                raise
+            resolver_logger.warning(
+                f"FloodWait of {e.seconds}s while resolving '{channel_name}'. Pausing channel resolution before retrying..."
+            )
+            flood_gate.close_for(e.seconds + 1)
+
+
+async def resolve_source_channel(
+    client,
+    source_config,
+    flood_gate,
+    max_flood_wait=DEFAULT_MAX_FLOOD_WAIT_SECONDS,
+    entity_cache=None,
+):
+    """
+    Joins (for private channels with an invite hash) and resolves a single source channel.
+    Returns the resolved entity, or None if the channel should be skipped. Errors are
+    logged here, so one bad channel never stops the others from being resolved.
+    With an `entity_cache`, cached joins and entities are reused instead of calling Telegram.
+    """
+    source_identifier = source_config.get("id") or source_config.get("username")
+    source_channel_name_for_logs = source_config.get("title", source_identifier)
+
+    resolver_logger.info(
+        f"Attempting to resolve source channel '{source_channel_name_for_logs}' (ID/Username: {source_identifier})...."
+    )
+
+    invite_hash = (
+        source_config.get("invite_hash")
+        if source_config.get("type") == "private"
+        else None
+    )
+    if invite_hash and entity_cache is not None and entity_cache.has_joined(invite_hash):
+        entity = entity_cache.joined_entity(invite_hash)
+        if entity is not None:
+            resolver_logger.info(
+                f"Source private channel '{source_channel_name_for_logs}' was joined recently and resolved from the entity cache: {entity.title}"
+            )
+            return entity
+        resolver_logger.info(
+            f"Source private channel '{source_channel_name_for_logs}' was joined recently (entity cache). Skipping invite import."
+        )
+    elif invite_hash:
+        resolver_logger.info(
+            f"Attempting to ensure membership in source private channel '{source_channel_name_for_logs}' using invite hash..."
+        )
+        try:
+            updates = await call_with_flood_wait(
+                lambda: client(ImportChatInviteRequest(invite_hash)),
+                flood_gate,
+                source_channel_name_for_logs,
+                max_flood_wait,
+            )
+            resolver_logger.info(
+                f"Successfully joined or already a member of source channel '{source_channel_name_for_logs}'."
+            )
+            if entity_cache is not None:
+                # The joined channel comes back with the updates; cached with the join.
+                chats = getattr(updates, "chats", None) or []
+                entity_cache.mark_joined(invite_hash, chats[0] if chats else None)
+        except UserAlreadyParticipantError:
+            resolver_logger.info(
+                f"Telethon account is already a participant in source channel '{source_channel_name_for_logs}'."
+            )
+            if entity_cache is not None:
+                entity_cache.mark_joined(invite_hash)
+        except InviteHashExpiredError:
+            resolver_logger.error(
+                f"ERROR: The invite hash '{invite_hash}' for source channel '{source_channel_name_for_logs}' has expired or is invalid. Skipping this channel."
+            )
+            return None
+        except ChatIdInvalidError:
+            resolver_logger.error(
+                f"ERROR: The invite hash '{invite_hash}' for source channel '{source_channel_name_for_logs}' corresponds to an invalid chat ID. Skipping this channel."
+            )
+            return None
+        except FloodWaitError as e:
+            resolver_logger.error(
+                f"ERROR: Telegram asked to wait {e.seconds}s before joining source channel '{source_channel_name_for_logs}', which exceeds the allowed wait. Skipping this channel."
+            )
+            return None
+        except Exception as e:
+            resolver_logger.error(
+                f"ERROR: An unexpected error occurred while attempting to join source channel '{source_channel_name_for_logs}' with invite hash '{invite_hash}': {e}. Skipping this channel.",
+                exc_info=True,
+            )
+            return None
+    elif (
+        source_config.get("type") == "private"
+        and not source_config.get("invite_hash")
+        and source_config.get("id")
+    ):
+        resolver_logger.info(
+            f"Source private channel '{source_channel_name_for_logs}' configured with ID only. Assuming account is already a member. Proceeding to get entity."
+        )
+    else:
+        resolver_logger.info(
+            f"Source channel '{source_channel_name_for_logs}' is configured as public or has no specific type/invite hash. Proceeding to get entity."
+        )
+
+    try:
+        if entity_cache is not None:
+            get_entity = lambda: entity_cache.get_entity(client, source_identifier)
+        else:
+            get_entity = lambda: client.get_entity(source_identifier)
+        entity = await call_with_flood_wait(
+            get_entity,
+            flood_gate,
+            source_channel_name_for_logs,
+            max_flood_wait,
+        )
+        resolver_logger.info(
+            f"Source channel resolved: {entity.title} (ID/Username: {source_identifier})"
+        )
+        if invite_hash and entity_cache is not None:
+            # So the next start resolves this invite without any RPC.
+            entity_cache.mark_joined(invite_hash, entity)
+        return entity
+    except ChannelPrivateError:
+        resolver_logger.error(
+            f"ERROR: Source channel '{source_channel_name_for_logs}' (ID: {source_identifier}) is private and could not be accessed. Your account must be a member or the invite_hash was incorrect (if applicable). Skipping this channel."
+        )
+    except UserNotParticipantError:
+        resolver_logger.error(
+            f"ERROR: Your account is not a participant in source channel '{source_channel_name_for_logs}' (ID: {source_identifier}). Please join it first or provide a valid invite_hash if it's private. Skipping this channel."
+        )
+    except FloodWaitError as e:
+        resolver_logger.error(
+            f"ERROR: Telegram asked to wait {e.seconds}s before resolving source channel '{source_channel_name_for_logs}', which exceeds the allowed wait. Skipping this channel."
+        )
+    except Exception as e:
+        resolver_logger.error(
+            f"ERROR: Could not resolve source channel '{source_channel_name_for_logs}' (ID: {source_identifier}). Please check the username/ID and ensure your account can access it: {e}. Skipping this channel.",
+            exc_info=True,
+        )
+    return None
+
+
+async def resolve_source_channels(
+    client,
+    source_configs,
+    concurrency=DEFAULT_RESOLVE_CONCURRENCY,
+    max_flood_wait=DEFAULT_MAX_FLOOD_WAIT_SECONDS,
+    entity_cache=None,
+):
+    """
+    Joins and resolves all source channels with at most `concurrency` channels in
+    flight at once. Returns a list of (entity, source_config) pairs, in the same order
+    as `source_configs`, for the channels that resolved successfully.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    flood_gate = FloodGate()
+
+    async def resolve_bounded(source_config):
+        async with semaphore:
+            return await resolve_source_channel(
+                client, source_config, flood_gate, max_flood_wait, entity_cache
+            )
+
+    entities = await asyncio.gather(
+        *(resolve_bounded(source_config) for source_config in source_configs)
+    )
+    return [
+        (entity, source_config)
+        for entity, source_config in zip(entities, source_configs)
+        if entity is not None
+    ]
@@ -0,0 +1,41 @@
+import logging
+import os
+
+channel_store_logger = logging.getLogger(__name__)
+
+
+class SourceChannelFile:
+    """
+    A JSON-lines file of source channel configs, one JSON object per line in the same
+    format as a SOURCE_CHANNEL_N variable, for accounts with more sources than are
+    practical to keep in .env. Blank lines and lines starting with '#' are ignored.
+    The file is read one line at a time, so memory and parse time grow only with the
+    number of entries.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._mtime = None
+
+    def _current_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def entries(self):
+        """
+        Yields (origin, channel_config_str) for each config line, where origin is
+        "path:line" for error messages. Raises OSError if the file cannot be read.
+        """
+        self._mtime = self._current_mtime()
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                yield f"{self.path}:{line_number}", line
+
+    def changed(self):
+        """Whether the file was modified (or appeared or vanished) since it was last read."""
+        return self._current_mtime() != self._mtime
@@ -27,6 +27,16 @@ def parse_channel_env_var(env_var_name):
         )
         raise ValueError(f"Missing or empty environment variable: {env_var_name}")
 
+    channel_data = parse_channel_json(channel_config_str, env_var_name)
+    return validate_channel_config(channel_data, env_var_name)
+
+
+def parse_channel_json(channel_config_str, origin):
+    """
+    Decodes one channel configuration JSON string. `origin` names where it came from
+    (an environment variable, or file:line of a source channel file) in errors.
+    Raises ValueError for invalid JSON.
+    """
     # --- Robustness Fix: Attempt to strip potential outer single or double quotes ---
     # This helps when ENV systems (like some Replit setups) incorrectly wrap the JSON in extra quotes
     if (channel_config_str.startswith("'") and channel_config_str.endswith("'")) or (
@@ -37,42 +47,54 @@ def parse_channel_env_var(env_var_name):
     # --- End Robustness Fix ---
 
     try:
-        channel_data = json.loads(channel_config_str)
+        return json.loads(channel_config_str)
     except json.JSONDecodeError as e:
         parser_logger.critical(
-            f"FATAL ERROR: '{env_var_name}' is not a valid JSON string: '{channel_config_str}'. Error: {e}"
+            f"FATAL ERROR: '{origin}' is not a valid JSON string: '{channel_config_str}'. Error: {e}"
         )
-        raise ValueError(f"Invalid JSON for {env_var_name}: {e}")
+        raise ValueError(f"Invalid JSON for {origin}: {e}")
     except Exception as e:
         parser_logger.critical(
-            f"FATAL ERROR: An unexpected error occurred parsing '{env_var_name}': {e}",
+            f"FATAL ERROR: An unexpected error occurred parsing '{origin}': {e}",
             exc_info=True,
         )
-        raise RuntimeError(f"Unexpected parsing error for {env_var_name}: {e}")
+        raise RuntimeError(f"Unexpected parsing error for {origin}: {e}")
+
+
+def validate_channel_config(channel_data, origin):
+    """
+    Validates a decoded channel configuration (see parse_channel_json) and fills in
+    its title. Returns the dictionary, or None if the channel is marked inactive.
+    Raises ValueError if an active channel's configuration is invalid.
+    """
+    # Convert simple string (if allowed by json.loads, which it won't be if it's not quoted)
+    # This block is mainly for robustness, though current usage expects a JSON object.
+    if isinstance(channel_data, str):
+        # If it's just a string, assume it's a username/title
+        channel_data = {"username": channel_data, "title": channel_data}
+    if not isinstance(channel_data, dict):
+        parser_logger.critical(
+            f"FATAL ERROR: '{origin}' must be a JSON object, not {type(channel_data).__name__}."
+        )
+        raise ValueError(f"Channel configuration in {origin} is not a JSON object")
 
     # --- NEW: Check for 'active' flag. This is the key change. ---
     # If 'active' key is present and explicitly set to False, return None
     # to signal to the main script that this channel should be skipped entirely.
     if "active" in channel_data and not channel_data["active"]:
         parser_logger.info(
-            f"Channel from '{env_var_name}' is marked as inactive and will be skipped."
+            f"Channel from '{origin}' is marked as inactive and will be skipped."
         )
         return None
     # --- END NEW ---
 
-    # Convert simple string (if allowed by json.loads, which it won't be if it's not quoted)
-    # This block is mainly for robustness, though current usage expects a JSON object.
-    if isinstance(channel_data, str):
-        # If it's just a string, assume it's a username/title
-        channel_data = {"username": channel_data, "title": channel_data}
-
     # Basic validation for required fields
     identifier_present = channel_data.get("username") or channel_data.get("id")
     if not identifier_present:
         parser_logger.critical(
-            f"FATAL ERROR: '{env_var_name}' JSON is missing 'username' or 'id'. Please provide at least one."
+            f"FATAL ERROR: '{origin}' JSON is missing 'username' or 'id'. Please provide at least one."
         )
-        raise ValueError(f"Missing identifier (username or id) for {env_var_name}")
+        raise ValueError(f"Missing identifier (username or id) for {origin}")
 
     # Ensure title is present for logging clarity
     if not channel_data.get("title"):
@@ -80,17 +102,15 @@ def parse_channel_env_var(env_var_name):
             channel_data.get("id")
         )
         parser_logger.warning(
-            f"Warning: '{env_var_name}' JSON is missing 'title'. Using '{channel_data['title']}' for logging."
+            f"Warning: '{origin}' JSON is missing 'title'. Using '{channel_data['title']}' for logging."
         )
 
     # Validate private channel specifics
     if channel_data.get("type") == "private":
         if not channel_data.get("invite_hash") and not channel_data.get("id"):
             parser_logger.critical(
-                f"FATAL ERROR: Private channel '{env_var_name}' is missing 'invite_hash' or 'id'. For private channels, either an 'invite_hash' (to join) or an 'id' (if already a member) is required."
-            )
-            raise ValueError(
-                f"Private channel {env_var_name} is missing invite_hash or id."
+                f"FATAL ERROR: Private channel '{origin}' is missing 'invite_hash' or 'id'. For private channels, either an 'invite_hash' (to join) or an 'id' (if already a member) is required."
             )
+            raise ValueError(f"Private channel {origin} is missing invite_hash or id.")
 
     return channel_data
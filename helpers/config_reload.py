@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import os
+from dotenv import dotenv_values
+
+config_reload_logger = logging.getLogger(__name__)
+
+# How often the .env file is checked for changes; 0 disables polling (SIGHUP still
+# triggers a reload).
+DEFAULT_CONFIG_RELOAD_INTERVAL_SECONDS = 0
+
+
+class EnvFileReloader:
+    """
+    Loads a .env file into os.environ and reloads it on demand. Values added or changed
+    in the file are applied and values removed from it are unset again. Variables that
+    were set in the real environment before the first load always win, as with
+    load_dotenv() (which does not override them).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._environment_keys = set(os.environ)
+        self._loaded_keys = set()
+        self._mtime = None
+
+    def _current_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def load(self):
+        """(Re)loads the file; returns the names of the variables whose value changed."""
+        if not self.path:
+            return set()
+        self._mtime = self._current_mtime()
+        values = {
+            key: value
+            for key, value in dotenv_values(self.path).items()
+            if value is not None and key not in self._environment_keys
+        }
+        changed = set()
+        for key in self._loaded_keys - values.keys():
+            os.environ.pop(key, None)
+            changed.add(key)
+        for key, value in values.items():
+            if os.environ.get(key) != value:
+                os.environ[key] = value
+                changed.add(key)
+        self._loaded_keys = set(values)
+        return changed
+
+    def changed(self):
+        """Whether the file was modified (or appeared or vanished) since the last load."""
+        return bool(self.path) and self._current_mtime() != self._mtime
+
+
+async def watch_for_changes(watched, interval, callback):
+    """
+    Calls `await callback()` whenever one of the watched files changes, checking every
+    `interval` seconds. `watched()` returns the objects to check, each with a `path`
+    and a `changed()` method (an EnvFileReloader or a SourceChannelFile); it is
+    called on every check, so files added by a reload are watched too.
+    """
+    config_reload_logger.info(
+        f"Watching the configuration files for changes every {interval}s."
+    )
+    while True:
+        await asyncio.sleep(interval)
+        changed = [item.path for item in watched() if item.changed()]
+        if changed:
+            config_reload_logger.info(
+                f"{', '.join(changed)} changed. Reloading the configuration..."
+            )
+            try:
+                await callback()
+            except Exception as e:
+                config_reload_logger.error(
+                    f"ERROR: Reloading the configuration failed: {e}", exc_info=True
+                )
+
+
+def source_key(source_config):
+    """
+    What identifies a configured source across reloads: its id, else its username,
+    else its invite hash. A source whose key is unchanged keeps its resolved entity.
+    """
+    if source_config.get("id"):
+        return ("id", int(source_config["id"]))
+    if source_config.get("username"):
+        return ("username", str(source_config["username"]).lstrip("@").lower())
+    return ("invite_hash", source_config.get("invite_hash"))
+
+
+def diff_sources(resolved_by_key, source_configs):
+    """
+    Compares freshly parsed `source_configs` with the sources resolved so far
+    (`resolved_by_key`: source_key -> entity). Returns (kept, added, removed): kept
+    is a list of (entity, new source_config) pairs for sources that need no resolving,
+    added the configs to resolve, removed the keys no longer configured.
+    """
+    kept = []
+    added = []
+    keys = set()
+    for source_config in source_configs:
+        key = source_key(source_config)
+        if key in keys:
+            continue  # Configured twice; the routing table keeps the first one anyway.
+        keys.add(key)
+        entity = resolved_by_key.get(key)
+        if entity is not None:
+            kept.append((entity, source_config))
+        else:
+            added.append(source_config)
+    removed = [key for key in resolved_by_key if key not in keys]
+    return kept, added, removed
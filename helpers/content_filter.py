@@ -0,0 +1,264 @@
+import logging
+import re
+from collections import deque
+
+content_filter_logger = logging.getLogger(__name__)
+
+# What a rule does with the messages it matches:
+# "drop"    - the message is not sent anywhere (drop rules win over everything else)
+# "forward" - the message goes to the rule's "targets" (default: all of the source's targets)
+FILTER_DROP = "drop"
+FILTER_FORWARD = "forward"
+FILTER_ACTIONS = (FILTER_DROP, FILTER_FORWARD)
+# What happens to messages no rule matched; "drop" turns the rules into an allowlist.
+DEFAULT_FILTER_ACTION = FILTER_FORWARD
+
+
+class KeywordAutomaton:
+    """
+    An Aho-Corasick automaton over case-folded keywords. `search(text)` scans the text
+    once and returns the values of every keyword it contains, so the cost depends on
+    the length of the text, not on how many keywords there are. Keywords match
+    anywhere in the text, including inside words.
+    """
+
+    def __init__(self, keywords):
+        """`keywords` is an iterable of (keyword, value) pairs; a keyword may repeat."""
+        goto = [{}]
+        outputs = [set()]
+        for keyword, value in keywords:
+            state = 0
+            for char in keyword.casefold():
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = goto[state][char] = len(goto)
+                    goto.append({})
+                    outputs.append(set())
+                state = next_state
+            if state == 0:
+                raise ValueError("Keywords must not be empty.")
+            outputs[state].add(value)
+
+        # Breadth-first, so every state's failure link (its longest proper suffix that
+        # is also a keyword prefix) is complete before its children need it.
+        fail = [0] * len(goto)
+        pending = deque(goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, next_state in goto[state].items():
+                pending.append(next_state)
+                suffix = fail[state]
+                while suffix and char not in goto[suffix]:
+                    suffix = fail[suffix]
+                fail[next_state] = goto[suffix].get(char, 0)
+                outputs[next_state] |= outputs[fail[next_state]]
+
+        self._goto = goto
+        self._fail = fail
+        # None for states that end no keyword, so the scan skips them with one check.
+        self._outputs = [frozenset(values) if values else None for values in outputs]
+        self.states = len(goto)
+
+    def search(self, text):
+        goto = self._goto
+        fail = self._fail
+        outputs = self._outputs
+        found = set()
+        state = 0
+        for char in text.casefold():
+            while True:
+                next_state = goto[state].get(char)
+                if next_state is not None:
+                    state = next_state
+                    break
+                if not state:
+                    break
+                state = fail[state]
+            if outputs[state] is not None:
+                found |= outputs[state]
+        return found
+
+
+class ContentFilter:
+    """
+    A source's compiled "filters" rules. Every keyword of every rule goes into one
+    KeywordAutomaton, and the regexes of rules with the same outcome are joined into
+    one pattern, so checking a message is a single pass over its text plus one search
+    per distinct outcome, however many rules there are.
+    """
+
+    def __init__(self, rules, default=DEFAULT_FILTER_ACTION, target_numbers=()):
+        """
+        `rules` are dicts with "keywords" and/or "regex", an "action" and, for
+        "forward", optional "targets"; `target_numbers` are the source's route targets.
+        Raises ValueError for invalid rules.
+        """
+        if default not in FILTER_ACTIONS:
+            raise ValueError(
+                f"Unknown filter_default '{default}'. Expected one of: {', '.join(FILTER_ACTIONS)}"
+            )
+        self.target_numbers = tuple(target_numbers)
+        self.default = () if default == FILTER_DROP else self.target_numbers
+        # Rule index -> the targets it sends to; () for drop rules.
+        self._outcomes = []
+        keywords = []
+        # Outcome -> regexes of the rules with that outcome.
+        regexes = {}
+        for index, rule in enumerate(rules):
+            if not isinstance(rule, dict):
+                raise ValueError(f"Filter rule {index + 1} must be an object.")
+            outcome = self._outcome(index, rule)
+            self._outcomes.append(outcome)
+            rule_keywords = rule.get("keywords") or []
+            if isinstance(rule_keywords, str):
+                rule_keywords = [rule_keywords]
+            rule_regexes = rule.get("regex") or []
+            if isinstance(rule_regexes, str):
+                rule_regexes = [rule_regexes]
+            if not rule_keywords and not rule_regexes:
+                raise ValueError(
+                    f"Filter rule {index + 1} needs 'keywords' or 'regex' to match on."
+                )
+            for keyword in rule_keywords:
+                if not isinstance(keyword, str) or not keyword:
+                    raise ValueError(
+                        f"Filter rule {index + 1} has an invalid keyword {keyword!r}."
+                    )
+                keywords.append((keyword, index))
+            for pattern in rule_regexes:
+                try:
+                    re.compile(pattern)
+                except (re.error, TypeError) as e:
+                    raise ValueError(
+                        f"Filter rule {index + 1} has an invalid regex {pattern!r}: {e}"
+                    )
+                regexes.setdefault(outcome, []).append(pattern)
+
+        self._automaton = KeywordAutomaton(keywords) if keywords else None
+        try:
+            # Drop patterns first: a drop match decides the outcome on its own.
+            self._patterns = [
+                (
+                    outcome,
+                    re.compile(
+                        "|".join(f"(?:{pattern})" for pattern in patterns),
+                        re.IGNORECASE,
+                    ),
+                )
+                for outcome, patterns in sorted(regexes.items(), key=lambda i: bool(i[0]))
+            ]
+        except re.error as e:
+            raise ValueError(
+                f"The filter regexes cannot be combined (inline flags such as (?i) must be scoped, e.g. (?i:...)): {e}"
+            )
+        self.keyword_count = len(keywords)
+        self.rule_count = len(self._outcomes)
+
+    def _outcome(self, index, rule):
+        action = rule.get("action", FILTER_FORWARD)
+        if action not in FILTER_ACTIONS:
+            raise ValueError(
+                f"Filter rule {index + 1} has an unknown action '{action}'. Expected one of: {', '.join(FILTER_ACTIONS)}"
+            )
+        if action == FILTER_DROP:
+            if rule.get("targets"):
+                raise ValueError(
+                    f"Filter rule {index + 1} drops messages, so it cannot have 'targets'."
+                )
+            return ()
+        targets = rule.get("targets")
+        if not targets:
+            return self.target_numbers
+        if not isinstance(targets, list):
+            raise ValueError(
+                f"Filter rule {index + 1} has invalid 'targets'; expected a list of target numbers."
+            )
+        for number in targets:
+            if number not in self.target_numbers:
+                raise ValueError(
+                    f"Filter rule {index + 1} sends to target {number!r}, which is not one of the source's targets ({', '.join(map(str, self.target_numbers))})."
+                )
+        # In route order, so equal target sets are the same outcome.
+        return tuple(number for number in self.target_numbers if number in targets)
+
+    def targets(self, text):
+        """
+        The target numbers a message with `text` goes to, in route order; an empty
+        tuple means it is dropped. If any drop rule matches, the message is dropped;
+        otherwise it goes to the targets of every matching forward rule, or follows
+        the default when no rule matches.
+        """
+        text = text or ""
+        outcomes = set()
+        if self._automaton is not None:
+            outcomes.update(self._outcomes[index] for index in self._automaton.search(text))
+            if () in outcomes:
+                return ()
+        for outcome, pattern in self._patterns:
+            if outcome in outcomes:
+                continue
+            if pattern.search(text):
+                if not outcome:
+                    return ()
+                outcomes.add(outcome)
+        if not outcomes:
+            return self.default
+        selected = set().union(*outcomes)
+        return tuple(number for number in self.target_numbers if number in selected)
+
+    def split(self, messages):
+        """
+        Splits `messages` (from one source, in id order) into runs of consecutive
+        messages that go to the same targets and returns [(targets, messages), ...] in
+        order, without the dropped ones. Sending the runs one after another keeps the
+        source's order on every target, even where the runs' target sets overlap. An
+        album is judged on the text of all of its items, so it is never split up by
+        its caption.
+        """
+        albums = {}
+        for message in messages:
+            if message.grouped_id:
+                albums.setdefault(message.grouped_id, []).append(message.message or "")
+        album_targets = {
+            grouped_id: self.targets("\n".join(texts))
+            for grouped_id, texts in albums.items()
+        }
+        runs = []
+        for message in messages:
+            if message.grouped_id:
+                targets = album_targets[message.grouped_id]
+            else:
+                targets = self.targets(message.message)
+            if not targets:
+                continue
+            if runs and runs[-1][0] == targets:
+                runs[-1][1].append(message)
+            else:
+                runs.append((targets, [message]))
+        return runs
+
+
+def compile_content_filter(source_config):
+    """
+    Compiles the optional "filters" list (and "filter_default") of a source config,
+    whose routes must already be parsed (helpers.routing.parse_routes), into
+    source_config["content_filter"] and returns it; None if the source has no filters.
+    Raises ValueError for invalid rules.
+    """
+    rules = source_config.get("filters")
+    default = source_config.get("filter_default", DEFAULT_FILTER_ACTION)
+    if not rules and default == DEFAULT_FILTER_ACTION:
+        source_config["content_filter"] = None
+        return None
+    if rules is not None and not isinstance(rules, list):
+        raise ValueError("'filters' must be a list of rules.")
+    content_filter = ContentFilter(
+        rules or [],
+        default=default,
+        target_numbers=[route["target"] for route in source_config["routes"]],
+    )
+    source_config["content_filter"] = content_filter
+    content_filter_logger.info(
+        f"Compiled {content_filter.rule_count} filter rule(s) with {content_filter.keyword_count} keyword(s) for source '{source_config.get('title', 'Unknown Channel')}'."
+    )
+    return content_filter
@@ -0,0 +1,163 @@
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from telethon.tl.types import MessageMediaDocument, MessageMediaPhoto
+
+dedup_logger = logging.getLogger(__name__)
+
+DEFAULT_DEDUP_TTL_HOURS = 72
+DEFAULT_DEDUP_MEMORY_ENTRIES = 10000
+# Text-only messages shorter than this are never treated as duplicates ("ok", "👍", ...).
+DEFAULT_DEDUP_MIN_TEXT_LENGTH = 20
+# Pending inserts are committed to disk in batches of this size (and on flush()).
+COMMIT_BATCH_SIZE = 100
+
+
+def content_key(message, min_text_length=DEFAULT_DEDUP_MIN_TEXT_LENGTH):
+    """
+    Builds the dedup key of a message from its normalized text (case-folded, whitespace
+    collapsed) and the server-side ids of its photo or document. Reposts that reuse the
+    same file (forwards, copies, albums shared across channels) keep those ids, so they
+    collide even when the caption differs in case or spacing.
+    Returns None for messages that should never be deduplicated.
+    """
+    text = " ".join((message.message or "").split()).casefold()
+    media = message.media
+    media_id = None
+    if isinstance(media, MessageMediaPhoto) and media.photo is not None:
+        media_id = f"photo:{media.photo.id}"
+    elif isinstance(media, MessageMediaDocument) and media.document is not None:
+        media_id = f"document:{media.document.id}:{media.document.size}"
+    if media_id is None and len(text) < min_text_length:
+        return None
+    return hashlib.sha1(f"{media_id}\x00{text}".encode("utf-8")).hexdigest()
+
+
+class DedupIndex:
+    """
+    Remembers content keys of recently forwarded messages. Lookups hit a bounded
+    in-memory LRU first and fall back to a SQLite table, which survives restarts.
+    Entries older than `ttl_seconds` are ignored and pruned on startup.
+    A message is claimed when it arrives and only recorded once it has been sent
+    (add); claims of messages that were dropped or failed are discarded, so that
+    content is not suppressed when it never reached a target. Claims live in memory
+    only and do not survive a crash.
+    """
+
+    def __init__(self, path, ttl_seconds, memory_entries=DEFAULT_DEDUP_MEMORY_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.memory_entries = max(1, memory_entries)
+        self._recent = OrderedDict()
+        # Keys of messages on their way to the targets, which also count as seen.
+        self._claimed = set()
+        self._pending_commits = 0
+        self.stats = {
+            "checks": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "claimed_hits": 0,
+            "misses": 0,
+            "discarded": 0,
+        }
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen (key TEXT PRIMARY KEY, seen_at REAL NOT NULL)"
+        )
+        pruned = self._conn.execute(
+            "DELETE FROM seen WHERE seen_at < ?", (time.time() - ttl_seconds,)
+        ).rowcount
+        self._conn.commit()
+        if pruned:
+            dedup_logger.info(f"Pruned {pruned} expired entries from the dedup store.")
+
+    def claim(self, key):
+        """
+        Returns True if `key` was forwarded within the TTL or is claimed by a message
+        still being forwarded; otherwise claims it and returns False. Every claim must
+        end in add() once sent, or discard() if it was not.
+        """
+        self.stats["checks"] += 1
+        if key in self._claimed:
+            self.stats["claimed_hits"] += 1
+            return True
+        now = time.time()
+        seen_at = self._recent.get(key)
+        if seen_at is not None and now - seen_at <= self.ttl_seconds:
+            self._recent.move_to_end(key)
+            self.stats["memory_hits"] += 1
+            return True
+
+        if seen_at is None:
+            row = self._conn.execute(
+                "SELECT seen_at FROM seen WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[0] <= self.ttl_seconds:
+                self._remember(key, row[0])
+                self.stats["disk_hits"] += 1
+                return True
+
+        self.stats["misses"] += 1
+        self._claimed.add(key)
+        return False
+
+    def add(self, key):
+        """Records `key` as forwarded now (releasing its claim, if any)."""
+        self._claimed.discard(key)
+        now = time.time()
+        self._remember(key, now)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO seen (key, seen_at) VALUES (?, ?)", (key, now)
+        )
+        self._pending_commits += 1
+        if self._pending_commits >= COMMIT_BATCH_SIZE:
+            self.flush()
+
+    def discard(self, key):
+        """Releases the claim on `key` without recording it; a no-op for unclaimed keys."""
+        if key in self._claimed:
+            self._claimed.remove(key)
+            self.stats["discarded"] += 1
+
+    def _remember(self, key, seen_at):
+        self._recent[key] = seen_at
+        self._recent.move_to_end(key)
+        if len(self._recent) > self.memory_entries:
+            self._recent.popitem(last=False)
+
+    def flush(self):
+        if self._pending_commits:
+            self._conn.commit()
+            self._pending_commits = 0
+
+    async def log_stats_periodically(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            # Also bounds how many recent keys an unclean shutdown can lose.
+            self.flush()
+            dedup_logger.info(f"Dedup stats: {self.stats_summary()}")
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+    def stats_summary(self):
+        checks = self.stats["checks"]
+        hits = (
+            self.stats["memory_hits"]
+            + self.stats["disk_hits"]
+            + self.stats["claimed_hits"]
+        )
+        hit_rate = hits / checks if checks else 0.0
+        return (
+            f"checks={checks}, memory_hits={self.stats['memory_hits']}, disk_hits={self.stats['disk_hits']}, "
+            f"claimed_hits={self.stats['claimed_hits']}, misses={self.stats['misses']}, "
+            f"discarded={self.stats['discarded']}, hit_rate={hit_rate:.1%}"
+        )
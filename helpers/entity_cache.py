@@ -0,0 +1,172 @@
+import json
+import logging
+import os
+import time
+from telethon.tl.types import Channel, Chat, ChatPhotoEmpty
+
+cache_logger = logging.getLogger(__name__)
+
+# Default time after which a cached entity is resolved again through Telegram.
+DEFAULT_ENTITY_CACHE_TTL_HOURS = 24
+
+
+class EntityCache:
+    """
+    On-disk cache of resolved channel entities, stored as JSON next to the Telethon
+    session file. Config identifiers (id/username) map to the peer id, access_hash and
+    title needed to rebuild an entity locally, and invite hashes map to the channel they
+    joined, so a warm restart makes no get_entity or ImportChatInviteRequest calls.
+    Entries older than `ttl_seconds` are treated as missing and refreshed from Telegram.
+    """
+
+    def __init__(self, path, ttl_seconds):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.stats = {"hits": 0, "misses": 0, "stale_refreshes": 0}
+        self._entries = {}
+        self._stale_keys = set()
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._entries = json.load(f)
+            cache_logger.info(
+                f"Entity cache loaded from {self.path} ({len(self._entries)} entries)."
+            )
+        except (json.JSONDecodeError, OSError) as e:
+            cache_logger.warning(
+                f"Warning: Could not read entity cache {self.path}: {e}. Starting with an empty cache."
+            )
+            self._entries = {}
+
+    def save(self):
+        """Writes the cache to disk if anything changed (atomically, via a temp file)."""
+        if not self._dirty:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except OSError as e:
+            cache_logger.warning(f"Warning: Could not write entity cache {self.path}: {e}")
+
+    @staticmethod
+    def identifier_key(identifier):
+        if isinstance(identifier, int):
+            return f"id:{identifier}"
+        return f"username:{str(identifier).lstrip('@').lower()}"
+
+    @staticmethod
+    def invite_key(invite_hash):
+        return f"invite:{invite_hash}"
+
+    def _fresh_entry(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        if time.time() - entry.get("cached_at", 0) > self.ttl_seconds:
+            self._stale_keys.add(key)
+            return None
+        self.stats["hits"] += 1
+        return entry
+
+    def _store(self, key, entry):
+        if key in self._stale_keys:
+            self._stale_keys.discard(key)
+            self.stats["stale_refreshes"] += 1
+        entry["cached_at"] = time.time()
+        self._entries[key] = entry
+        self._dirty = True
+
+    def get(self, identifier):
+        """Returns a locally rebuilt entity for a config identifier, or None on a miss."""
+        entry = self._fresh_entry(self.identifier_key(identifier))
+        return _entity_from_entry(entry) if entry else None
+
+    def put(self, identifier, entity):
+        entry = _entry_from_entity(entity)
+        if entry is not None:
+            self._store(self.identifier_key(identifier), entry)
+
+    def has_joined(self, invite_hash):
+        """True if the invite hash was imported (or already joined) within the TTL."""
+        return self._fresh_entry(self.invite_key(invite_hash)) is not None
+
+    def joined_entity(self, invite_hash):
+        """
+        The channel a joined invite hash resolved to, rebuilt locally; None if it was
+        cached without one. Only meaningful after has_joined() returned True.
+        """
+        entry = self._entries.get(self.invite_key(invite_hash))
+        return _entity_from_entry(entry) if entry else None
+
+    def mark_joined(self, invite_hash, entity=None):
+        """Records a joined invite hash, with the channel it resolved to if known."""
+        entry = {"joined": True}
+        if entity is not None:
+            entry.update(_entry_from_entity(entity) or {})
+        self._store(self.invite_key(invite_hash), entry)
+
+    async def get_entity(self, client, identifier):
+        """Cached replacement for `client.get_entity(identifier)`."""
+        entity = self.get(identifier)
+        if entity is not None:
+            return entity
+        entity = await client.get_entity(identifier)
+        self.put(identifier, entity)
+        return entity
+
+    def stats_summary(self):
+        return (
+            f"hits={self.stats['hits']}, misses={self.stats['misses']}, "
+            f"stale_refreshes={self.stats['stale_refreshes']}"
+        )
+
+
+def _entry_from_entity(entity):
+    if isinstance(entity, Channel):
+        return {
+            "peer_type": "channel",
+            "id": entity.id,
+            "access_hash": entity.access_hash,
+            "title": entity.title,
+            "username": entity.username,
+            "broadcast": bool(entity.broadcast),
+            "megagroup": bool(entity.megagroup),
+        }
+    if isinstance(entity, Chat):
+        return {"peer_type": "chat", "id": entity.id, "title": entity.title}
+    # Users and other peers are not cached; they are simply resolved every time.
+    return None
+
+
+def _entity_from_entry(entry):
+    if entry.get("peer_type") == "channel":
+        return Channel(
+            id=entry["id"],
+            title=entry["title"],
+            photo=ChatPhotoEmpty(),
+            date=None,
+            broadcast=entry.get("broadcast"),
+            megagroup=entry.get("megagroup"),
+            access_hash=entry["access_hash"],
+            username=entry.get("username"),
+        )
+    if entry.get("peer_type") == "chat":
+        return Chat(
+            id=entry["id"],
+            title=entry["title"],
+            photo=ChatPhotoEmpty(),
+            participants_count=0,
+            date=None,
+            version=0,
+        )
+    return None
@@ -0,0 +1,46 @@
+import asyncio
+import logging
+
+event_loop_logger = logging.getLogger(__name__)
+
+# "asyncio" - the standard library loop (default)
+# "uvloop"  - uvloop; falls back to asyncio with a warning if it is not installed
+# "auto"    - uvloop if it is installed, asyncio otherwise
+EVENT_LOOPS = ("asyncio", "uvloop", "auto")
+DEFAULT_EVENT_LOOP = "asyncio"
+
+
+def available_event_loops():
+    """The loop names that can actually be installed here, e.g. ["asyncio", "uvloop"]."""
+    loops = ["asyncio"]
+    try:
+        import uvloop  # noqa: F401
+
+        loops.append("uvloop")
+    except ImportError:
+        pass
+    return loops
+
+
+def install_event_loop_policy(name=DEFAULT_EVENT_LOOP):
+    """
+    Sets the event-loop policy used by later asyncio.run() calls and returns the name
+    of the loop that was installed. Raises ValueError for an unknown name.
+    """
+    if name not in EVENT_LOOPS:
+        raise ValueError(
+            f"Unknown event loop '{name}'. Expected one of: {', '.join(EVENT_LOOPS)}"
+        )
+    if name in ("uvloop", "auto"):
+        try:
+            import uvloop
+
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+            return "uvloop"
+        except ImportError:
+            if name == "uvloop":
+                event_loop_logger.warning(
+                    "Warning: event_loop is set to 'uvloop' but uvloop is not installed (pip install uvloop). Using the standard asyncio loop."
+                )
+    asyncio.set_event_loop_policy(asyncio.DefaultEventLoopPolicy())
+    return "asyncio"
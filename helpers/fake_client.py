@@ -0,0 +1,431 @@
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+from telethon.tl.types import (
+    Channel,
+    ChatPhotoEmpty,
+    Document,
+    DocumentAttributeFilename,
+    MessageMediaDocument,
+    MessageMediaPhoto,
+)
+from telethon import events
+from telethon.tl.functions.messages import ImportChatInviteRequest
+from telethon.tl.functions.upload import SaveBigFilePartRequest, SaveFilePartRequest
+from telethon.errors import (
+    FloodWaitError,
+    ChatForwardsRestrictedError,
+    ChannelPrivateError,
+)
+
+# Telegram returns at most this many messages per GetHistoryRequest.
+HISTORY_PAGE_SIZE = 100
+
+
+class FakeTelegramClient:
+    """
+    In-process stand-in for the parts of TelegramClient the forwarder uses, for
+    benchmarks and offline experiments. Every RPC sleeps for `latency` seconds and is
+    counted in `rpc_counts`, so callers can measure both time and request volume
+    without talking to Telegram.
+    `flood_waits` maps an RPC name (e.g. "get_entity") to a list of FloodWait durations
+    that are raised, one per call, before that RPC starts succeeding.
+    `send_rate_limit` emulates the server's per-destination limit on sends: more than
+    that many sends per second to one chat are answered with a FloodWait of
+    `send_flood_wait` seconds, and sends during the wait are refused as well.
+    Like TelegramClient, FloodWaits of up to `flood_sleep_threshold` seconds (0 unless
+    the caller sets it) are slept out and retried instead of raised.
+    With `protected_media`, sending source media by reference fails with
+    ChatForwardsRestrictedError, like it does for content-protected chats.
+    Downloads serve zero bytes; `bytes_downloaded` and `bytes_uploaded` count traffic,
+    and file part uploads take `upload_latency` seconds (defaults to `latency`).
+    `history` maps a chat id to its latest message id; `iter_messages` serves that
+    chat's messages in pages of HISTORY_PAGE_SIZE, one RPC per page.
+    For error injection, `errors` maps an RPC name to a list of exceptions raised one
+    per call (like `flood_waits`), `error_rates` maps an RPC name to a (probability,
+    exception factory) pair applied on every call (random, but reproducible through
+    `seed`), and get_entity raises ChannelPrivateError for ids in `private_chats`.
+    Event handlers registered with `on()` receive the messages passed to `emit()` (or
+    `emit(..., edited=True)` for MessageEdited handlers), and every forwarded message is
+    logged in `delivered` as (chat_id, message id, time.perf_counter()); copies carry no
+    source ids and are logged as (None, text, time) instead.
+    """
+
+    def __init__(
+        self,
+        latency=0.0,
+        flood_waits=None,
+        send_rate_limit=None,
+        send_flood_wait=1,
+        protected_media=False,
+        upload_latency=None,
+        errors=None,
+        error_rates=None,
+        private_chats=(),
+        seed=0,
+    ):
+        self.latency = latency
+        self.flood_waits = {name: list(waits) for name, waits in (flood_waits or {}).items()}
+        self.send_rate_limit = send_rate_limit
+        self.send_flood_wait = send_flood_wait
+        self._send_windows = {}
+        self._flooded_until = {}
+        self.protected_media = protected_media
+        self.upload_latency = latency if upload_latency is None else upload_latency
+        self.bytes_downloaded = 0
+        self.bytes_uploaded = 0
+        self.history = {}
+        self.errors = {name: list(raised) for name, raised in (errors or {}).items()}
+        self.error_rates = dict(error_rates or {})
+        self.private_chats = set(private_chats)
+        self._random = random.Random(seed)
+        self.handlers = []
+        self.delivered = []
+        # Ids of documents created by copies, which can be sent on by reference.
+        self._sent_document_ids = set()
+        self._event_handler_tasks = set()
+        self._disconnected = None
+        self.flood_sleep_threshold = 0
+        self.rpc_counts = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def _rpc(self, name, latency=None, send_to=None):
+        """One RPC; `send_to` is the destination of a send, checked against `send_rate_limit`."""
+        while True:
+            try:
+                self._fail(name, send_to)
+                break
+            except FloodWaitError as e:
+                if e.seconds > self.flood_sleep_threshold:
+                    raise
+                self.rpc_counts["flood_sleep"] = self.rpc_counts.get("flood_sleep", 0) + 1
+                await asyncio.sleep(e.seconds)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            latency = self.latency if latency is None else latency
+            if latency:
+                await asyncio.sleep(latency)
+        finally:
+            self.in_flight -= 1
+
+    def _fail(self, name, send_to):
+        """Raises the FloodWait or error injected for this call of `name`, if any."""
+        if send_to is not None:
+            self._check_send_limit(send_to)
+        self.rpc_counts[name] = self.rpc_counts.get(name, 0) + 1
+        pending_waits = self.flood_waits.get(name)
+        if pending_waits:
+            raise FloodWaitError(request=None, capture=pending_waits.pop(0))
+        pending_errors = self.errors.get(name)
+        if pending_errors:
+            raise pending_errors.pop(0)
+        error_rate = self.error_rates.get(name)
+        if error_rate and self._random.random() < error_rate[0]:
+            self.rpc_counts[f"{name}_error"] = self.rpc_counts.get(f"{name}_error", 0) + 1
+            raise error_rate[1]()
+
+    def _check_send_limit(self, entity):
+        if self.send_rate_limit is None:
+            return
+        key = getattr(entity, "id", entity)
+        now = loop_time()
+        flooded_until = self._flooded_until.get(key, 0)
+        if now < flooded_until:
+            self.rpc_counts["flood_wait"] = self.rpc_counts.get("flood_wait", 0) + 1
+            raise FloodWaitError(request=None, capture=max(1, round(flooded_until - now)))
+        window = self._send_windows.setdefault(key, [])
+        while window and now - window[0] >= 1.0:
+            window.pop(0)
+        if len(window) >= self.send_rate_limit:
+            self._flooded_until[key] = now + self.send_flood_wait
+            self.rpc_counts["flood_wait"] = self.rpc_counts.get("flood_wait", 0) + 1
+            raise FloodWaitError(request=None, capture=self.send_flood_wait)
+        window.append(now)
+
+    def _check_media_reference(self, files):
+        if not self.protected_media:
+            return
+        for file in files if isinstance(files, list) else [files]:
+            if (
+                isinstance(file, MessageMediaDocument)
+                and file.document.id in self._sent_document_ids
+            ):
+                continue
+            if isinstance(file, (MessageMediaDocument, MessageMediaPhoto)):
+                raise ChatForwardsRestrictedError(request=None)
+
+    @staticmethod
+    def make_document_media(size, document_id=1, file_name="file.bin"):
+        """Builds a MessageMediaDocument for a synthetic file of `size` bytes."""
+        return MessageMediaDocument(
+            document=Document(
+                id=document_id,
+                access_hash=document_id * 31,
+                file_reference=b"ref",
+                date=None,
+                mime_type="application/octet-stream",
+                size=size,
+                dc_id=2,
+                attributes=[DocumentAttributeFilename(file_name)],
+            )
+        )
+
+    async def iter_download(self, media, request_size=512 * 1024, file_size=None, **kwargs):
+        size = file_size if file_size is not None else media.document.size
+        sent = 0
+        while sent < size:
+            await self._rpc("get_file")
+            # A fresh buffer per part, like a real download, so memory use is realistic.
+            part = bytes(min(request_size, size - sent))
+            sent += len(part)
+            self.bytes_downloaded += len(part)
+            yield part
+
+    @staticmethod
+    def make_channel(channel_id, title=None, username=None):
+        """Builds a Channel entity that Telethon's utils treat like a real one."""
+        return Channel(
+            id=channel_id,
+            title=title or f"Channel {channel_id}",
+            photo=ChatPhotoEmpty(),
+            date=datetime.now(timezone.utc),
+            broadcast=True,
+            access_hash=channel_id * 7919,
+            username=username,
+        )
+
+    async def __call__(self, request):
+        if isinstance(request, ImportChatInviteRequest):
+            await self._rpc("import_chat_invite")
+            return None
+        if isinstance(request, (SaveFilePartRequest, SaveBigFilePartRequest)):
+            self.bytes_uploaded += len(request.bytes)
+            await self._rpc("save_file_part", self.upload_latency)
+            return True
+        await self._rpc(type(request).__name__)
+        return None
+
+    async def start(self, phone=None, **kwargs):
+        await self._rpc("start")
+        self._disconnected = asyncio.Event()
+        return self
+
+    async def is_user_authorized(self):
+        return True
+
+    def is_connected(self):
+        return self._disconnected is not None and not self._disconnected.is_set()
+
+    async def disconnect(self):
+        if self._disconnected is not None:
+            self._disconnected.set()
+
+    async def run_until_disconnected(self):
+        if self._disconnected is None:
+            self._disconnected = asyncio.Event()
+        await self._disconnected.wait()
+
+    def on(self, event):
+        """
+        Registers a handler for `event` (e.g. events.NewMessage(chats=[...]) or
+        events.NewMessage(func=...)); the chats and func filters are honoured.
+        """
+
+        def decorator(callback):
+            chats = getattr(event, "chats", None)
+            edited = isinstance(event, events.MessageEdited)
+            self.handlers.append(
+                (set(chats) if chats else None, callback, edited, event.func)
+            )
+            return callback
+
+        return decorator
+
+    def handles(self, chat_id, edited=False):
+        """Whether a message from `chat_id` would reach any registered handler."""
+        event = FakeNewMessageEvent(self, chat_id, None)
+        return any(
+            handles_edits == edited
+            and (chats is None or chat_id in chats)
+            and (func is None or func(event))
+            for chats, _, handles_edits, func in self.handlers
+        )
+
+    def emit(self, chat_id, message, edited=False):
+        """
+        Delivers `message` from `chat_id` to the matching handlers, each in its own task
+        like Telethon's default (non-sequential) update dispatch. Returns the tasks.
+        """
+        tasks = []
+        event = FakeNewMessageEvent(self, chat_id, message)
+        for chats, callback, handles_edits, func in self.handlers:
+            if handles_edits != edited or (chats is not None and chat_id not in chats):
+                continue
+            if func is not None and not func(event):
+                continue
+            task = asyncio.create_task(callback(event))
+            self._event_handler_tasks.add(task)
+            task.add_done_callback(self._event_handler_tasks.discard)
+            tasks.append(task)
+        return tasks
+
+    async def get_entity(self, identifier):
+        await self._rpc("get_entity")
+        if identifier in self.private_chats:
+            raise ChannelPrivateError(request=None)
+        if isinstance(identifier, int):
+            # Accept both bare and marked (-100...) channel ids.
+            channel_id = abs(identifier) % 1000000000000
+            return self.make_channel(channel_id)
+        return self.make_channel(abs(hash(identifier)) % 1000000000, username=identifier)
+
+    async def get_input_entity(self, peer):
+        return peer
+
+    async def get_messages(self, entity, ids=None, **kwargs):
+        await self._rpc("get_messages")
+        return [FakeMessage(message_id, chat_id=entity) for message_id in ids]
+
+    async def iter_messages(self, entity, limit=None, min_id=0, reverse=False, **kwargs):
+        last_id = self.history.get(entity, 0)
+        ids = range(min_id + 1, last_id + 1) if reverse else range(last_id, min_id, -1)
+        if limit is not None:
+            ids = ids[:limit]
+        for start in range(0, len(ids), HISTORY_PAGE_SIZE):
+            await self._rpc("get_history")
+            for message_id in ids[start : start + HISTORY_PAGE_SIZE]:
+                yield FakeMessage(message_id, chat_id=entity)
+
+    async def forward_messages(self, entity, messages, from_peer=None, **kwargs):
+        await self._rpc("forward_messages", send_to=entity)
+        now = time.perf_counter()
+        for message in messages:
+            self.delivered.append(
+                (getattr(message, "chat_id", from_peer), getattr(message, "id", message), now)
+            )
+        return messages
+
+    async def send_message(self, entity, message="", file=None, **kwargs):
+        self._check_media_reference(file)
+        await self._rpc("send_message", send_to=entity)
+        self.delivered.append((None, message, time.perf_counter()))
+        return self._sent_copy(entity, message, file)
+
+    async def send_file(self, entity, file, **kwargs):
+        # Albums (a list of files) are sent with a single SendMultiMediaRequest.
+        self._check_media_reference(file)
+        await self._rpc("send_file", send_to=entity)
+        now = time.perf_counter()
+        captions = kwargs.get("caption")
+        captions = captions if isinstance(captions, list) else [captions]
+        for caption in captions:
+            self.delivered.append((None, caption, now))
+        files = file if isinstance(file, list) else [file]
+        return [self._sent_copy(entity, caption, f) for caption, f in zip(captions, files)]
+
+    def _sent_copy(self, entity, text, file):
+        """The message a copy creates in `entity`; uploaded media gets a new document."""
+        media = file
+        if file is not None and not isinstance(
+            file, (MessageMediaDocument, MessageMediaPhoto)
+        ):
+            media = self.make_document_media(
+                0, document_id=self._random.getrandbits(62)
+            )
+            self._sent_document_ids.add(media.document.id)
+        return FakeMessage(
+            self._random.getrandbits(31),
+            chat_id=getattr(entity, "id", entity),
+            text=text,
+            media=media,
+        )
+
+
+def loop_time():
+    return asyncio.get_running_loop().time()
+
+
+class FakeMessage:
+    """Minimal stand-in for a Telethon Message as seen by the forwarding code."""
+
+    def __init__(
+        self,
+        message_id,
+        chat_id=None,
+        text="",
+        media=None,
+        grouped_id=None,
+        entities=None,
+        date=None,
+    ):
+        self.id = message_id
+        self.chat_id = chat_id
+        self.message = text
+        self.media = media
+        self.grouped_id = grouped_id
+        self.entities = entities
+        self.reply_to_msg_id = None
+        self.date = date
+
+
+class FakeNewMessageEvent:
+    """Minimal stand-in for events.NewMessage.Event bound to a FakeTelegramClient."""
+
+    def __init__(self, client, chat_id, message):
+        self.client = client
+        self.chat_id = chat_id
+        self.chat = True
+        self.message = message
+
+    async def get_input_chat(self):
+        return self.chat_id
+
+    async def forward_to(self, entity):
+        return await self.client.forward_messages(
+            entity, [self.message.id], from_peer=self.chat_id
+        )
+
+
+def generate_messages(
+    chat_ids, count, album_fraction=0.0, album_size=4, media_fraction=0.3, seed=0
+):
+    """
+    Builds a synthetic stream of `count` (chat_id, FakeMessage) pairs spread randomly
+    over `chat_ids`, with per-chat increasing message ids and distinct texts.
+    `media_fraction` of the posts carry a document (1 KiB - 4 MiB); `album_fraction`
+    of them are albums of `album_size` consecutive messages sharing a grouped_id.
+    """
+    rng = random.Random(seed)
+    next_ids = {chat_id: 1 for chat_id in chat_ids}
+    stream = []
+    grouped_id = 0
+    while len(stream) < count:
+        chat_id = rng.choice(chat_ids)
+        in_album = rng.random() < album_fraction
+        size = min(album_size, count - len(stream)) if in_album else 1
+        if in_album:
+            grouped_id += 1
+        for _ in range(size):
+            message_id = next_ids[chat_id]
+            next_ids[chat_id] += 1
+            media = None
+            if in_album or rng.random() < media_fraction:
+                media = FakeTelegramClient.make_document_media(
+                    rng.randint(1024, 4 * 1024 * 1024), document_id=len(stream) + 1
+                )
+            stream.append(
+                (
+                    chat_id,
+                    FakeMessage(
+                        message_id,
+                        chat_id=chat_id,
+                        text=f"Synthetic post {len(stream)} from {chat_id}",
+                        media=media,
+                        grouped_id=grouped_id if in_album else None,
+                    ),
+                )
+            )
+    return stream
@@ -0,0 +1,267 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+
+queue_logger = logging.getLogger(__name__)
+
+DEFAULT_FORWARD_WORKERS = 4
+DEFAULT_FORWARD_QUEUE_MAX_DEPTH = 1000
+# What to do with a new job when a worker's queue is full:
+#   "block"       - wait for room (slows down Telethon's update dispatch instead of losing messages)
+#   "drop_oldest" - discard the oldest queued job to make room for the new one
+#   "spill"       - append the job to a file on disk and pick it up again once the queue drains
+QUEUE_POLICIES = ("block", "drop_oldest", "spill")
+DEFAULT_FORWARD_QUEUE_POLICY = "block"
+
+
+class ForwardJob:
+    """
+    One unit of forwarding work: one message, or a batch (album) from a single source
+    chat. Jobs restored from the spill file only carry message ids; the worker fetches
+    the messages again before sending them.
+    """
+
+    __slots__ = ("chat_id", "messages", "message_ids", "enqueued_at")
+
+    def __init__(self, chat_id, messages=None, message_ids=None, enqueued_at=None):
+        self.chat_id = chat_id
+        self.messages = messages
+        self.message_ids = message_ids or [m.id for m in messages]
+        self.enqueued_at = enqueued_at or time.time()
+
+    def to_record(self):
+        return {
+            "chat_id": self.chat_id,
+            "message_ids": self.message_ids,
+            "enqueued_at": self.enqueued_at,
+        }
+
+    @classmethod
+    def from_record(cls, record):
+        return cls(
+            record["chat_id"],
+            message_ids=record["message_ids"],
+            enqueued_at=record.get("enqueued_at"),
+        )
+
+
+class _SpillFile:
+    """Append-only JSONL overflow for the forward queue, read back in FIFO order."""
+
+    def __init__(self, path):
+        self.path = path
+        self.pending = 0
+        self._read_offset = 0
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.pending = sum(1 for line in f if line.strip())
+
+    def append(self, job):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(job.to_record()) + "\n")
+        self.pending += 1
+
+    def pop(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            f.seek(self._read_offset)
+            line = f.readline()
+            self._read_offset = f.tell()
+        self.pending -= 1
+        if self.pending <= 0:
+            # Everything has been read back; start the next spill from an empty file.
+            os.remove(self.path)
+            self.pending = 0
+            self._read_offset = 0
+        return ForwardJob.from_record(json.loads(line))
+
+    def discard(self):
+        """Deletes whatever is left in the file without reading it back."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.pending = 0
+        self._read_offset = 0
+
+
+class ForwardQueue:
+    """
+    Decouples the NewMessage handler from the actual forwarding. The handler only
+    enqueues a ForwardJob; `workers` background tasks call `process_job(job)`, which
+    returns False (or raises) when the job could not be forwarded. `on_drop(job)` is
+    called for every job the "drop_oldest" policy discards.
+    Jobs from the same source chat are never processed concurrently, so each source
+    keeps its message order, while a slow upload from one source does not hold up
+    jobs from any other source.
+    With `replay_spill`, jobs left in the spill file by a previous run are processed
+    first on `start()`. Turn it off when another mechanism (such as the outbox)
+    already replays them; the leftover file is then discarded instead, so no job runs
+    twice.
+    """
+
+    def __init__(
+        self,
+        process_job,
+        workers=DEFAULT_FORWARD_WORKERS,
+        max_depth=DEFAULT_FORWARD_QUEUE_MAX_DEPTH,
+        policy=DEFAULT_FORWARD_QUEUE_POLICY,
+        spill_path=None,
+        on_drop=None,
+        replay_spill=True,
+    ):
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(
+                f"Unknown forward queue policy '{policy}'. Expected one of: {', '.join(QUEUE_POLICIES)}"
+            )
+        if policy == "spill" and not spill_path:
+            raise ValueError("The 'spill' forward queue policy requires a spill path.")
+        self.process_job = process_job
+        self.on_drop = on_drop
+        self.replay_spill = replay_spill
+        self.policy = policy
+        self.worker_count = max(1, workers)
+        self.max_depth = max(1, max_depth)
+        self._queue = asyncio.Queue()
+        # Jobs waiting because another worker is busy with the same source chat.
+        self._deferred = {}
+        self._deferred_count = 0
+        # Queued, deferred and running jobs each hold one of `max_depth` slots.
+        self._used_slots = 0
+        self._slot_freed = asyncio.Event()
+        self._spill = _SpillFile(spill_path) if policy == "spill" else None
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._in_progress = 0
+        self._workers = []
+        self.stats = {
+            "enqueued": 0,
+            "processed": 0,
+            "failed": 0,
+            "dropped": 0,
+            "spilled": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+        }
+
+    def start(self):
+        self._workers = [
+            asyncio.create_task(self._worker()) for _ in range(self.worker_count)
+        ]
+        if self._spill is not None and self._spill.pending:
+            if not self.replay_spill:
+                queue_logger.info(
+                    f"Discarding {self._spill.pending} spilled forward job(s) from a previous run; they are replayed from elsewhere."
+                )
+                self._spill.discard()
+                return
+            queue_logger.info(
+                f"Found {self._spill.pending} spilled forward job(s) from a previous run. They will be processed first."
+            )
+            self._refill_from_spill()
+
+    async def stop(self):
+        """Waits until every queued (and spilled) job is processed, then stops the workers."""
+        while self.depth or self._in_progress:
+            self._idle.clear()
+            await self._idle.wait()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    @property
+    def depth(self):
+        spilled = self._spill.pending if self._spill is not None else 0
+        return self._queue.qsize() + self._deferred_count + spilled
+
+    async def put(self, job):
+        self.stats["enqueued"] += 1
+
+        # Once anything has spilled, new jobs follow it to disk to keep FIFO order.
+        if self._spill is not None and (self._spill.pending or self._full()):
+            self._spill.append(job)
+            self.stats["spilled"] += 1
+            return
+        if self.policy == "drop_oldest" and self._full() and not self._queue.empty():
+            dropped = self._queue.get_nowait()
+            self._release_slot()
+            self.stats["dropped"] += 1
+            queue_logger.warning(
+                f"Forward queue is full. Dropping oldest queued job from chat {dropped.chat_id} (message ids: {dropped.message_ids})."
+            )
+            if self.on_drop is not None:
+                self.on_drop(dropped)
+        while self._full():
+            self._slot_freed.clear()
+            await self._slot_freed.wait()
+        self._used_slots += 1
+        self._queue.put_nowait(job)
+
+    def _full(self):
+        return self._used_slots >= self.max_depth
+
+    def _release_slot(self):
+        self._used_slots -= 1
+        self._slot_freed.set()
+
+    def _refill_from_spill(self):
+        while self._spill.pending and not self._full():
+            self._used_slots += 1
+            self._queue.put_nowait(self._spill.pop())
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            if job.chat_id in self._deferred:
+                # Another worker is forwarding this source; it will pick the job up in order.
+                self._deferred[job.chat_id].append(job)
+                self._deferred_count += 1
+                continue
+            self._deferred[job.chat_id] = deque()
+            self._in_progress += 1
+            try:
+                await self._run(job)
+                pending = self._deferred[job.chat_id]
+                while pending:
+                    self._deferred_count -= 1
+                    await self._run(pending.popleft())
+            finally:
+                del self._deferred[job.chat_id]
+                self._in_progress -= 1
+                if self._spill is not None:
+                    self._refill_from_spill()
+                if not self.depth and not self._in_progress:
+                    self._idle.set()
+
+    async def _run(self, job):
+        wait = max(0.0, time.time() - job.enqueued_at)
+        self.stats["wait_seconds_total"] += wait
+        self.stats["wait_seconds_max"] = max(self.stats["wait_seconds_max"], wait)
+        try:
+            if await self.process_job(job) is False:
+                self.stats["failed"] += 1
+        except Exception as e:
+            self.stats["failed"] += 1
+            queue_logger.error(
+                f"Forward worker failed to process job from chat {job.chat_id} (message ids: {job.message_ids}): {e}",
+                exc_info=True,
+            )
+        finally:
+            self.stats["processed"] += 1
+            self._release_slot()
+
+    async def log_stats_periodically(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            queue_logger.info(f"Forward queue stats: {self.stats_summary()}")
+
+    def stats_summary(self):
+        processed = self.stats["processed"]
+        average_wait = self.stats["wait_seconds_total"] / processed if processed else 0.0
+        return (
+            f"depth={self.depth}, enqueued={self.stats['enqueued']}, processed={processed}, "
+            f"failed={self.stats['failed']}, dropped={self.stats['dropped']}, spilled={self.stats['spilled']}, "
+            f"avg_wait={average_wait:.3f}s, max_wait={self.stats['wait_seconds_max']:.3f}s"
+        )
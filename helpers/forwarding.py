@@ -0,0 +1,232 @@
+import asyncio
+import logging
+from telethon import utils
+from helpers.media_copy import MediaCopier, describe_transfer
+from helpers.routing import Route, MODE_FORWARD, MODE_COPY
+from helpers.tracing import TRACER
+
+forwarding_logger = logging.getLogger(__name__)
+
+# Telegram accepts at most 10 media items in a single album.
+MAX_ALBUM_SIZE = 10
+# Default time to wait for the remaining messages of an album after its first one arrives.
+DEFAULT_ALBUM_WINDOW_SECONDS = 1.0
+# Telegram accepts at most 100 message ids in a single ForwardMessagesRequest.
+MAX_FORWARD_BATCH_SIZE = 100
+# Default time to collect a burst from one source into a single forward (0 disables coalescing).
+DEFAULT_FORWARD_COALESCE_WINDOW_SECONDS = 0.0
+
+
+async def _call(scheduler, target_channel_entity, request_factory, description):
+    if scheduler is None:
+        return await request_factory()
+    return await scheduler.send(
+        utils.get_peer_id(target_channel_entity), request_factory, description
+    )
+
+
+async def send_to_target(
+    client,
+    messages,
+    source_channel_config,
+    target_channel_entity,
+    scheduler=None,
+    media_copier=None,
+    mode=None,
+):
+    """
+    Sends one or more messages from the same source channel to the target. A single
+    message is forwarded (or copied, for `protected_forwarding` sources) on its own;
+    several messages (an album, or a coalesced burst) are sent with one batched request:
+    a multi-id forward, or a single multi-media send for protected sources (albums only).
+    `mode` ("forward" or "copy") overrides the choice made from `protected_forwarding`.
+    With a `scheduler` (SendScheduler), requests are paced per target and retried
+    after FloodWait. Copies go through `media_copier` (a MediaCopier), which reuses
+    file references and only re-uploads media when Telegram refuses them.
+    Returns True if the messages were sent, False if sending failed (the error is logged).
+    """
+    if mode is None:
+        mode = (
+            MODE_COPY
+            if source_channel_config.get("protected_forwarding", False)
+            else MODE_FORWARD
+        )
+    results = await send_to_targets(
+        client,
+        messages,
+        source_channel_config,
+        [Route(None, target_channel_entity, mode)],
+        scheduler=scheduler,
+        media_copier=media_copier,
+    )
+    return results[0]
+
+
+async def send_to_targets(
+    client, messages, source_channel_config, routes, scheduler=None, media_copier=None
+):
+    """
+    Sends messages from one source to the target of every route (helpers.routing.Route)
+    concurrently, each in its route's mode, and returns one True/False per route.
+    Forwards need no media transfer at all; copy routes share a single one, so media
+    is reused by reference or re-uploaded once however many targets copy it (see
+    MediaCopier.send_copies). A failing target is logged and does not stop the others.
+    """
+    messages = sorted(messages, key=lambda m: m.id)
+    forward_routes = [route for route in routes if route.mode != MODE_COPY]
+    copy_routes = [route for route in routes if route.mode == MODE_COPY]
+    sends = [
+        _forward(client, messages, source_channel_config, route.entity, scheduler)
+        for route in forward_routes
+    ]
+    if copy_routes:
+        sends.append(
+            _copy(
+                client,
+                messages,
+                source_channel_config,
+                copy_routes,
+                scheduler,
+                media_copier,
+            )
+        )
+    # The common single-target case is awaited directly, without a gathering task.
+    outcomes = [await sends[0]] if len(sends) == 1 else await asyncio.gather(*sends)
+    results = dict(zip(map(id, forward_routes), outcomes))
+    if copy_routes:
+        results.update(zip(map(id, copy_routes), outcomes[-1]))
+    return [results[id(route)] for route in routes]
+
+
+def _describe(messages):
+    return "message" if len(messages) == 1 else f"batch of {len(messages)} messages"
+
+
+def _log_sent(messages, source_channel_config, target_channel_entity, transfer_note=""):
+    forwarding_logger.info(
+        "%s from '%s' successfully handled and sent to '%s'%s.",
+        _describe(messages).capitalize(),
+        source_channel_config.get("title", "Unknown Channel"),
+        target_channel_entity.title,
+        transfer_note,
+    )
+
+
+def _log_failed(messages, source_channel_config, target_channel_entity, error):
+    forwarding_logger.error(
+        f"Failed to process {_describe(messages)} from '{source_channel_config.get('title', 'Unknown Channel')}' to '{target_channel_entity.title}': {error}",
+        exc_info=error,
+    )
+
+
+async def _forward(
+    client, messages, source_channel_config, target_channel_entity, scheduler
+):
+    description = _describe(messages)
+    try:
+        # Per-message lines are formatted lazily, so the log rate limiter can
+        # recognise them by their template and sample them under load.
+        forwarding_logger.info(
+            "New %s detected in source channel '%s' (ID: %s). Attempting to forward...",
+            description,
+            source_channel_config.get("title", "Unknown Channel"),
+            messages[0].chat_id,
+        )
+        # Telethon works out the source chat from the Message objects, and sends
+        # all of their ids in a single ForwardMessagesRequest.
+        with TRACER.span("send.forward"):
+            await _call(
+                scheduler,
+                target_channel_entity,
+                lambda: client.forward_messages(target_channel_entity, messages),
+                description,
+            )
+    except Exception as e:
+        _log_failed(messages, source_channel_config, target_channel_entity, e)
+        return False
+    _log_sent(messages, source_channel_config, target_channel_entity)
+    return True
+
+
+async def _copy(
+    client, messages, source_channel_config, routes, scheduler, media_copier
+):
+    if not routes:
+        return []
+    description = _describe(messages)
+    forwarding_logger.info(
+        "New %s detected in source channel '%s' (ID: %s). Attempting to send a copy...",
+        description,
+        source_channel_config.get("title", "Unknown Channel"),
+        messages[0].chat_id,
+    )
+
+    # Texts are rewritten once for all targets, by the source's "transform" rules.
+    text_transform = source_channel_config.get("text_transform")
+    if text_transform is None:
+        texts = [(m.message, m.entities) for m in messages]
+    else:
+        with TRACER.span("send.transform"):
+            texts = [text_transform.apply(m.message, m.entities) for m in messages]
+
+    def send_copy_to(target_channel_entity):
+        async def send_copy(files):
+            if len(messages) == 1:
+                message = messages[0]
+                text, entities = texts[0]
+                if not text and files[0] is None:
+                    forwarding_logger.info(
+                        "Message %s from '%s' has no text left after its transform. Not sending it.",
+                        message.id,
+                        source_channel_config.get("title", "Unknown Channel"),
+                    )
+                    return None
+                return await _call(
+                    scheduler,
+                    target_channel_entity,
+                    lambda: client.send_message(
+                        target_channel_entity,
+                        message=text,
+                        file=files[0],
+                        link_preview=False,
+                        formatting_entities=entities,
+                        reply_to=message.reply_to_msg_id,
+                    ),
+                    description,
+                )
+            return await _call(
+                scheduler,
+                target_channel_entity,
+                lambda: client.send_file(
+                    target_channel_entity,
+                    file=files,
+                    caption=[text for text, _ in texts],
+                    formatting_entities=[entities or [] for _, entities in texts],
+                    reply_to=messages[0].reply_to_msg_id,
+                ),
+                description,
+            )
+
+        return send_copy
+
+    if media_copier is None:
+        media_copier = MediaCopier(client)
+    try:
+        with TRACER.span("send.copy"):
+            transferred, errors = await media_copier.send_copies(
+                messages, [send_copy_to(route.entity) for route in routes]
+            )
+    except Exception as e:
+        errors = [e] * len(routes)
+        transferred = 0
+    transfer_note = ""
+    if any(media_copier.copyable_media(m) for m in messages):
+        transfer_note = f" ({describe_transfer(transferred)})"
+    results = []
+    for route, error in zip(routes, errors):
+        if error is None:
+            _log_sent(messages, source_channel_config, route.entity, transfer_note)
+        else:
+            _log_failed(messages, source_channel_config, route.entity, error)
+        results.append(error is None)
+    return results
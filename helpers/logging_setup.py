@@ -0,0 +1,143 @@
+import atexit
+import json
+import logging
+import queue
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+TEXT_LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# "text" - the classic one-line format
+# "json" - one JSON object per line, for log shippers
+LOG_FORMATS = ("text", "json")
+DEFAULT_LOG_FORMAT = "text"
+# Identical INFO lines (same logger and message template) let through per window;
+# 0 disables rate limiting.
+DEFAULT_LOG_RATE_LIMIT = 20
+DEFAULT_LOG_RATE_LIMIT_WINDOW_SECONDS = 60
+
+# The background writer started by configure_logging(), if any.
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as one JSON object: time, level, logger, message (and exception)."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets at most `limit` records below WARNING through per message template (logger
+    name plus the unformatted message) and `window` seconds. The next line let through
+    after a window notes how many similar lines were dropped. Templates only repeat
+    for lazily formatted calls (logger.info("... %s", value)); f-string messages are
+    all distinct and pass unthrottled.
+    """
+
+    def __init__(
+        self,
+        limit=DEFAULT_LOG_RATE_LIMIT,
+        window=DEFAULT_LOG_RATE_LIMIT_WINDOW_SECONDS,
+    ):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        # (logger name, template) -> [window start, lines let through, lines dropped]
+        self._windows = {}
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        state = self._windows.get(key)
+        if state is None or now - state[0] >= self.window:
+            if state is not None and state[2]:
+                record.msg = (
+                    f"{record.getMessage()} [{state[2]} similar line(s) suppressed "
+                    f"in the last {now - state[0]:.0f}s]"
+                )
+                record.args = None
+            self._windows[key] = [now, 1, 0]
+            return True
+        if state[1] < self.limit:
+            state[1] += 1
+            return True
+        state[2] += 1
+        return False
+
+
+class DeferredFormattingQueueHandler(QueueHandler):
+    """
+    Queues records as they are, so message formatting happens on the listener thread
+    instead of the event loop (the standard QueueHandler formats before queueing).
+    Log arguments must therefore not be mutated after the call, which holds for the
+    ids, titles and counts this bot logs.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def configure_logging(
+    log_format=DEFAULT_LOG_FORMAT,
+    asynchronous=True,
+    rate_limit=DEFAULT_LOG_RATE_LIMIT,
+    rate_limit_window=DEFAULT_LOG_RATE_LIMIT_WINDOW_SECONDS,
+    level=logging.INFO,
+    stream=None,
+):
+    """
+    Replaces the root logger's handlers with one that writes to `stream` (stdout by
+    default) in `log_format`. With `asynchronous`, records are handed to a background
+    thread through a queue, so a slow terminal or pipe never blocks the event loop;
+    queued records are written out by stop_logging(), which also runs at exit.
+    Raises ValueError for an unknown format.
+    """
+    global _listener
+    if log_format not in LOG_FORMATS:
+        raise ValueError(
+            f"Unknown log format '{log_format}'. Expected one of: {', '.join(LOG_FORMATS)}"
+        )
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(
+        JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_LOG_FORMAT)
+    )
+
+    stop_logging()
+    handler = output
+    if asynchronous:
+        records = queue.SimpleQueue()
+        handler = DeferredFormattingQueueHandler(records)
+        _listener = QueueListener(records, output)
+        _listener.start()
+    if rate_limit:
+        handler.addFilter(RateLimitFilter(rate_limit, rate_limit_window))
+
+    root = logging.getLogger()
+    for old_handler in root.handlers[:]:
+        root.removeHandler(old_handler)
+        old_handler.close()
+    root.addHandler(handler)
+    root.setLevel(level)
+
+
+def stop_logging():
+    """Writes out the queued records and stops the background writer, if one is running."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,227 @@
+import asyncio
+import logging
+import random
+from telethon.errors import (
+    ChatForwardsRestrictedError,
+    FileReferenceExpiredError,
+    FileReferenceInvalidError,
+)
+from helpers.media_pipe import MediaPipe, DEFAULT_MAX_PARTS_IN_FLIGHT
+from helpers.tracing import TRACER
+from telethon.tl.types import (
+    DocumentAttributeFilename,
+    InputFile,
+    InputFileBig,
+    InputMediaUploadedDocument,
+    InputMediaUploadedPhoto,
+    MessageMediaDocument,
+    MessageMediaPhoto,
+    MessageMediaWebPage,
+)
+
+media_copy_logger = logging.getLogger(__name__)
+
+# Size of each downloaded chunk and uploaded part. Telegram requires upload parts to
+# divide 512 KiB evenly, and this is also the largest chunk a download request returns.
+MEDIA_PART_SIZE = 512 * 1024
+# Files above this size must be uploaded as "big" files (SaveBigFilePartRequest).
+BIG_FILE_THRESHOLD = 10 * 1024 * 1024
+# Errors meaning Telegram refuses to reuse the source's file reference in another chat.
+REFERENCE_REFUSED_ERRORS = (
+    ChatForwardsRestrictedError,
+    FileReferenceExpiredError,
+    FileReferenceInvalidError,
+)
+
+
+class MediaCopier:
+    """
+    Copies message media to another chat while moving as few bytes as possible.
+    Photos and documents are first sent by reference (the InputMedia built from their
+    ids and file_reference), which costs no download or upload at all. Only when
+    Telegram refuses that (content-protected chats) is the file streamed through a
+    MediaPipe: downloaded in MEDIA_PART_SIZE chunks that are uploaded in parallel while
+    the download continues, with at most `max_parts_in_flight` parts held in memory.
+    Chats that refused once go straight to streaming afterwards. When the same messages
+    are copied to several targets (send_copies), media is transferred at most once.
+    """
+
+    def __init__(self, client, max_parts_in_flight=DEFAULT_MAX_PARTS_IN_FLIGHT):
+        self.client = client
+        self.pipe = MediaPipe(client, max_parts_in_flight)
+        self._reference_refused_chats = set()
+        self.stats = {
+            "by_reference": 0,
+            "reuploaded": 0,
+            "bytes_downloaded": 0,
+            "bytes_uploaded": 0,
+            "reused_across_targets": 0,
+        }
+
+    @staticmethod
+    def copyable_media(message):
+        """The media worth copying; web page previews are regenerated from the text instead."""
+        if message.media is None or isinstance(message.media, MessageMediaWebPage):
+            return None
+        return message.media
+
+    async def send_copy(self, messages, send):
+        """
+        Calls `send(files)` with one file per message (None for text-only messages),
+        first by reference and, if that is refused, with freshly uploaded media.
+        Returns the number of bytes transferred (downloaded plus uploaded).
+        """
+        transferred, errors = await self.send_copies(messages, [send])
+        if errors[0] is not None:
+            raise errors[0]
+        return transferred
+
+    async def send_copies(self, messages, sends):
+        """
+        Like send_copy for several targets at once, with one `send(files)` per target.
+        By reference, all targets are sent to concurrently. When Telegram refuses the
+        reference, the media is re-uploaded once, sent to the first target, and the
+        copies in that target's new message are reused by reference for the rest.
+        Returns the bytes transferred and, per send, None or the exception it raised.
+        """
+        chat_id = messages[0].chat_id
+        media = [self.copyable_media(m) for m in messages]
+        media_count = sum(1 for m in media if m is not None)
+        errors = [None] * len(sends)
+        pending = list(range(len(sends)))
+        protected = chat_id in self._reference_refused_chats or any(
+            getattr(m, "noforwards", False) for m in messages
+        )
+        if not protected or not any(media):
+            results = await asyncio.gather(
+                *(sends[i](media) for i in pending), return_exceptions=True
+            )
+            refused = []
+            for i, result in zip(pending, results):
+                if isinstance(result, REFERENCE_REFUSED_ERRORS):
+                    refused.append(i)
+                elif isinstance(result, BaseException):
+                    errors[i] = result
+                else:
+                    self.stats["by_reference"] += media_count
+            if not refused:
+                return 0, errors
+            media_copy_logger.info(
+                f"Telegram refused to reuse media from chat {chat_id} by reference ({results[refused[0]].__class__.__name__}). Re-uploading it instead."
+            )
+            self._reference_refused_chats.add(chat_id)
+            pending = refused
+
+        transferred = 0
+        uploaded = []
+        try:
+            for item in media:
+                if not isinstance(item, (MessageMediaPhoto, MessageMediaDocument)):
+                    # Nothing to re-upload (no media, or e.g. a poll or location).
+                    uploaded.append(item)
+                    continue
+                input_media, size = await self.reupload(item)
+                uploaded.append(input_media)
+                transferred += size * 2
+        except Exception as e:
+            for i in pending:
+                errors[i] = e
+            return transferred, errors
+
+        first, rest = pending[0], pending[1:]
+        reused = uploaded
+        try:
+            sent = await sends[first](uploaded)
+            reused = _sent_media(sent, uploaded)
+        except Exception as e:
+            errors[first] = e
+        if rest:
+            results = await asyncio.gather(
+                *(sends[i](reused) for i in rest), return_exceptions=True
+            )
+            for i, result in zip(rest, results):
+                if isinstance(result, BaseException):
+                    errors[i] = result
+                elif reused is not uploaded:
+                    self.stats["reused_across_targets"] += media_count
+        return transferred, errors
+
+    async def reupload(self, media):
+        """
+        Streams `media` from its source into a new upload and returns the matching
+        InputMediaUploaded* object together with the file size in bytes.
+        """
+        file_size = _media_size(media)
+        is_big = file_size is not None and file_size > BIG_FILE_THRESHOLD
+        file_id = random.randrange(-(2**63), 2**63)
+
+        with TRACER.span("media.reupload"):
+            parts, size = await self.pipe.transfer(
+                media, file_id, MEDIA_PART_SIZE, file_size=file_size, is_big=is_big
+            )
+        self.stats["reuploaded"] += 1
+        self.stats["bytes_downloaded"] += size
+        self.stats["bytes_uploaded"] += size
+        return _uploaded_input_media(media, file_id, parts, is_big), size
+
+    def stats_summary(self):
+        return (
+            f"by_reference={self.stats['by_reference']}, reuploaded={self.stats['reuploaded']}, "
+            f"bytes_downloaded={self.stats['bytes_downloaded']}, bytes_uploaded={self.stats['bytes_uploaded']}, "
+            f"reused_across_targets={self.stats['reused_across_targets']}"
+        )
+
+
+def _media_size(media):
+    if isinstance(media, MessageMediaDocument) and media.document is not None:
+        return media.document.size
+    return None
+
+
+def _sent_media(sent, uploaded):
+    """
+    The media of the message(s) a copy created, in the order of `uploaded`, to send
+    the same files to further targets by reference. Falls back to `uploaded` when the
+    result does not line up with it.
+    """
+    sent_messages = sent if isinstance(sent, list) else [sent]
+    if len(sent_messages) != len(uploaded):
+        return uploaded
+    reused = []
+    for message, item in zip(sent_messages, uploaded):
+        sent_item = getattr(message, "media", None)
+        if item is not None and not isinstance(
+            sent_item, (MessageMediaPhoto, MessageMediaDocument)
+        ):
+            return uploaded
+        reused.append(sent_item if item is not None else None)
+    return reused
+
+
+def _uploaded_input_media(media, file_id, parts, is_big):
+    if isinstance(media, MessageMediaPhoto):
+        return InputMediaUploadedPhoto(InputFile(file_id, parts, "photo.jpg", ""))
+
+    document = media.document
+    name = next(
+        (
+            attribute.file_name
+            for attribute in document.attributes
+            if isinstance(attribute, DocumentAttributeFilename)
+        ),
+        "file",
+    )
+    if is_big:
+        input_file = InputFileBig(file_id, parts, name)
+    else:
+        input_file = InputFile(file_id, parts, name, "")
+    return InputMediaUploadedDocument(
+        input_file, mime_type=document.mime_type, attributes=document.attributes
+    )
+
+
+def describe_transfer(transferred):
+    """Human-readable summary of the bytes a copy moved, for log lines."""
+    if not transferred:
+        return "media reused by reference, 0 bytes transferred"
+    return f"media re-uploaded, {transferred} bytes transferred"
@@ -0,0 +1,77 @@
+import asyncio
+import logging
+from telethon.tl.functions.upload import SaveBigFilePartRequest, SaveFilePartRequest
+
+pipe_logger = logging.getLogger(__name__)
+
+# Default number of parts that may be downloaded-but-not-yet-uploaded at once.
+DEFAULT_MAX_PARTS_IN_FLIGHT = 4
+
+
+class MediaPipe:
+    """
+    Streams one file from `client.iter_download` straight into a multi-part upload.
+    Each downloaded chunk is handed to its own upload task right away, so downloading
+    the next chunk overlaps with uploading the previous ones. At most
+    `max_parts_in_flight` chunks exist at any time: the download waits for a free slot
+    before fetching the next chunk, which bounds peak memory to
+    max_parts_in_flight * part_size regardless of the file size.
+    """
+
+    def __init__(self, client, max_parts_in_flight=DEFAULT_MAX_PARTS_IN_FLIGHT):
+        self.client = client
+        self.max_parts_in_flight = max(1, max_parts_in_flight)
+        self.peak_parts_in_flight = 0
+
+    async def transfer(self, media, file_id, part_size, file_size=None, is_big=False):
+        """
+        Copies `media` into the upload `file_id` and returns (parts, bytes) uploaded.
+        `file_size` is required for big files, whose parts must state the part total.
+        """
+        total_parts = -(-file_size // part_size) if file_size else None
+        slots = asyncio.Semaphore(self.max_parts_in_flight)
+        uploads = set()
+        in_flight = 0
+        part_index = 0
+        size = 0
+
+        async def upload(index, chunk):
+            nonlocal in_flight
+            try:
+                if is_big:
+                    request = SaveBigFilePartRequest(file_id, index, total_parts, chunk)
+                else:
+                    request = SaveFilePartRequest(file_id, index, chunk)
+                await self.client(request)
+            finally:
+                in_flight -= 1
+                slots.release()
+
+        try:
+            download = self.client.iter_download(
+                media, request_size=part_size, file_size=file_size
+            ).__aiter__()
+            while True:
+                await slots.acquire()
+                try:
+                    chunk = await download.__anext__()
+                except StopAsyncIteration:
+                    slots.release()
+                    break
+                in_flight += 1
+                self.peak_parts_in_flight = max(self.peak_parts_in_flight, in_flight)
+                uploads.add(asyncio.create_task(upload(part_index, chunk)))
+                # Surface upload failures as soon as they happen instead of at the end.
+                for finished in [t for t in uploads if t.done()]:
+                    uploads.discard(finished)
+                    finished.result()
+                part_index += 1
+                size += len(chunk)
+                del chunk
+            if uploads:
+                await asyncio.gather(*uploads)
+        except BaseException:
+            for task in uploads:
+                task.cancel()
+            raise
+        return part_index, size
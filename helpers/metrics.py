@@ -0,0 +1,186 @@
+import asyncio
+import logging
+from bisect import bisect_left
+
+metrics_logger = logging.getLogger(__name__)
+
+DEFAULT_METRICS_HTTP_HOST = "127.0.0.1"
+# Port of the /metrics HTTP exporter; 0 disables it.
+DEFAULT_METRICS_HTTP_PORT = 0
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implied.
+DEFAULT_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+class _Value:
+    """One labelled time series. Either holds a value or reads it from `function`."""
+
+    __slots__ = ("value", "function")
+
+    def __init__(self):
+        self.value = 0.0
+        self.function = None
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, function):
+        """Reads the value from `function()` at scrape time instead (e.g. a queue depth)."""
+        self.function = function
+
+    def get(self):
+        return self.function() if self.function is not None else self.value
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metric:
+    """
+    A metric family with a fixed set of label names. `labels(*values)` returns the
+    child series for those label values, creating it on first use. Hot paths should
+    look their children up once and keep them: recording on a child (`inc`, `set`,
+    `observe`) only updates numbers in place and allocates nothing.
+    """
+
+    def __init__(self, name, documentation, metric_type, labelnames=(), buckets=None):
+        self.name = name
+        self.documentation = documentation
+        self.type = metric_type
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) if buckets else None
+        self._children = {}
+
+    def labels(self, *labelvalues):
+        child = self._children.get(labelvalues)
+        if child is None:
+            if len(labelvalues) != len(self.labelnames):
+                raise ValueError(
+                    f"Metric '{self.name}' expects labels {self.labelnames}, got {labelvalues}"
+                )
+            if self.type == "histogram":
+                child = _HistogramValue(self.buckets)
+            else:
+                child = _Value()
+            self._children[labelvalues] = child
+        return child
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        for labelvalues, child in self._children.items():
+            labels = _format_labels(self.labelnames, labelvalues)
+            if self.type != "histogram":
+                lines.append(f"{self.name}{_braced(labels)} {_format_number(child.get())}")
+                continue
+            cumulative = 0
+            separator = "," if labels else ""
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_number(bound)
+                lines.append(
+                    f'{self.name}_bucket{{{labels}{separator}le="{le}"}} {cumulative}'
+                )
+            lines.append(f"{self.name}_sum{_braced(labels)} {_format_number(child.sum)}")
+            lines.append(f"{self.name}_count{_braced(labels)} {child.count}")
+        return "\n".join(lines)
+
+
+class MetricsRegistry:
+    """Holds metric families and renders them in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric '{metric.name}' is already registered.")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Metric(name, documentation, "counter", labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Metric(name, documentation, "gauge", labelnames))
+
+    def histogram(
+        self, name, documentation, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS
+    ):
+        return self._register(
+            Metric(name, documentation, "histogram", labelnames, buckets)
+        )
+
+    def render(self):
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+def _format_labels(labelnames, labelvalues):
+    return ",".join(
+        f'{name}="{_escape_label(value)}"' for name, value in zip(labelnames, labelvalues)
+    )
+
+
+def _braced(labels):
+    return f"{{{labels}}}" if labels else ""
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_number(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+async def start_metrics_server(registry, host, port):
+    """
+    Serves `registry` at http://host:port/metrics for Prometheus to scrape. This is a
+    minimal HTTP/1.0 responder on asyncio streams, so no web framework is needed.
+    """
+
+    async def handle(reader, writer):
+        try:
+            request_line = await reader.readline()
+            # Drain the request headers.
+            while (await reader.readline()).strip():
+                pass
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status, body = "200 OK", registry.render().encode("utf-8")
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            else:
+                status, body = "404 Not Found", b"Not found. Metrics are served at /metrics.\n"
+                content_type = "text/plain; charset=utf-8"
+            writer.write(
+                f"HTTP/1.0 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1")
+                + body
+            )
+            await writer.drain()
+        except Exception as e:
+            metrics_logger.warning(f"Metrics request failed: {e}")
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    metrics_logger.info(f"Metrics exporter listening on http://{host}:{port}/metrics")
+    return server
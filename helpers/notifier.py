@@ -3,8 +3,10 @@ import os
 from telethon import TelegramClient
 
 
-async def notify_telegram(client: TelegramClient, message: str):
-    chat_id = os.getenv("TELETHON_ACCOUNT_2_NOTIFICATION_CHAT_ID")
+async def notify_telegram(
+    client: TelegramClient, message: str, env_prefix: str = "TELETHON_ACCOUNT_1_"
+):
+    chat_id = os.getenv(f"{env_prefix}NOTIFICATION_CHAT_ID")
     if not chat_id:
         return
     try:
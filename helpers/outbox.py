@@ -0,0 +1,212 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from helpers.forward_queue import ForwardJob
+from helpers.forwarding import MAX_ALBUM_SIZE, MAX_FORWARD_BATCH_SIZE
+from helpers.routing import copies
+
+outbox_logger = logging.getLogger(__name__)
+
+# How long received messages wait to be committed together with the ones after them.
+DEFAULT_OUTBOX_COMMIT_INTERVAL_SECONDS = 0.005
+# Finished entries are kept this long (for inspection) before being pruned at startup.
+DEFAULT_OUTBOX_RETENTION_HOURS = 24
+
+# Entry states. Only "pending" entries are replayed after a restart.
+STATE_PENDING = "pending"
+STATE_SENT = "sent"
+STATE_FAILED = "failed"
+STATE_SKIPPED = "skipped"
+
+
+class Outbox:
+    """
+    Write-ahead log of received messages, kept in a SQLite database in WAL mode.
+    The handler records each message as pending before queueing it, and the forward
+    worker marks it sent, failed or skipped afterwards. Whatever is still pending after
+    a crash is replayed on the next start. The highest message id recorded per source
+    is kept as that source's high-water mark, which tells a restart where to resume.
+    Writes are group-committed: they are buffered for `commit_interval` seconds and
+    then written and fsynced in one transaction on a worker thread. Neither `record`
+    nor `mark` waits for that commit, so the cost per message on the event loop is a
+    few list appends. Rows are committed in the order they were buffered, so a
+    message's pending row is always committed no later than the mark that follows
+    it. A crash can lose what was buffered in the last `commit_interval`, but the
+    high-water marks of those messages are lost with it, so the backfill fetches
+    them again.
+    """
+
+    def __init__(
+        self,
+        path,
+        commit_interval=DEFAULT_OUTBOX_COMMIT_INTERVAL_SECONDS,
+        retention_seconds=DEFAULT_OUTBOX_RETENTION_HOURS * 3600,
+    ):
+        self.commit_interval = commit_interval
+        self._buffer = []
+        self._watermark_updates = {}
+        self._dirty = None
+        self._flusher = None
+        self._closing = False
+        self.stats = {"recorded": 0, "finished": 0, "commits": 0, "rows_committed": 0}
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Commits run on a worker thread, one at a time.
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " chat_id INTEGER NOT NULL,"
+            " message_id INTEGER NOT NULL,"
+            " grouped_id INTEGER,"
+            " state TEXT NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " PRIMARY KEY (chat_id, message_id)"
+            ") WITHOUT ROWID"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS watermarks ("
+            " chat_id INTEGER PRIMARY KEY,"
+            " last_message_id INTEGER NOT NULL"
+            ")"
+        )
+        pruned = self._conn.execute(
+            "DELETE FROM outbox WHERE state != ? AND updated_at < ?",
+            (STATE_PENDING, time.time() - retention_seconds),
+        ).rowcount
+        self._conn.commit()
+        if pruned:
+            outbox_logger.info(f"Pruned {pruned} finished entries from the outbox.")
+
+    def start(self):
+        self._dirty = asyncio.Event()
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Commits everything still buffered and closes the database."""
+        if self._flusher is not None:
+            self._closing = True
+            self._dirty.set()
+            await self._flusher
+            self._flusher = None
+        self._conn.close()
+
+    def record(self, chat_id, messages):
+        """Records `messages` as pending; committed with the next group, without waiting."""
+        now = time.time()
+        for message in messages:
+            self._buffer.append(
+                (chat_id, message.id, message.grouped_id, STATE_PENDING, now)
+            )
+        last_id = max(message.id for message in messages)
+        if last_id > self._watermark_updates.get(chat_id, 0):
+            self._watermark_updates[chat_id] = last_id
+        self.stats["recorded"] += len(messages)
+        self._dirty.set()
+
+    def mark(self, chat_id, message_ids, state):
+        """Sets the state of finished messages; committed with the next group, without waiting."""
+        now = time.time()
+        for message_id in message_ids:
+            self._buffer.append((chat_id, message_id, None, state, now))
+        self.stats["finished"] += len(message_ids)
+        self._dirty.set()
+
+    def pending(self):
+        """Messages still pending from a previous run as (chat_id, message_id, grouped_id) rows."""
+        return self._conn.execute(
+            "SELECT chat_id, message_id, grouped_id FROM outbox WHERE state = ? ORDER BY chat_id, message_id",
+            (STATE_PENDING,),
+        ).fetchall()
+
+    def watermarks(self):
+        """The last recorded message id per source chat, as a dict."""
+        return dict(
+            self._conn.execute("SELECT chat_id, last_message_id FROM watermarks")
+        )
+
+    async def _flush_loop(self):
+        while True:
+            await self._dirty.wait()
+            if not self._closing:
+                await asyncio.sleep(self.commit_interval)
+            self._dirty.clear()
+            rows, watermarks = self._buffer, self._watermark_updates
+            self._buffer, self._watermark_updates = [], {}
+            try:
+                await asyncio.to_thread(self._commit, rows, watermarks)
+            except Exception as e:
+                outbox_logger.error(
+                    f"ERROR: Failed to commit {len(rows)} outbox entries: {e}",
+                    exc_info=True,
+                )
+                if self._closing:
+                    return
+                continue
+            if self._closing and not self._buffer:
+                return
+
+    def _commit(self, rows, watermarks):
+        if not rows:
+            return
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO outbox (chat_id, message_id, grouped_id, state, updated_at)"
+                " VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (chat_id, message_id) DO UPDATE SET"
+                " state = excluded.state, updated_at = excluded.updated_at",
+                rows,
+            )
+            self._conn.executemany(
+                "INSERT INTO watermarks (chat_id, last_message_id) VALUES (?, ?)"
+                " ON CONFLICT (chat_id) DO UPDATE SET"
+                " last_message_id = MAX(last_message_id, excluded.last_message_id)",
+                watermarks.items(),
+            )
+        self.stats["commits"] += 1
+        self.stats["rows_committed"] += len(rows)
+
+    async def log_stats_periodically(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            outbox_logger.info(f"Outbox stats: {self.stats_summary()}")
+
+    def stats_summary(self):
+        commits = self.stats["commits"]
+        rows_per_commit = self.stats["rows_committed"] / commits if commits else 0.0
+        return (
+            f"recorded={self.stats['recorded']}, finished={self.stats['finished']}, "
+            f"commits={commits}, rows_per_commit={rows_per_commit:.1f}"
+        )
+
+
+def build_replay_jobs(pending_rows, source_routing_table):
+    """
+    Turns pending outbox rows back into ForwardJobs, in message order per source.
+    Sources that only forward are replayed in multi-id forwards of up to
+    MAX_FORWARD_BATCH_SIZE messages (forwards keep album grouping); sources with a copy
+    route are replayed album by album, since each copy is sent as one album or message.
+    """
+    jobs = []
+    current = None
+    for chat_id, message_id, grouped_id in pending_rows:
+        source_channel_config = source_routing_table.get(chat_id) or {}
+        if copies(source_channel_config):
+            key = (chat_id, grouped_id) if grouped_id else None
+            limit = MAX_ALBUM_SIZE
+        else:
+            key = (chat_id,)
+            limit = MAX_FORWARD_BATCH_SIZE
+        if (
+            key is None
+            or current is None
+            or current[0] != key
+            or len(current[1]) >= limit
+        ):
+            current = (key, [])
+            jobs.append((chat_id, current[1]))
+        current[1].append(message_id)
+    return [ForwardJob(chat_id, message_ids=ids) for chat_id, ids in jobs]
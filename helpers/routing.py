@@ -0,0 +1,110 @@
+import logging
+from telethon import utils
+
+routing_logger = logging.getLogger(__name__)
+
+
+def build_routing_table(resolved_sources):
+    """
+    Builds the lookup table used by the NewMessage handler to find the configuration
+    of the channel an event came from.
+    `resolved_sources` is an iterable of (entity, source_config) pairs collected while
+    resolving the source channels at startup. Keys are the marked peer ids that Telethon
+    reports as `event.chat_id` (e.g. -100xxxxxxxxxx for channels), so routing an event
+    is a single dict lookup no matter how many sources are configured.
+    """
+    routing_table = {}
+    for entity, source_config in resolved_sources:
+        peer_id = utils.get_peer_id(entity)
+        if peer_id in routing_table:
+            routing_logger.warning(
+                f"Source channel '{source_config.get('title', peer_id)}' resolves to the same chat ({peer_id}) as '{routing_table[peer_id].get('title', peer_id)}'. Keeping the first configuration."
+            )
+            continue
+        routing_table[peer_id] = source_config
+    return routing_table
+
+
+# How a route delivers a source's messages to its target: "forward" sends them as
+# forwards (with the "Forwarded from" header, no media transfer); "copy" sends them as
+# new messages, which also works for sources with content protection.
+MODE_FORWARD = "forward"
+MODE_COPY = "copy"
+ROUTE_MODES = (MODE_FORWARD, MODE_COPY)
+# TARGET_CHANNEL_CONFIG is target 1; TARGET_CHANNEL_CONFIG_2, _3, ... are the others.
+PRIMARY_TARGET = 1
+
+
+def parse_routes(source_config, target_numbers):
+    """
+    Normalizes the optional "targets" list of a source config into
+    source_config["routes"], a list of {"target": number, "mode": mode} dicts, and
+    returns it. Entries are a target number or {"target": number, "mode": "forward" or
+    "copy"}; without "targets" the source goes to target 1 only. The mode defaults to
+    "copy" for `protected_forwarding` sources and "forward" otherwise.
+    Raises ValueError for unknown or repeated targets and unknown modes.
+    """
+    default_mode = (
+        MODE_COPY if source_config.get("protected_forwarding", False) else MODE_FORWARD
+    )
+    routes = []
+    for entry in source_config.get("targets") or [PRIMARY_TARGET]:
+        if isinstance(entry, dict):
+            number, mode = entry.get("target"), entry.get("mode", default_mode)
+        else:
+            number, mode = entry, default_mode
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid target {number!r} in 'targets'.")
+        if number not in target_numbers:
+            raise ValueError(
+                f"Unknown target {number} in 'targets' (configured targets: {', '.join(map(str, target_numbers))})."
+            )
+        if mode not in ROUTE_MODES:
+            raise ValueError(
+                f"Unknown mode '{mode}' for target {number}. Expected one of: {', '.join(ROUTE_MODES)}"
+            )
+        if any(route["target"] == number for route in routes):
+            raise ValueError(f"Target {number} is listed more than once in 'targets'.")
+        routes.append({"target": number, "mode": mode})
+    source_config["routes"] = routes
+    return routes
+
+
+def copies(source_config):
+    """Whether any route of the source sends copies, which go out one album or message at a time."""
+    routes = source_config.get("routes")
+    if routes is None:
+        return source_config.get("protected_forwarding", False)
+    return any(route["mode"] == MODE_COPY for route in routes)
+
+
+class Route:
+    """One resolved delivery path of a source: the target number, its entity and the mode."""
+
+    __slots__ = ("number", "entity", "mode")
+
+    def __init__(self, number, entity, mode):
+        self.number = number
+        self.entity = entity
+        self.mode = mode
+
+
+def build_route_table(source_routing_table, target_channel_configs):
+    """
+    Resolves every source's routes against the target configs (numbered, each with
+    its resolved "entity") and returns {peer id: [Route, ...]}.
+    """
+    return {
+        chat_id: [
+            Route(
+                route["target"],
+                target_channel_configs[route["target"]]["entity"],
+                route["mode"],
+            )
+            for route in source_config.get("routes")
+            or parse_routes(source_config, list(target_channel_configs))
+        ]
+        for chat_id, source_config in source_routing_table.items()
+    }
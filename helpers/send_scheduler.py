@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import time
+from telethon.errors import FloodWaitError
+from helpers.tracing import TRACER
+
+scheduler_logger = logging.getLogger(__name__)
+
+# Starting send rate per destination, in requests per second.
+DEFAULT_SEND_RATE_PER_SECOND = 1.0
+# How many requests may go out back-to-back before pacing kicks in.
+DEFAULT_SEND_BURST = 5
+# Bounds for the adaptive rate.
+DEFAULT_MIN_SEND_RATE_PER_SECOND = 0.05
+DEFAULT_MAX_SEND_RATE_PER_SECOND = 5.0
+# Additive increase per successful request, and multiplicative decrease per FloodWait.
+RATE_INCREASE_STEP = 0.05
+RATE_DECREASE_FACTOR = 0.7
+# Once the rate is this close to where the last FloodWait happened, it only creeps up
+# (at a tenth of the normal step) to probe whether the server limit has moved.
+CEILING_APPROACH_RATIO = 0.9
+# How many times a request is retried after FloodWait before giving up.
+MAX_SEND_RETRIES = 5
+
+
+class TokenBucket:
+    """
+    Paces requests to one destination. The refill rate adapts to the server: every
+    success nudges it up a little, every FloodWait cuts it back and pauses the bucket for
+    the time Telegram asked for. The rate at which the last FloodWait happened is kept
+    as a ceiling that is only approached slowly, so sustained throughput settles just
+    under the server limit instead of repeatedly bouncing off it.
+    """
+
+    def __init__(self, rate, burst, min_rate, max_rate):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.tokens = float(burst)
+        self.paused_until = 0.0
+        self.ceiling = None
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self):
+        # The lock keeps waiters in FIFO order, so a busy destination stays fair.
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def on_success(self):
+        step = RATE_INCREASE_STEP
+        if self.ceiling is not None and self.rate >= self.ceiling * CEILING_APPROACH_RATIO:
+            step /= 10
+        self.rate = min(self.max_rate, self.rate + step)
+
+    def on_flood_wait(self, seconds):
+        now = time.monotonic()
+        self.ceiling = self.rate
+        self.rate = max(self.min_rate, self.rate * RATE_DECREASE_FACTOR)
+        self.paused_until = max(self.paused_until, now + seconds)
+        self.tokens = 0.0
+        self._updated_at = max(now, self.paused_until)
+
+
+class SendScheduler:
+    """
+    Runs outbound requests through a TokenBucket per destination and retries them
+    after FloodWait. Destinations are identified by any hashable key, normally the
+    marked peer id of the target chat.
+    """
+
+    def __init__(
+        self,
+        rate=DEFAULT_SEND_RATE_PER_SECOND,
+        burst=DEFAULT_SEND_BURST,
+        min_rate=DEFAULT_MIN_SEND_RATE_PER_SECOND,
+        max_rate=DEFAULT_MAX_SEND_RATE_PER_SECOND,
+        max_flood_wait=300,
+        max_retries=MAX_SEND_RETRIES,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.max_flood_wait = max_flood_wait
+        self.max_retries = max_retries
+        self._buckets = {}
+        self.stats = {"sent": 0, "flood_waits": 0, "flood_wait_seconds": 0, "retries": 0}
+
+    def bucket_for(self, key):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(
+                self.rate, self.burst, self.min_rate, self.max_rate
+            )
+        return bucket
+
+    async def send(self, key, request_factory, description="request"):
+        """
+        Awaits `request_factory()` once the destination's bucket allows it. FloodWaits
+        slow the bucket down and the request is retried after the wait; a FloodWait
+        longer than `max_flood_wait`, or one past `max_retries`, is re-raised.
+        """
+        bucket = self.bucket_for(key)
+        for attempt in range(self.max_retries + 1):
+            with TRACER.span("scheduler.wait"):
+                await bucket.acquire()
+            try:
+                with TRACER.span("scheduler.rpc"):
+                    result = await request_factory()
+            except FloodWaitError as e:
+                self.stats["flood_waits"] += 1
+                self.stats["flood_wait_seconds"] += e.seconds
+                bucket.on_flood_wait(e.seconds)
+                if e.seconds > self.max_flood_wait or attempt == self.max_retries:
+                    raise
+                self.stats["retries"] += 1
+                scheduler_logger.warning(
+                    f"FloodWait of {e.seconds}s sending {description} to {key}. Lowering send rate to {bucket.rate:.2f}/s and retrying after the wait..."
+                )
+                continue
+            bucket.on_success()
+            self.stats["sent"] += 1
+            return result
+
+    async def log_stats_periodically(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            scheduler_logger.info(f"Send scheduler stats: {self.stats_summary()}")
+
+    def stats_summary(self):
+        rates = ", ".join(
+            f"{key}={bucket.rate:.2f}/s" for key, bucket in self._buckets.items()
+        )
+        return (
+            f"sent={self.stats['sent']}, flood_waits={self.stats['flood_waits']}, "
+            f"flood_wait_seconds={self.stats['flood_wait_seconds']}, retries={self.stats['retries']}, "
+            f"rates=[{rates}]"
+        )
@@ -0,0 +1,246 @@
+import asyncio
+import json
+import logging
+import os
+import signal
+import sys
+import time
+
+supervisor_logger = logging.getLogger(__name__)
+
+# How often each worker process writes its status file.
+DEFAULT_STATUS_INTERVAL_SECONDS = 15
+# A worker whose status file is older than this is considered hung and restarted.
+DEFAULT_HEALTH_TIMEOUT_SECONDS = 120
+# Restart delays double from the initial value up to the maximum after each crash...
+RESTART_BACKOFF_INITIAL_SECONDS = 1
+RESTART_BACKOFF_MAX_SECONDS = 300
+# ...and go back to the initial value once a worker has stayed up this long.
+RESTART_BACKOFF_RESET_SECONDS = 300
+# How long a worker gets to shut down after SIGTERM before it is killed.
+TERMINATE_GRACE_SECONDS = 10
+
+
+def shard_accounts(account_configs, processes):
+    """Spreads account configs round-robin over at most `processes` shards."""
+    processes = max(1, min(processes, len(account_configs)))
+    return [account_configs[i::processes] for i in range(processes)]
+
+
+def write_status(path, accounts):
+    """
+    Writes the stats of every component of the given accounts (anything in
+    `account.components` with a `stats` dict) to `path`, atomically.
+    """
+    status = {
+        "pid": os.getpid(),
+        "written_at": time.time(),
+        "accounts": {
+            account.env_prefix: {
+                name: component.stats
+                for name, component in account.components.items()
+            }
+            for account in accounts
+        },
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(status, f)
+    os.replace(tmp_path, path)
+
+
+async def write_status_periodically(path, accounts, interval):
+    while True:
+        try:
+            write_status(path, accounts)
+        except Exception as e:
+            supervisor_logger.error(
+                f"ERROR: Could not write status file '{path}': {e}"
+            )
+        await asyncio.sleep(interval)
+
+
+class Shard:
+    """One worker process of the supervisor and the accounts it hosts."""
+
+    def __init__(self, index, env_prefixes, status_path, extra_args=()):
+        self.index = index
+        self.env_prefixes = env_prefixes
+        self.status_path = status_path
+        # Further command-line arguments for this shard's worker process.
+        self.extra_args = list(extra_args)
+        self.process = None
+        self.started_at = 0.0
+        self.restarts = 0
+
+    def __str__(self):
+        return f"shard {self.index} ({', '.join(self.env_prefixes)})"
+
+    def read_status(self):
+        try:
+            with open(self.status_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+
+class Supervisor:
+    """
+    Runs `script_path` once per shard in its own process, each with a subset of the
+    account prefixes, so the MTProto crypto and (de)serialization work of many accounts
+    is spread over several cores. Workers that exit are restarted with exponential
+    backoff; workers whose status file stops being refreshed are treated as hung and
+    restarted too. The stats the workers report are summed up and logged.
+    """
+
+    def __init__(
+        self,
+        script_path,
+        shards,
+        status_interval=DEFAULT_STATUS_INTERVAL_SECONDS,
+        health_timeout=DEFAULT_HEALTH_TIMEOUT_SECONDS,
+        stats_interval=60,
+    ):
+        self.script_path = script_path
+        self.shards = shards
+        self.status_interval = status_interval
+        self.health_timeout = health_timeout
+        self.stats_interval = stats_interval
+        self._stopping = asyncio.Event()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self._stopping.set)
+            except (NotImplementedError, RuntimeError):
+                # Not available on Windows; Ctrl+C still ends the run there.
+                pass
+        if hasattr(signal, "SIGHUP"):
+            loop.add_signal_handler(signal.SIGHUP, self._forward_reload)
+        supervisor_logger.info(
+            f"Supervisor starting {len(self.shards)} worker process(es): "
+            + "; ".join(str(shard) for shard in self.shards)
+        )
+        tasks = [
+            asyncio.create_task(self._keep_running(shard)) for shard in self.shards
+        ]
+        tasks.append(asyncio.create_task(self._monitor()))
+        try:
+            await self._stopping.wait()
+        finally:
+            supervisor_logger.info("Supervisor stopping all worker processes...")
+            self._stopping.set()
+            await asyncio.gather(
+                *(self._terminate(shard) for shard in self.shards),
+                return_exceptions=True,
+            )
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _keep_running(self, shard):
+        backoff = RESTART_BACKOFF_INITIAL_SECONDS
+        while not self._stopping.is_set():
+            if os.path.exists(shard.status_path):
+                os.remove(shard.status_path)
+            shard.process = await asyncio.create_subprocess_exec(
+                sys.executable,
+                self.script_path,
+                "--status-file",
+                shard.status_path,
+                *shard.extra_args,
+                *shard.env_prefixes,
+            )
+            shard.started_at = time.monotonic()
+            supervisor_logger.info(f"Started {shard} as PID {shard.process.pid}.")
+            exit_code = await shard.process.wait()
+            if self._stopping.is_set():
+                return
+
+            uptime = time.monotonic() - shard.started_at
+            if uptime >= RESTART_BACKOFF_RESET_SECONDS:
+                backoff = RESTART_BACKOFF_INITIAL_SECONDS
+            shard.restarts += 1
+            supervisor_logger.warning(
+                f"Worker process of {shard} exited with code {exit_code} after {uptime:.0f}s. Restarting in {backoff}s (restart #{shard.restarts})..."
+            )
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=backoff)
+            except asyncio.TimeoutError:
+                pass
+            backoff = min(backoff * 2, RESTART_BACKOFF_MAX_SECONDS)
+
+    def _forward_reload(self):
+        """Passes SIGHUP on to the workers, which reload their source channels."""
+        supervisor_logger.info("Asking every worker process to reload its configuration...")
+        for shard in self.shards:
+            if shard.process is not None and shard.process.returncode is None:
+                shard.process.send_signal(signal.SIGHUP)
+
+    async def _terminate(self, shard):
+        process = shard.process
+        if process is None or process.returncode is not None:
+            return
+        process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), timeout=TERMINATE_GRACE_SECONDS)
+        except asyncio.TimeoutError:
+            supervisor_logger.warning(
+                f"Worker process of {shard} did not stop within {TERMINATE_GRACE_SECONDS}s. Killing it."
+            )
+            process.kill()
+            await process.wait()
+
+    async def _monitor(self):
+        last_stats_log = time.monotonic()
+        while True:
+            await asyncio.sleep(self.status_interval)
+            self.check_health()
+            if time.monotonic() - last_stats_log >= self.stats_interval:
+                last_stats_log = time.monotonic()
+                supervisor_logger.info(f"Supervisor stats: {self.stats_summary()}")
+
+    def check_health(self):
+        now = time.monotonic()
+        for shard in self.shards:
+            process = shard.process
+            if process is None or process.returncode is not None:
+                continue
+            if now - shard.started_at < self.health_timeout:
+                continue  # Still starting up (logins, channel resolution).
+            status = shard.read_status()
+            age = time.time() - status["written_at"] if status else None
+            if age is None or age > self.health_timeout:
+                supervisor_logger.error(
+                    f"ERROR: Worker process of {shard} has not reported status for {'ever' if age is None else f'{age:.0f}s'}. Restarting it as hung."
+                )
+                asyncio.create_task(self._terminate(shard))
+
+    def aggregate_stats(self):
+        """Sums the numeric stats of all accounts in all shards, keyed 'component.stat'."""
+        totals = {}
+        for shard in self.shards:
+            status = shard.read_status()
+            if not status:
+                continue
+            for components in status["accounts"].values():
+                for component, stats in components.items():
+                    for name, value in stats.items():
+                        if isinstance(value, (int, float)):
+                            key = f"{component}.{name}"
+                            totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def stats_summary(self):
+        alive = sum(
+            1
+            for shard in self.shards
+            if shard.process is not None and shard.process.returncode is None
+        )
+        restarts = sum(shard.restarts for shard in self.shards)
+        totals = ", ".join(
+            f"{key}={value:.1f}" if isinstance(value, float) else f"{key}={value}"
+            for key, value in sorted(self.aggregate_stats().items())
+        )
+        return f"workers={alive}/{len(self.shards)}, restarts={restarts}, {totals}"
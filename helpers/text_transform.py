@@ -0,0 +1,264 @@
+import copy
+import heapq
+import logging
+import re
+from bisect import bisect_left, bisect_right
+from telethon.tl.types import (
+    MessageEntityUrl,
+    MessageEntityTextUrl,
+    MessageEntityMention,
+    MessageEntityMentionName,
+    InputMessageEntityMentionName,
+)
+
+text_transform_logger = logging.getLogger(__name__)
+
+# Characters outside the Basic Multilingual Plane (most emoji) take two UTF-16 code
+# units, which is what Telegram's entity offsets and lengths count.
+_ASTRAL = re.compile("[\U00010000-\U0010ffff]")
+# Characters that make a replacement pattern more than plain text.
+_REGEX_SPECIAL = frozenset(".^$*+?{}[]\\|()")
+
+
+def utf16_length(text):
+    if text.isascii():
+        return len(text)
+    return len(text) + sum(1 for _ in _ASTRAL.finditer(text))
+
+
+class TextTransform:
+    """
+    A source's compiled "transform" rules for copied messages: strip links and/or
+    @mentions, apply regex replacements and append a footer. All replacement patterns
+    are joined into one regex, and link and mention spans come from the message's own
+    entities, so a message is rewritten in a single pass over its text however many
+    rules there are. Entity offsets and lengths (UTF-16 code units) are shifted to
+    match the new text; entities inside removed spans are dropped.
+    """
+
+    def __init__(
+        self, strip_links=False, strip_mentions=False, replacements=(), footer=""
+    ):
+        """
+        `replacements` are (pattern, replacement) pairs; the replacement may refer to
+        the pattern's groups (\\1, \\g<name>). Matches do not overlap: the text is
+        scanned left to right and each span is rewritten at most once.
+        Raises ValueError for invalid patterns.
+        """
+        # Entities whose text is removed, and entities that are only dropped (their
+        # text, e.g. the words behind a hidden link, stays).
+        removed_types = []
+        dropped_types = []
+        if strip_links:
+            removed_types.append(MessageEntityUrl)
+            dropped_types.append(MessageEntityTextUrl)
+        if strip_mentions:
+            removed_types.append(MessageEntityMention)
+            dropped_types += [MessageEntityMentionName, InputMessageEntityMentionName]
+        self._removed_types = tuple(removed_types)
+        self._skipped_types = tuple(removed_types + dropped_types)
+
+        # Plain-text patterns (optionally wrapped in \\b...\\b) are looked up by the text
+        # they matched; the others keep their own compiled pattern, by rule index.
+        self._words = {}
+        self._literals = {}
+        self._regexes = []
+        branches = []
+        for index, (pattern, replacement) in enumerate(replacements):
+            if not isinstance(pattern, str) or not pattern:
+                raise ValueError(
+                    f"Replacement {index + 1} has an invalid pattern {pattern!r}."
+                )
+            if not isinstance(replacement, str):
+                raise ValueError(
+                    f"Replacement {index + 1} has an invalid replacement {replacement!r}."
+                )
+            try:
+                compiled = re.compile(pattern)
+                # Fails early for references to groups the pattern does not have.
+                compiled.sub(replacement, "")
+            except re.error as e:
+                raise ValueError(f"Replacement {index + 1} is invalid: {e}")
+            word = pattern[2:-2] if re.fullmatch(r"\\b.+\\b", pattern) else None
+            if "\\" not in replacement and _is_plain(word or pattern):
+                literals = self._words if word else self._literals
+                literals.setdefault(word or pattern, replacement)
+                continue
+            branches.append(f"(?P<_r{len(self._regexes)}>{pattern})")
+            self._regexes.append((compiled, replacement, "\\" in replacement))
+        # Where several rules match at one position, plain texts win over regexes and
+        # the longest text wins (the alternations are sorted longest first).
+        if self._words:
+            branches.insert(0, rf"(?P<_w>\b(?:{_alternation(self._words)})\b)")
+        if self._literals:
+            branches.insert(0, f"(?P<_l>{_alternation(self._literals)})")
+        self._pattern = None
+        if branches:
+            try:
+                # Literal texts go in one group-less alternation, which the regex engine
+                # scans much faster than a group per rule. Each regex sits in its own
+                # named group; the outer group closes last, so lastgroup names the
+                # rule that matched.
+                self._pattern = re.compile("|".join(branches))
+            except re.error as e:
+                raise ValueError(
+                    f"The replacement patterns cannot be combined (inline flags such as (?i) must be scoped, e.g. (?i:...), and group names must be unique): {e}"
+                )
+        self.footer = footer or ""
+
+    def _spans(self, text, entities, astral16):
+        """Yields the (start, end, replacement) edits of `text` in order, in code points."""
+        removed = []
+        if self._removed_types and entities:
+            for entity in entities:
+                if isinstance(entity, self._removed_types):
+                    start = entity.offset - bisect_left(astral16, entity.offset)
+                    end16 = entity.offset + entity.length
+                    removed.append((start, end16 - bisect_left(astral16, end16), ""))
+            removed.sort()
+        if self._pattern is None:
+            return removed
+        matches = (
+            (match.start(), match.end(), self._replacement(match))
+            for match in self._pattern.finditer(text)
+        )
+        if not removed:
+            return matches
+        return heapq.merge(removed, matches, key=lambda span: span[0])
+
+    def _replacement(self, match):
+        group = match.lastgroup
+        if group == "_w":
+            return self._words[match.group()]
+        if group == "_l":
+            return self._literals[match.group()]
+        compiled, replacement, expands = self._regexes[int(group[2:])]
+        if not expands:
+            return replacement
+        # Group numbers in the combined pattern are shifted, so expand on the pattern's own match.
+        return compiled.match(match.string, match.start()).expand(replacement)
+
+    def apply(self, text, entities):
+        """Returns the rewritten text and a new list of entities; the inputs are not modified."""
+        text = text or ""
+        entities = entities or []
+        # Code point indices of the astral characters, and their UTF-16 offsets.
+        astral = [] if text.isascii() else [m.start() for m in _ASTRAL.finditer(text)]
+        astral16 = [position + count for count, position in enumerate(astral)]
+
+        pieces = []
+        # Per edit: UTF-16 start and end in the old text, start and length in the new one.
+        starts16 = []
+        edits16 = []
+        position = 0
+        new_length16 = 0
+        for start, end, replacement in self._spans(text, entities, astral16):
+            if start < position:
+                continue  # Overlaps the previous edit, which wins.
+            start16 = start + bisect_left(astral, start)
+            end16 = end + bisect_left(astral, end)
+            new_length16 += start16 - (position + bisect_left(astral, position))
+            replacement16 = utf16_length(replacement)
+            starts16.append(start16)
+            edits16.append((end16, new_length16, replacement16))
+            pieces.append(text[position:start])
+            pieces.append(replacement)
+            new_length16 += replacement16
+            position = end
+        if not pieces:
+            new_text = text
+        else:
+            pieces.append(text[position:])
+            new_text = "".join(pieces)
+
+        # Telegram trims surrounding whitespace, which removals often leave behind.
+        stripped = new_text.strip()
+        left = len(new_text) - len(new_text.lstrip())
+        # Everything after the last edit is unchanged.
+        total16 = new_length16 + len(text) + len(astral) - position - bisect_left(
+            astral, position
+        )
+        right16 = total16 - (len(new_text) - len(new_text.rstrip()))
+
+        new_entities = []
+        for entity in entities:
+            if isinstance(entity, self._skipped_types):
+                continue
+            start16 = min(
+                max(_shift(entity.offset, starts16, edits16, False), left), right16
+            )
+            end16 = min(
+                max(_shift(entity.offset + entity.length, starts16, edits16, True), left),
+                right16,
+            )
+            if end16 <= start16:
+                continue
+            if start16 - left != entity.offset or end16 - start16 != entity.length:
+                entity = copy.copy(entity)
+                entity.offset = start16 - left
+                entity.length = end16 - start16
+            new_entities.append(entity)
+
+        if self.footer:
+            stripped += self.footer if stripped else self.footer.lstrip()
+        return stripped, new_entities
+
+
+def _is_plain(pattern):
+    return not any(char in _REGEX_SPECIAL for char in pattern)
+
+
+def _alternation(texts):
+    return "|".join(map(re.escape, sorted(texts, key=len, reverse=True)))
+
+
+def _shift(offset16, starts16, edits16, is_end):
+    """
+    Maps a UTF-16 offset of the old text to the new one. An entity boundary inside an
+    edited span moves to the edge of its replacement, so the replacement keeps the
+    formatting of the entity around it.
+    """
+    index = bisect_right(starts16, offset16) - 1
+    if index < 0:
+        return offset16
+    end16, new_start16, replacement16 = edits16[index]
+    if offset16 >= end16:
+        return new_start16 + replacement16 + offset16 - end16
+    if offset16 == starts16[index] or not is_end:
+        return new_start16
+    return new_start16 + replacement16
+
+
+def compile_text_transform(source_config):
+    """
+    Compiles the optional "transform" object of a source config (strip_links,
+    strip_mentions, "replace": [{"pattern", "with"}, ...], footer) into
+    source_config["text_transform"] and returns it; None if the source has none.
+    Raises ValueError for invalid settings.
+    """
+    settings = source_config.get("transform")
+    if not settings:
+        source_config["text_transform"] = None
+        return None
+    if not isinstance(settings, dict):
+        raise ValueError("'transform' must be an object.")
+    replacements = settings.get("replace") or []
+    if not isinstance(replacements, list) or not all(
+        isinstance(r, dict) for r in replacements
+    ):
+        raise ValueError(
+            "'transform.replace' must be a list of {\"pattern\", \"with\"} objects."
+        )
+    if not isinstance(settings.get("footer", ""), str):
+        raise ValueError("'transform.footer' must be a string.")
+    text_transform = TextTransform(
+        strip_links=bool(settings.get("strip_links", False)),
+        strip_mentions=bool(settings.get("strip_mentions", False)),
+        replacements=[(r.get("pattern"), r.get("with", "")) for r in replacements],
+        footer=settings.get("footer", ""),
+    )
+    source_config["text_transform"] = text_transform
+    text_transform_logger.info(
+        f"Compiled text transform for source '{source_config.get('title', 'Unknown Channel')}' ({len(replacements)} replacement(s))."
+    )
+    return text_transform
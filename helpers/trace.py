@@ -0,0 +1,177 @@
+import asyncio
+import json
+import logging
+import time
+
+from telethon.tl.types import MessageMediaDocument, MessageMediaPhoto, MessageMediaWebPage
+
+trace_logger = logging.getLogger(__name__)
+
+TRACE_VERSION = 2
+# Version 1 traces have no source lines; they read the same otherwise.
+SUPPORTED_TRACE_VERSIONS = (1, 2)
+KIND_NEW = "n"
+KIND_EDIT = "e"
+# Buffered events are written out after this many events, and at least this often, so a
+# crash or kill loses little of the trace.
+TRACE_FLUSH_EVENTS = 100
+DEFAULT_TRACE_FLUSH_INTERVAL_SECONDS = 5
+
+
+class TraceRecorder:
+    """
+    Appends anonymized metadata of every received message to a JSON-lines trace file,
+    for replaying the real traffic mix offline (see read_trace). Each run starts with a
+    header line listing the sources (only whether they are protected); each event is
+    [ms since the header, source index, kind, media type, size in bytes, album number,
+    text length]. Sources added later (by a configuration reload, see add_sources) get
+    the next free index and a {"source": index, "protected": flag} line. Chat ids,
+    message ids, texts and file names are never written, and grouped ids are replaced
+    by album numbers counted from 1 in each run.
+    """
+
+    def __init__(self, path, source_configs_by_chat):
+        self.path = path
+        self._source_indexes = {
+            chat_id: index for index, chat_id in enumerate(source_configs_by_chat)
+        }
+        self._albums = {}
+        self._unflushed = 0
+        self._file = open(path, "a", encoding="utf-8")
+        self._started = time.monotonic()
+        self.stats = {"events": 0, "sources": len(self._source_indexes)}
+        self._write(
+            {
+                "version": TRACE_VERSION,
+                "started_at": int(time.time()),
+                "protected": [
+                    bool(config.get("protected_forwarding", False))
+                    for config in source_configs_by_chat.values()
+                ],
+            }
+        )
+        self.flush()
+
+    def add_sources(self, source_configs_by_chat):
+        """Gives every chat of `source_configs_by_chat` not traced yet the next source index."""
+        for chat_id, config in source_configs_by_chat.items():
+            if chat_id in self._source_indexes:
+                continue
+            source_index = len(self._source_indexes)
+            self._source_indexes[chat_id] = source_index
+            self._write(
+                {
+                    "source": source_index,
+                    "protected": bool(config.get("protected_forwarding", False)),
+                }
+            )
+            self.stats["sources"] += 1
+        self.flush()
+
+    def _write(self, entry):
+        self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+    def record(self, chat_id, message, kind=KIND_NEW, received_at=None):
+        """Appends one event; `received_at` is a time.monotonic() value (default: now)."""
+        source_index = self._source_indexes.get(chat_id)
+        if source_index is None:
+            return
+        album = 0
+        if message.grouped_id:
+            album = self._albums.setdefault(message.grouped_id, len(self._albums) + 1)
+        media_type, size = _describe_media(message.media)
+        self._write(
+            [
+                round(((received_at or time.monotonic()) - self._started) * 1000),
+                source_index,
+                kind,
+                media_type,
+                size,
+                album,
+                len(message.message or ""),
+            ]
+        )
+        self.stats["events"] += 1
+        self._unflushed += 1
+        if self._unflushed >= TRACE_FLUSH_EVENTS:
+            self.flush()
+
+    def flush(self):
+        self._file.flush()
+        self._unflushed = 0
+
+    async def flush_periodically(self, interval=DEFAULT_TRACE_FLUSH_INTERVAL_SECONDS):
+        while True:
+            await asyncio.sleep(interval)
+            if self._unflushed:
+                self.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def _describe_media(media):
+    if media is None or isinstance(media, MessageMediaWebPage):
+        return "", 0
+    if isinstance(media, MessageMediaPhoto):
+        sizes = getattr(media.photo, "sizes", None) or []
+        return "photo", max((getattr(s, "size", 0) for s in sizes), default=0)
+    if isinstance(media, MessageMediaDocument):
+        return "document", getattr(media.document, "size", 0) or 0
+    return "other", 0
+
+
+def read_trace(path):
+    """
+    Reads a trace written by TraceRecorder and returns (protected, events), with the
+    runs it contains played back to back. `protected` has one flag per source index,
+    including sources added during a run;
+    each event is a dict with offset (seconds), source, kind, media, size, album (unique
+    across runs, 0 for none) and text_length. Raises ValueError for malformed lines.
+    """
+    protected = []
+    events = []
+    run_offset = 0.0
+    album_offset = 0
+    max_album = 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                if isinstance(entry, dict) and "version" not in entry:
+                    # A source added during the run.
+                    source = entry["source"]
+                    if source >= len(protected):
+                        protected.extend([False] * (source + 1 - len(protected)))
+                    protected[source] = bool(entry["protected"])
+                    continue
+                if isinstance(entry, dict):
+                    if entry.get("version") not in SUPPORTED_TRACE_VERSIONS:
+                        raise ValueError(
+                            f"unsupported trace version {entry.get('version')}"
+                        )
+                    if len(entry["protected"]) > len(protected):
+                        protected = [bool(flag) for flag in entry["protected"]]
+                    run_offset = events[-1]["offset"] if events else 0.0
+                    album_offset = max_album
+                    continue
+                offset_ms, source, kind, media, size, album, text_length = entry
+            except (ValueError, KeyError, TypeError) as e:
+                raise ValueError(f"{path}:{line_number}: malformed trace line: {e}")
+            if album:
+                album += album_offset
+                max_album = max(max_album, album)
+            events.append(
+                {
+                    "offset": run_offset + offset_ms / 1000,
+                    "source": source,
+                    "kind": kind,
+                    "media": media,
+                    "size": size,
+                    "album": album,
+                    "text_length": text_length,
+                }
+            )
+    return protected, events
@@ -0,0 +1,136 @@
+import logging
+import time
+from collections import deque
+
+tracing_logger = logging.getLogger(__name__)
+
+# Durations kept per stage for the percentile breakdown (the most recent ones).
+DEFAULT_STAGE_SAMPLES = 10000
+
+
+class _NullSpan:
+    """The span handed out while tracing is disabled: entering and leaving it does nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "started")
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.started
+        for sink in self.tracer.sinks:
+            sink.record(self.name, duration, exc_type is not None)
+        return False
+
+
+class Tracer:
+    """
+    Times named stages with `with tracer.span("stage"):` blocks (which may contain
+    awaits) and hands each duration to its sinks. A sink is any object with a
+    `record(name, seconds, failed)` method. While the tracer is disabled, `span()`
+    returns a shared no-op context manager, so instrumented code costs one attribute
+    check per stage.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.sinks = []
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+        return sink
+
+    def span(self, name):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+
+class StageStatsSink:
+    """Keeps the most recent durations of each stage and summarizes them as percentiles."""
+
+    def __init__(self, samples=DEFAULT_STAGE_SAMPLES):
+        self.samples = samples
+        self._durations = {}
+        self._counts = {}
+        self._failures = {}
+
+    def record(self, name, seconds, failed=False):
+        durations = self._durations.get(name)
+        if durations is None:
+            durations = self._durations[name] = deque(maxlen=self.samples)
+            self._counts[name] = 0
+            self._failures[name] = 0
+        durations.append(seconds)
+        self._counts[name] += 1
+        if failed:
+            self._failures[name] += 1
+
+    def breakdown(self):
+        """Per-stage count, failures and p50/p90/p99/max in milliseconds, by stage name."""
+        result = {}
+        for name, durations in sorted(self._durations.items()):
+            ordered = sorted(durations)
+            result[name] = {
+                "count": self._counts[name],
+                "failed": self._failures[name],
+                "p50_ms": _percentile(ordered, 0.50) * 1000,
+                "p90_ms": _percentile(ordered, 0.90) * 1000,
+                "p99_ms": _percentile(ordered, 0.99) * 1000,
+                "max_ms": ordered[-1] * 1000,
+            }
+        return result
+
+    def summary(self):
+        breakdown = self.breakdown()
+        if not breakdown:
+            return "no spans recorded yet"
+        width = max(len("stage"), *(len(name) for name in breakdown))
+        lines = [
+            f"{'stage':<{width}} {'count':>8} {'failed':>6} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+        ]
+        for name, stage in breakdown.items():
+            lines.append(
+                f"{name:<{width}} {stage['count']:>8} {stage['failed']:>6} {stage['p50_ms']:>9.2f} "
+                f"{stage['p90_ms']:>9.2f} {stage['p99_ms']:>9.2f} {stage['max_ms']:>9.2f}"
+            )
+        return "\n".join(lines)
+
+
+class LoggingSink:
+    """Logs every span at DEBUG level (on the given logger), for following single messages."""
+
+    def __init__(self, logger=tracing_logger):
+        self.logger = logger
+
+    def record(self, name, seconds, failed=False):
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(
+                f"Span {name} took {seconds * 1000:.2f} ms{' (failed)' if failed else ''}"
+            )
+
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+# The process-wide tracer the pipeline stages report to; the forwarder enables it from config.
+TRACER = Tracer()
@@ -0,0 +1,209 @@
+import json
+import os
+import sys
+from dotenv import load_dotenv
+
+# --- Import our new config parser ---
+# Adjust path if validate_config.py is in a subfolder like 'helpers'
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from helpers.config_parser import (
+    parse_channel_env_var,
+    parse_channel_json,
+    validate_channel_config,
+)
+from helpers.channel_store import SourceChannelFile
+from helpers.routing import parse_routes
+from helpers.content_filter import compile_content_filter
+from helpers.text_transform import compile_text_transform
+
+sys.path.pop(0)  # Remove added path to keep sys.path clean
+
+# Define the path to proj_config.json relative to the script's location
+# If validate_config.py is in 'helpers/', then 'proj_config.json' is in the parent directory.
+PROJECT_ROOT = os.path.join(os.path.dirname(__file__), "..")
+CONFIG_PATH = os.path.join(PROJECT_ROOT, "proj_config.json")
+CONFIG_PATH = os.path.abspath(CONFIG_PATH)
+
+# Required keys expected in proj_config.json
+# Removed 'active_start_hour', 'active_end_hour', 'operation_duration_hours'
+# as the bot is now configured for continuous operation.
+REQUIRED_CONFIG_KEYS = ["timezone"]
+
+
+def validate_account(env_prefix):
+    """Validates the environment variables of one account, e.g. TELETHON_ACCOUNT_1_*."""
+    print(f"\n=== Validating account '{env_prefix}' ===")
+
+    # 1. Validate core environment variables
+    REQUIRED_CORE_ENV_VARS = [
+        f"{env_prefix}API_ID",
+        f"{env_prefix}API_HASH",
+        f"{env_prefix}PHONE_NUMBER",
+        f"{env_prefix}NOTIFICATION_CHAT_ID",  # Added notification chat ID to required env vars
+    ]
+    all_core_env_vars_present = True
+    for var in REQUIRED_CORE_ENV_VARS:
+        value = os.getenv(var)
+        if not value:
+            print(f"ERROR: Missing or empty environment variable: '{var}'")
+            all_core_env_vars_present = False
+    if all_core_env_vars_present:
+        print("SUCCESS: All core environment variables are set.")
+    else:
+        print(
+            "\nPlease set all required environment variables in your .env file or system environment."
+        )
+        return False
+
+    # 2. Validate target channel environment variable
+    print("\n--- Validating Target Channel Configuration ---")
+    target_channel_config_name = f"{env_prefix}TARGET_CHANNEL_CONFIG"
+    try:
+        target_channel_config = os.getenv(target_channel_config_name)
+        if not target_channel_config:
+            print(
+                f"ERROR: Environment variable '{target_channel_config_name}' is missing or empty."
+            )
+            return False
+        # Attempt to parse to ensure it's valid JSON (or string)
+        parse_channel_env_var(
+            target_channel_config_name
+        )  # Pass the correct name to the parser
+        print(f"SUCCESS: {target_channel_config_name} loaded and parsed successfully.")
+    except Exception as e:
+        print(f"ERROR: {target_channel_config_name} configuration is invalid: {e}")
+        return False
+
+    # Further fan-out targets: TARGET_CHANNEL_CONFIG_2, _3, ...
+    target_numbers = [1]
+    while True:
+        target_channel_config_name = (
+            f"{env_prefix}TARGET_CHANNEL_CONFIG_{len(target_numbers) + 1}"
+        )
+        if not os.getenv(target_channel_config_name):
+            break
+        try:
+            parse_channel_env_var(target_channel_config_name)
+            print(f"SUCCESS: {target_channel_config_name} loaded and parsed successfully.")
+        except Exception as e:
+            print(f"ERROR: {target_channel_config_name} configuration is invalid: {e}")
+            return False
+        target_numbers.append(len(target_numbers) + 1)
+
+    # 3. Validate source channel environment variables
+    print("\n--- Validating Source Channel Configurations ---")
+    source_channels_found = False
+    source_channels_file = os.getenv(f"{env_prefix}SOURCE_CHANNELS_FILE")
+    if source_channels_file:
+        # Relative paths are relative to the project root, as in the bot.
+        source_channels_file = os.path.join(
+            os.path.abspath(PROJECT_ROOT), source_channels_file
+        )
+        entry_count = 0
+        try:
+            for origin, channel_config_str in SourceChannelFile(
+                source_channels_file
+            ).entries():
+                try:
+                    source_config = validate_channel_config(
+                        parse_channel_json(channel_config_str, origin), origin
+                    )
+                    if source_config is not None:
+                        parse_routes(source_config, target_numbers)
+                        compile_content_filter(source_config)
+                        compile_text_transform(source_config)
+                except Exception as e:
+                    print(f"ERROR: {origin} configuration is invalid: {e}")
+                    return False
+                entry_count += 1
+        except OSError as e:
+            print(f"ERROR: Could not read {env_prefix}SOURCE_CHANNELS_FILE: {e}")
+            return False
+        source_channels_found = entry_count > 0
+        print(
+            f"SUCCESS: {entry_count} source channel(s) in {source_channels_file} loaded and parsed successfully."
+        )
+    i = 1
+    while True:
+        source_channel_config_name = f"{env_prefix}SOURCE_CHANNEL_{i}"
+        source_channel_config_value = os.getenv(source_channel_config_name)
+        if not source_channel_config_value:
+            break
+        source_channels_found = True
+        try:
+            source_config = parse_channel_env_var(source_channel_config_name)
+            if source_config is not None:
+                parse_routes(source_config, target_numbers)
+                compile_content_filter(source_config)
+                compile_text_transform(source_config)
+            print(
+                f"SUCCESS: {source_channel_config_name} loaded and parsed successfully."
+            )
+        except Exception as e:
+            print(f"ERROR: {source_channel_config_name} configuration is invalid: {e}")
+            return False
+        i += 1
+
+    if not source_channels_found:
+        print(
+            "ERROR: No source channels configured. "
+            f"Please set at least one {env_prefix}SOURCE_CHANNEL_1 environment variable or list them in {env_prefix}SOURCE_CHANNELS_FILE. At least one is required."
+        )
+        return False
+
+    return True
+
+
+def validate():
+    print("--- Running Configuration Validation ---")
+    load_dotenv()  # Load .env variables for validation
+
+    # 4. Validate proj_config.json file existence
+    print("\n--- Validating proj_config.json ---")
+    if not os.path.exists(CONFIG_PATH):
+        print(f"ERROR: proj_config.json not found at: {CONFIG_PATH}.")
+        return False
+
+    # 5. Validate proj_config.json content
+    try:
+        with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except json.JSONDecodeError:
+        print(f"ERROR: Failed to parse proj_config.json: It might be malformed JSON.")
+        return False
+    except Exception as e:
+        print(
+            f"ERROR: An unexpected error occurred while loading proj_config.json: {e}"
+        )
+        return False
+
+    for key in REQUIRED_CONFIG_KEYS:
+        if key not in data:
+            print(f"ERROR: Missing required config field in proj_config.json: '{key}'")
+            return False
+        if data[key] is None:  # Check for None values for required keys
+            print(
+                f"ERROR: Required config field '{key}' in proj_config.json cannot be empty."
+            )
+            return False
+
+    print("SUCCESS: All proj_config.json fields are present.")
+
+    # 6. Validate every account listed in proj_config.json
+    accounts = data.get("accounts") or [{"env_prefix": "TELETHON_ACCOUNT_1_"}]
+    for account in accounts:
+        if not account.get("env_prefix"):
+            print(
+                f"ERROR: Account entry {account} in proj_config.json has no 'env_prefix'."
+            )
+            return False
+        if not validate_account(account["env_prefix"]):
+            return False
+
+    print("\n--- All Configurations Validated Successfully! ---")
+    return True
+
+
+if __name__ == "__main__":
+    if not validate():
+        sys.exit(1)
@@ -4,9 +4,6 @@
 # Removed LOG_DIR, BOT_LOG_FILE, START_LOG_FILE definitions
 # Removed mkdir -p "$LOG_DIR"
 
-# Run the Telegram bots directly in the background
-python3 frank_bot/telegram_channel_forwarder.py &
-python3 raymond_bot/telegram_channel_forwarder.py &
-
-# Wait for all background jobs to finish (optional, but good practice)
-wait
\ No newline at end of file
+# Run the Telegram bot under its supervisor: the accounts in proj_config.json are spread
+# over one worker process per CPU core, and workers that crash or hang are restarted.
+exec python3 telegram_channel_forwarder.py --supervisor
@@ -8,7 +8,7 @@
 # 4. Creates and activates a Python virtual environment.
 # 5. Installs all Python dependencies from requirements.txt.
 # 6. Runs the configuration validation script (helpers/validate_config.py).
-# 7. Starts the Telegram bot (telegram_channel_forwarder.py) within a 'screen' session for persistent execution.
+# 7. Starts the Telegram bot (telegram_channel_forwarder.py --supervisor, all accounts) within a 'screen' session for persistent execution.
 
 # Exit immediately if a command exits with a non-zero status.
 set -e
@@ -103,18 +103,10 @@ echo "=================================================="
 echo "[STEP 2] Validating Configurations..."
 echo "=================================================="
 
-# Run the configuration validation script
-python3 frank_bot/helpers/validate_config.py
+# Run the configuration validation script (checks every account in proj_config.json)
+python3 helpers/validate_config.py
 if [ $? -ne 0 ]; then
-    echo "ERROR: Frank bot configuration validation failed."
-    echo "Please check the error messages above for details and fix your .env or proj_config.json."
-    deactivate # Deactivate venv before exiting
-    exit 1
-fi
-
-python3 raymond_bot/helpers/validate_config.py
-if [ $? -ne 0 ]; then
-    echo "ERROR: Raymond bot configuration validation failed."
+    echo "ERROR: Configuration validation failed."
     echo "Please check the error messages above for details and fix your .env or proj_config.json."
     deactivate # Deactivate venv before exiting
     exit 1
@@ -126,17 +118,14 @@ echo "=================================================="
 echo "[STEP 3] Running Telegram Channel Forwarder Bot..."
 echo "=================================================="
 
-# Start each bot in its own unique screen session
-echo "Starting Frank bot in a new 'screen' session named 'frank_bot'."
-screen -dmS frank_bot bash -c "source venv/bin/activate && python3 frank_bot/telegram_channel_forwarder.py"
-
-echo "Starting Raymond bot in a new 'screen' session named 'raymond_bot'."
-screen -dmS raymond_bot bash -c "source venv/bin/activate && python3 raymond_bot/telegram_channel_forwarder.py"
+# All accounts listed in proj_config.json run under the supervisor, in one screen session:
+# they are spread over one worker process per CPU core, and crashed or hung workers are restarted.
+echo "Starting the forwarder for all accounts in a new 'screen' session named 'forwarder'."
+screen -dmS forwarder bash -c "source venv/bin/activate && python3 telegram_channel_forwarder.py --supervisor"
 
-echo "Bots started in 'screen' sessions. To re-attach to Frank bot, run: screen -r frank_bot"
-echo "To re-attach to Raymond bot, run: screen -r raymond_bot"
+echo "Bot started in a 'screen' session. To re-attach, run: screen -r forwarder"
 echo "To list all screen sessions, run: screen -ls"
 echo "To detach, press Ctrl+A then D."
-echo "To stop a bot, re-attach to its session and press Ctrl+C."
+echo "To stop the bot, re-attach to its session and press Ctrl+C."
 
 echo "Setup and run process complete."
\ No newline at end of file
@@ -45,17 +45,7 @@ echo ==================================================
 echo [STEP 2] Validating Configurations...
 echo ==================================================
 :: This output will now go directly to the console
-python frank_bot\helpers\validate_config.py
-IF %ERRORLEVEL% NEQ 0 (
-  echo ERROR: Configuration validation failed.
-  echo.
-  echo Please check the error messages above for details and fix your .env or proj_config.json.
-  pause
-  exit /b
-)
-echo SUCCESS: All configurations validated successfully!
-
-python raymond_bot\helpers\validate_config.py
+python helpers\validate_config.py
 IF %ERRORLEVEL% NEQ 0 (
   echo ERROR: Configuration validation failed.
   echo.
@@ -70,9 +60,9 @@ echo.
 echo ==================================================
 echo [STEP 3] Running Telegram Channel Forwarder Bot...
 echo ==================================================
-:: Use the 'start' command to run each bot in a new, separate window.
-start "Frank Bot" python frank_bot\telegram_channel_forwarder.py
-start "Raymond Bot" python raymond_bot\telegram_channel_forwarder.py
+:: Use the 'start' command to run the bot (all accounts in proj_config.json) in a new window,
+:: under the supervisor, which restarts worker processes that crash or hang.
+start "Forwarder Bot" python telegram_channel_forwarder.py --supervisor
 
 :: The 'pause' command will keep the original terminal open.
 pause
\ No newline at end of file
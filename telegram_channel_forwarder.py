@@ -0,0 +1,1489 @@
+import logging
+import json
+import os
+import sys
+import asyncio
+import glob
+import shutil
+import argparse
+import itertools
+import signal
+import time
+from dotenv import find_dotenv
+from telethon import TelegramClient, events, utils
+from telethon.tl.functions.messages import ImportChatInviteRequest
+from telethon.errors import (
+    UserAlreadyParticipantError,
+    InviteHashExpiredError,
+    ChatIdInvalidError,
+    ChannelPrivateError,
+    UserNotParticipantError,
+    AuthKeyError,
+    SessionPasswordNeededError,
+    RPCError,
+)
+
+# --- Import our new config parser ---
+from helpers.config_parser import (
+    parse_channel_env_var,
+    parse_channel_json,
+    validate_channel_config,
+)
+
+# --- Import the file-based source channel store ---
+from helpers.channel_store import SourceChannelFile
+
+# --- Import the notifier ---
+from helpers.notifier import notify_telegram
+
+# --- Import the chat-id routing table and per-source fan-out routes ---
+from helpers.routing import (
+    build_routing_table,
+    build_route_table,
+    parse_routes,
+    copies,
+    MODE_COPY,
+)
+
+# --- Import the compiled keyword/regex content filter ---
+from helpers.content_filter import compile_content_filter
+
+# --- Import the text transform pipeline for copied messages ---
+from helpers.text_transform import compile_text_transform
+
+# --- Import the configuration hot reload ---
+from helpers.config_reload import (
+    EnvFileReloader,
+    watch_for_changes,
+    source_key,
+    diff_sources,
+    DEFAULT_CONFIG_RELOAD_INTERVAL_SECONDS,
+)
+
+# --- Import the concurrent source channel resolver ---
+from helpers.channel_resolver import (
+    resolve_source_channels,
+    DEFAULT_RESOLVE_CONCURRENCY,
+    DEFAULT_MAX_FLOOD_WAIT_SECONDS,
+    DEFAULT_FLOOD_SLEEP_THRESHOLD_SECONDS,
+)
+
+# --- Import the persistent entity cache ---
+from helpers.entity_cache import EntityCache, DEFAULT_ENTITY_CACHE_TTL_HOURS
+
+# --- Import the forwarding helpers and album batcher ---
+from helpers.forwarding import (
+    send_to_targets,
+    MAX_ALBUM_SIZE,
+    DEFAULT_ALBUM_WINDOW_SECONDS,
+    MAX_FORWARD_BATCH_SIZE,
+    DEFAULT_FORWARD_COALESCE_WINDOW_SECONDS,
+)
+from helpers.batcher import MessageBatcher
+
+# --- Import the forwarding queue and worker pool ---
+from helpers.forward_queue import (
+    ForwardQueue,
+    ForwardJob,
+    DEFAULT_FORWARD_WORKERS,
+    DEFAULT_FORWARD_QUEUE_MAX_DEPTH,
+    DEFAULT_FORWARD_QUEUE_POLICY,
+)
+
+# --- Import the zero-reupload media copier ---
+from helpers.media_copy import MediaCopier
+from helpers.media_pipe import DEFAULT_MAX_PARTS_IN_FLIGHT
+
+# --- Import the content-hash dedup index ---
+from helpers.dedup import (
+    DedupIndex,
+    content_key,
+    DEFAULT_DEDUP_TTL_HOURS,
+    DEFAULT_DEDUP_MEMORY_ENTRIES,
+    DEFAULT_DEDUP_MIN_TEXT_LENGTH,
+)
+
+# --- Import the write-ahead outbox ---
+from helpers.outbox import (
+    Outbox,
+    build_replay_jobs,
+    DEFAULT_OUTBOX_COMMIT_INTERVAL_SECONDS,
+    DEFAULT_OUTBOX_RETENTION_HOURS,
+    STATE_SENT,
+    STATE_FAILED,
+    STATE_SKIPPED,
+)
+
+# --- Import the catch-up backfiller ---
+from helpers.backfill import (
+    Backfiller,
+    DEFAULT_BACKFILL_CONCURRENCY,
+    DEFAULT_BACKFILL_MAX_MESSAGES,
+)
+
+# --- Import the multi-process supervisor ---
+from helpers.supervisor import (
+    Supervisor,
+    Shard,
+    shard_accounts,
+    write_status_periodically,
+    DEFAULT_STATUS_INTERVAL_SECONDS,
+    DEFAULT_HEALTH_TIMEOUT_SECONDS,
+)
+
+# --- Import the event-loop selection ---
+from helpers.event_loop import install_event_loop_policy, DEFAULT_EVENT_LOOP
+
+# --- Import the metrics registry and exporter ---
+from helpers.metrics import (
+    MetricsRegistry,
+    start_metrics_server,
+    DEFAULT_METRICS_HTTP_HOST,
+    DEFAULT_METRICS_HTTP_PORT,
+)
+
+# --- Import the logging backend ---
+from helpers.logging_setup import (
+    configure_logging,
+    DEFAULT_LOG_FORMAT,
+    DEFAULT_LOG_RATE_LIMIT,
+    DEFAULT_LOG_RATE_LIMIT_WINDOW_SECONDS,
+)
+
+# --- Import the traffic trace recorder ---
+from helpers.trace import TraceRecorder, KIND_EDIT
+
+# --- Import the stage timing tracer ---
+from helpers.tracing import TRACER, StageStatsSink, LoggingSink
+
+# --- Import the rate-limit-aware send scheduler ---
+from helpers.send_scheduler import (
+    SendScheduler,
+    DEFAULT_SEND_RATE_PER_SECOND,
+    DEFAULT_SEND_BURST,
+    DEFAULT_MAX_SEND_RATE_PER_SECOND,
+)
+
+
+# --- Custom Exception for Controlled Exits ---
+class BotFatalError(Exception):
+    """Custom exception for critical errors that should stop the bot."""
+
+    pass
+
+
+# --- CRITICAL PATH FIX FOR REPLIT ---
+# For local Windows execution, this will effectively be os.getcwd()
+# but this block specifically handles Replit's environment.
+replit_root_dir = os.getcwd()
+replit_site_packages_path = os.path.join(
+    replit_root_dir, ".pythonlibs", "lib", "python3.12", "site-packages"
+)
+if (
+    os.path.exists(replit_site_packages_path)
+    and replit_site_packages_path not in sys.path
+):
+    sys.path.insert(0, replit_site_packages_path)
+# --- END CRITICAL PATH FIX ---
+
+
+# --- LOGGING SETUP ---
+# Initialize Logging to console only
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    handlers=[logging.StreamHandler(sys.stdout)],
+)
+logger = logging.getLogger(__name__)
+
+# Prevent Telethon's logger from adding duplicate handlers
+if not any(
+    isinstance(h, logging.StreamHandler) for h in logging.getLogger("telethon").handlers
+):
+    telethon_logger = logging.getLogger("telethon")
+    telethon_logger.setLevel(logging.WARNING)
+    telethon_logger.addHandler(logging.StreamHandler(sys.stdout))
+
+
+# Loads .env into os.environ; reload_configuration() re-reads it later.
+ENV_RELOADER = EnvFileReloader(find_dotenv())
+ENV_RELOADER.load()
+
+# --- Configuration Loading from proj_config.json ---
+CONFIG_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "proj_config.json"
+)
+CONFIG = {}
+try:
+    if os.path.exists(CONFIG_PATH):
+        with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+            CONFIG = json.load(f)
+        logger.info(f"Configuration loaded from {CONFIG_PATH}.")
+    else:
+        logger.warning(f"Warning: {CONFIG_PATH} not found. Using default/empty config.")
+except json.JSONDecodeError:
+    logger.critical(
+        f"FATAL ERROR: Could not parse {CONFIG_PATH}. It might be malformed JSON. Exiting."
+    )
+    raise BotFatalError(f"Malformed proj_config.json: {CONFIG_PATH}")
+except Exception as e:
+    logger.critical(
+        f"FATAL ERROR: An unexpected error occurred while loading {CONFIG_PATH}: {e}. Exiting.",
+        exc_info=True,
+    )
+    raise BotFatalError(f"Error loading proj_config.json: {e}")
+
+# --- General Bot Settings from CONFIG ---
+BOT_TITLE = CONFIG.get("title", "Telegram Channel Forwarder Bot")
+BOT_SHORTNAME = CONFIG.get("shortname", "ForwarderBot")
+UGANDA_TIMEZONE_STR = CONFIG.get("timezone", "Africa/Kampala")
+SOURCE_RESOLVE_CONCURRENCY = CONFIG.get(
+    "source_resolve_concurrency", DEFAULT_RESOLVE_CONCURRENCY
+)
+MAX_FLOOD_WAIT_SECONDS = CONFIG.get(
+    "max_flood_wait_seconds", DEFAULT_MAX_FLOOD_WAIT_SECONDS
+)
+FLOOD_SLEEP_THRESHOLD_SECONDS = CONFIG.get(
+    "flood_sleep_threshold_seconds", DEFAULT_FLOOD_SLEEP_THRESHOLD_SECONDS
+)
+ENTITY_CACHE_TTL_HOURS = CONFIG.get(
+    "entity_cache_ttl_hours", DEFAULT_ENTITY_CACHE_TTL_HOURS
+)
+ALBUM_WINDOW_SECONDS = CONFIG.get("album_window_seconds", DEFAULT_ALBUM_WINDOW_SECONDS)
+FORWARD_COALESCE_WINDOW_SECONDS = CONFIG.get(
+    "forward_coalesce_window_seconds", DEFAULT_FORWARD_COALESCE_WINDOW_SECONDS
+)
+FORWARD_COALESCE_MAX_MESSAGES = min(
+    CONFIG.get("forward_coalesce_max_messages", MAX_FORWARD_BATCH_SIZE),
+    MAX_FORWARD_BATCH_SIZE,
+)
+FORWARD_WORKERS = CONFIG.get("forward_workers", DEFAULT_FORWARD_WORKERS)
+FORWARD_QUEUE_MAX_DEPTH = CONFIG.get(
+    "forward_queue_max_depth", DEFAULT_FORWARD_QUEUE_MAX_DEPTH
+)
+FORWARD_QUEUE_POLICY = CONFIG.get("forward_queue_policy", DEFAULT_FORWARD_QUEUE_POLICY)
+FORWARD_QUEUE_STATS_INTERVAL_SECONDS = CONFIG.get(
+    "forward_queue_stats_interval_seconds", 60
+)
+MEDIA_UPLOAD_PARTS_IN_FLIGHT = CONFIG.get(
+    "media_upload_parts_in_flight", DEFAULT_MAX_PARTS_IN_FLIGHT
+)
+SEND_RATE_PER_SECOND = CONFIG.get("send_rate_per_second", DEFAULT_SEND_RATE_PER_SECOND)
+SEND_BURST = CONFIG.get("send_burst", DEFAULT_SEND_BURST)
+MAX_SEND_RATE_PER_SECOND = CONFIG.get(
+    "max_send_rate_per_second", DEFAULT_MAX_SEND_RATE_PER_SECOND
+)
+DEDUP_ENABLED = CONFIG.get("dedup_enabled", True)
+DEDUP_TTL_HOURS = CONFIG.get("dedup_ttl_hours", DEFAULT_DEDUP_TTL_HOURS)
+DEDUP_MEMORY_ENTRIES = CONFIG.get("dedup_memory_entries", DEFAULT_DEDUP_MEMORY_ENTRIES)
+DEDUP_MIN_TEXT_LENGTH = CONFIG.get(
+    "dedup_min_text_length", DEFAULT_DEDUP_MIN_TEXT_LENGTH
+)
+OUTBOX_COMMIT_INTERVAL_SECONDS = CONFIG.get(
+    "outbox_commit_interval_seconds", DEFAULT_OUTBOX_COMMIT_INTERVAL_SECONDS
+)
+OUTBOX_RETENTION_HOURS = CONFIG.get(
+    "outbox_retention_hours", DEFAULT_OUTBOX_RETENTION_HOURS
+)
+BACKFILL_ENABLED = CONFIG.get("backfill_enabled", True)
+BACKFILL_CONCURRENCY = CONFIG.get("backfill_concurrency", DEFAULT_BACKFILL_CONCURRENCY)
+BACKFILL_MAX_MESSAGES = CONFIG.get(
+    "backfill_max_messages", DEFAULT_BACKFILL_MAX_MESSAGES
+)
+EVENT_LOOP = CONFIG.get("event_loop", DEFAULT_EVENT_LOOP)
+# 0 means one worker process per CPU core (never more than there are accounts).
+SUPERVISOR_PROCESSES = CONFIG.get("supervisor_processes", 0)
+SUPERVISOR_STATUS_INTERVAL_SECONDS = CONFIG.get(
+    "supervisor_status_interval_seconds", DEFAULT_STATUS_INTERVAL_SECONDS
+)
+SUPERVISOR_HEALTH_TIMEOUT_SECONDS = CONFIG.get(
+    "supervisor_health_timeout_seconds", DEFAULT_HEALTH_TIMEOUT_SECONDS
+)
+METRICS_HTTP_HOST = CONFIG.get("metrics_http_host", DEFAULT_METRICS_HTTP_HOST)
+# 0 disables the exporter. In supervisor mode worker N serves on this port + N.
+METRICS_HTTP_PORT = CONFIG.get("metrics_http_port", DEFAULT_METRICS_HTTP_PORT)
+# "text" or "json" log lines.
+LOG_FORMAT = CONFIG.get("log_format", DEFAULT_LOG_FORMAT)
+# Write log lines from a background thread, so a slow stdout never blocks the event loop.
+LOG_ASYNC = CONFIG.get("log_async", True)
+# Repeated per-message INFO lines let through per window (0 disables the limit).
+LOG_RATE_LIMIT = CONFIG.get("log_rate_limit", DEFAULT_LOG_RATE_LIMIT)
+LOG_RATE_LIMIT_WINDOW_SECONDS = CONFIG.get(
+    "log_rate_limit_window_seconds", DEFAULT_LOG_RATE_LIMIT_WINDOW_SECONDS
+)
+
+# Check .env for changes this often and reload the source channels when it changed;
+# 0 disables polling (send SIGHUP to reload instead).
+CONFIG_RELOAD_INTERVAL_SECONDS = CONFIG.get(
+    "config_reload_interval_seconds", DEFAULT_CONFIG_RELOAD_INTERVAL_SECONDS
+)
+
+# Record anonymized metadata of received messages to sessions/<prefix>trace.jsonl,
+# for replaying real traffic offline (python helpers/benchmark.py replay).
+TRACE_RECORDING_ENABLED = CONFIG.get("trace_recording_enabled", False)
+# Times each pipeline and startup stage; send SIGUSR1 for a percentile breakdown.
+TRACING_ENABLED = CONFIG.get("tracing_enabled", False)
+# Also log every span at DEBUG level.
+TRACING_LOG_SPANS = CONFIG.get("tracing_log_spans", False)
+
+# --- Metrics ---
+# Recorded by every account in this process and served in the Prometheus text format
+# at http://METRICS_HTTP_HOST:METRICS_HTTP_PORT/metrics when the exporter is enabled.
+# Series are labeled by account (env prefix) and by channel as "title (peer id)", so
+# channels (or accounts) that share a title never merge into one series.
+METRICS = MetricsRegistry()
+MESSAGES_RECEIVED = METRICS.counter(
+    "forwarder_messages_received_total",
+    "Messages received from a source channel (live or backfilled).",
+    ("account", "source", "target"),
+)
+MESSAGES_DEDUPED = METRICS.counter(
+    "forwarder_messages_deduped_total",
+    "Messages skipped because their content was forwarded recently.",
+    ("account", "source", "target"),
+)
+MESSAGES_FILTERED = METRICS.counter(
+    "forwarder_messages_filtered_total",
+    "Messages not sent to the target channel because of the source's content filter.",
+    ("account", "source", "target"),
+)
+MESSAGES_FORWARDED = METRICS.counter(
+    "forwarder_messages_forwarded_total",
+    "Messages forwarded to the target channel.",
+    ("account", "source", "target"),
+)
+MESSAGES_COPIED = METRICS.counter(
+    "forwarder_messages_copied_total",
+    "Messages sent to the target channel as copies (copy routes, protected sources).",
+    ("account", "source", "target"),
+)
+MESSAGES_FAILED = METRICS.counter(
+    "forwarder_messages_failed_total",
+    "Messages that could not be sent to the target channel.",
+    ("account", "source", "target"),
+)
+FORWARD_LATENCY = METRICS.histogram(
+    "forwarder_forward_latency_seconds",
+    "Time from a message's date in the source channel until its send completed.",
+    ("account", "target"),
+)
+QUEUE_DEPTH = METRICS.gauge(
+    "forwarder_queue_depth",
+    "Jobs waiting in the forward queue, including spilled ones.",
+    ("account",),
+)
+FLOOD_WAIT_SECONDS = METRICS.counter(
+    "forwarder_flood_wait_seconds_total",
+    "Seconds of FloodWait imposed by Telegram on sends.",
+    ("account",),
+)
+
+# --- Logging backend ---
+# Replaces the console handler set up above, now that the settings are known.
+try:
+    configure_logging(
+        LOG_FORMAT,
+        asynchronous=LOG_ASYNC,
+        rate_limit=LOG_RATE_LIMIT,
+        rate_limit_window=LOG_RATE_LIMIT_WINDOW_SECONDS,
+    )
+except ValueError as e:
+    logger.critical(f"FATAL ERROR: Invalid log_format setting: {e}. Exiting.")
+    raise BotFatalError(f"Invalid log_format setting: {e}")
+
+# --- Tracing ---
+# Stages report to the shared TRACER; while it is disabled its spans are no-ops.
+TRACER.enabled = TRACING_ENABLED
+STAGE_STATS = TRACER.add_sink(StageStatsSink())
+if TRACING_LOG_SPANS:
+    TRACER.add_sink(LoggingSink())
+
+# --- Accounts hosted by this process ---
+# Each account reads its credentials and channels from environment variables starting
+# with its "env_prefix" (e.g. TELETHON_ACCOUNT_1_API_ID) and keeps its session and
+# state files in sessions/ under the same prefix.
+ACCOUNT_CONFIGS = CONFIG.get("accounts") or [{"env_prefix": "TELETHON_ACCOUNT_1_"}]
+SESSIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sessions")
+
+# Accounts loaded by main(), kept for the final cleanup.
+ACCOUNTS = []
+
+
+def migrate_legacy_session_files(env_prefix):
+    """
+    Moves an account's session and state files from the old per-account bot folders
+    (e.g. frank_bot/sessions/) into the shared sessions/ folder, so existing logins
+    keep working after switching to the multi-account runner.
+    """
+    if glob.glob(os.path.join(SESSIONS_DIR, f"{env_prefix}session*")):
+        return
+    legacy_files = glob.glob(
+        os.path.join(os.path.dirname(SESSIONS_DIR), "*", "sessions", f"{env_prefix}*")
+    )
+    for legacy_file in legacy_files:
+        destination = os.path.join(SESSIONS_DIR, os.path.basename(legacy_file))
+        shutil.move(legacy_file, destination)
+        logger.info(f"Moved legacy session file '{legacy_file}' to '{destination}'.")
+
+
+class ForwarderAccount:
+    """
+    One Telegram account hosted by this process: its credentials, target and source
+    channel configs, TelegramClient and entity cache. Raises BotFatalError if the
+    account's environment variables are missing or invalid. A ready-made `client`
+    (e.g. a FakeTelegramClient for load tests) is used instead of a new TelegramClient.
+    """
+
+    def __init__(self, account_config, client=None):
+        self.env_prefix = account_config.get("env_prefix", "TELETHON_ACCOUNT_1_")
+        self.title = account_config.get("title", BOT_TITLE)
+        self.shortname = account_config.get("shortname", BOT_SHORTNAME)
+        self.logger = logging.getLogger(f"{__name__}.{self.env_prefix.rstrip('_')}")
+        logger = self.logger
+        prefix = self.env_prefix
+
+        # --- Telethon API Credentials from Environment Variables ---
+        self.api_id = os.getenv(f"{prefix}API_ID")
+        self.api_hash = os.getenv(f"{prefix}API_HASH")
+        self.phone_number = os.getenv(f"{prefix}PHONE_NUMBER")
+
+        if not all([self.api_id, self.api_hash, self.phone_number]):
+            logger.critical(
+                f"FATAL ERROR: {prefix}API_ID, {prefix}API_HASH, or {prefix}PHONE_NUMBER not found in .env."
+            )
+            raise BotFatalError("Missing critical Telethon environment variables.")
+
+        try:
+            self.api_id = int(self.api_id)
+        except ValueError:
+            logger.critical(f"FATAL ERROR: {prefix}API_ID must be an integer.")
+            raise BotFatalError(f"{prefix}API_ID must be an integer.")
+
+        # --- Use the new helper function for configuration loading ---
+        try:
+            self.target_channel_config = parse_channel_env_var(
+                f"{prefix}TARGET_CHANNEL_CONFIG"
+            )
+            logger.info(
+                f"Target channel config loaded: {self.target_channel_config.get('title', 'N/A')}"
+            )
+        except ValueError as e:
+            logger.critical(
+                f"FATAL ERROR during target channel config parsing: {e}."
+            )
+            raise BotFatalError(f"Target channel config invalid: {e}")
+        except RuntimeError as e:
+            logger.critical(
+                f"FATAL ERROR during target channel config parsing (unexpected error): {e}.",
+                exc_info=True,
+            )
+            raise BotFatalError(f"Target channel config parsing error: {e}")
+
+        # Further targets for fan-out: TARGET_CHANNEL_CONFIG_2, _3, ... Sources pick
+        # theirs (and the forward/copy mode per target) with a "targets" list.
+        self.target_channel_configs = {1: self.target_channel_config}
+        for number in itertools.count(2):
+            env_var_name = f"{prefix}TARGET_CHANNEL_CONFIG_{number}"
+            if os.getenv(env_var_name) is None:
+                break
+            try:
+                target_config = parse_channel_env_var(env_var_name)
+            except (ValueError, RuntimeError) as e:
+                logger.critical(
+                    f"FATAL ERROR: Failed to parse target channel '{env_var_name}': {e}."
+                )
+                raise BotFatalError(
+                    f"Target channel config {env_var_name} invalid: {e}"
+                )
+            if target_config is not None:
+                self.target_channel_configs[number] = target_config
+                logger.info(
+                    f"Target channel {number} config loaded: {target_config.get('title', 'N/A')}"
+                )
+
+        # Optional JSON-lines file with (many more) source channels; see load_source_channel_configs().
+        self.source_channel_file = None
+        self.source_channel_configs = self.load_source_channel_configs()
+        if not self.source_channel_configs:
+            logger.critical(
+                f"FATAL ERROR: No valid source channel configurations found in .env (e.g., {prefix}SOURCE_CHANNEL_1) or {prefix}SOURCE_CHANNELS_FILE. At least one source channel is required."
+            )
+            raise BotFatalError("No valid source channel configurations found.")
+
+        os.makedirs(SESSIONS_DIR, exist_ok=True)
+        migrate_legacy_session_files(prefix)
+        self.client = client or TelegramClient(
+            self.state_path("session"), self.api_id, self.api_hash
+        )
+        # Telethon sleeps out short FloodWaits on any RPC (login, media part transfers,
+        # notifications); longer ones are raised to the channel resolver and the send
+        # scheduler, which back off and adapt their pacing. Telethon's default of 60s would
+        # hide most of them from the scheduler.
+        self.client.flood_sleep_threshold = FLOOD_SLEEP_THRESHOLD_SECONDS
+
+        # Resolved entities and joined invite hashes survive restarts in this file, so a warm
+        # start does not need to call get_entity or ImportChatInviteRequest again.
+        self.entity_cache = EntityCache(
+            self.state_path("entity_cache.json"),
+            ttl_seconds=ENTITY_CACHE_TTL_HOURS * 3600,
+        )
+        # Pipeline components with a `stats` dict, reported to the supervisor.
+        self.components = {}
+        # Set by run_account() once the account is running: reloads its source channels.
+        self.reload_sources = None
+
+    def load_source_channel_configs(self):
+        """
+        Parses this account's source channels (with their routes, content filter and
+        text transform) and returns the valid, active ones. They come from the
+        JSON-lines file named by SOURCE_CHANNELS_FILE, if set, and from the
+        SOURCE_CHANNEL_1, _2, ... variables on top of it: a variable for the same
+        channel (same id, username or invite hash) replaces the file's entry, or
+        disables it with "active": false. Invalid sources are logged and skipped.
+        """
+        logger = self.logger
+        file_configs = {}
+        store_path = os.getenv(f"{self.env_prefix}SOURCE_CHANNELS_FILE")
+        if store_path:
+            # Relative paths are relative to the bot's folder, like sessions/.
+            store_path = os.path.join(
+                os.path.dirname(os.path.abspath(__file__)), store_path
+            )
+            if (
+                self.source_channel_file is None
+                or self.source_channel_file.path != store_path
+            ):
+                self.source_channel_file = SourceChannelFile(store_path)
+            try:
+                for origin, channel_config_str in self.source_channel_file.entries():
+                    key, source_config = self._load_source_config(
+                        origin, channel_config_str
+                    )
+                    if source_config is None:
+                        continue
+                    if key in file_configs:
+                        logger.warning(
+                            f"Source channel at '{origin}' is already listed in the file. Keeping the first entry."
+                        )
+                        continue
+                    file_configs[key] = source_config
+            except OSError as e:
+                logger.error(
+                    f"ERROR: Could not read the source channel file '{store_path}': {e}. Continuing without it."
+                )
+            logger.info(
+                f"Loaded {len(file_configs)} source channel config(s) from '{store_path}'."
+            )
+        else:
+            self.source_channel_file = None
+
+        # Inactive variables are kept as None, so they also disable the file's entry.
+        env_configs = {}
+        for i in itertools.count(1):
+            env_var_name = f"{self.env_prefix}SOURCE_CHANNEL_{i}"
+            source_channel_str = os.getenv(env_var_name)
+            if source_channel_str is None:
+                break
+            key, source_config = self._load_source_config(
+                env_var_name, source_channel_str
+            )
+            if key is None or key in env_configs:
+                continue
+            env_configs[key] = source_config
+            if source_config is not None:
+                logger.info(
+                    f"Source channel '{env_var_name}' config loaded: {source_config.get('title', 'N/A')}"
+                )
+
+        file_configs.update(env_configs)
+        return [
+            source_config
+            for source_config in file_configs.values()
+            if source_config is not None
+        ]
+
+    def _load_source_config(self, origin, channel_config_str):
+        """
+        Parses, validates and compiles one source channel config from `origin` (an
+        environment variable or file:line). Returns (source_key, config); the config is
+        None if the channel is inactive, and both are None if it is invalid (logged).
+        """
+        try:
+            channel_data = parse_channel_json(channel_config_str, origin)
+            source_config = validate_channel_config(channel_data, origin)
+            if source_config is None:
+                return source_key(channel_data), None
+            parse_routes(source_config, list(self.target_channel_configs))
+            compile_content_filter(source_config)
+            compile_text_transform(source_config)
+            return source_key(source_config), source_config
+        except (ValueError, RuntimeError) as e:
+            self.logger.error(
+                f"ERROR: Failed to parse source channel '{origin}': {e}. Skipping this channel."
+            )
+        except Exception as e:
+            self.logger.error(
+                f"ERROR: An unexpected issue occurred while processing '{origin}': {e}. Skipping this channel.",
+                exc_info=True,
+            )
+        return None, None
+
+    def state_path(self, name):
+        """Path of one of this account's files in sessions/, e.g. TELETHON_ACCOUNT_1_session."""
+        return os.path.join(SESSIONS_DIR, f"{self.env_prefix}{name}")
+
+
+async def resolve_target_channel(account, target_channel_config):
+    """
+    Joins (private, by invite hash) and resolves one of the account's target channels
+    and returns its entity. Raises BotFatalError if the target cannot be used.
+    """
+    logger = account.logger
+    client = account.client
+    entity_cache = account.entity_cache
+    target_identifier = target_channel_config.get("id") or target_channel_config.get(
+        "username"
+    )
+    target_channel_name_for_logs = target_channel_config.get("title", target_identifier)
+
+    logger.info(
+        f"Attempting to resolve target channel '{target_channel_name_for_logs}' (ID/Username: {target_identifier})...."
+    )
+
+    if (
+        target_channel_config.get("type") == "private"
+        and target_channel_config.get("invite_hash")
+        and entity_cache.has_joined(target_channel_config["invite_hash"])
+    ):
+        logger.info(
+            f"Target private channel '{target_channel_name_for_logs}' was joined recently (entity cache). Skipping invite import."
+        )
+    elif target_channel_config.get("type") == "private" and target_channel_config.get(
+        "invite_hash"
+    ):
+        invite_hash = target_channel_config["invite_hash"]
+        logger.info(
+            f"Attempting to ensure membership in target private channel '{target_channel_name_for_logs}' using invite hash..."
+        )
+        try:
+            with TRACER.span("startup.join_target"):
+                await client(ImportChatInviteRequest(invite_hash))
+            logger.info(
+                f"Successfully joined or already a member of target channel '{target_channel_name_for_logs}'."
+            )
+            entity_cache.mark_joined(invite_hash)
+        except UserAlreadyParticipantError:
+            logger.info(
+                f"Telethon account is already a participant in target channel '{target_channel_name_for_logs}'."
+            )
+            entity_cache.mark_joined(invite_hash)
+        except InviteHashExpiredError:
+            logger.critical(
+                f"FATAL ERROR: The invite hash '{invite_hash}' for target channel '{target_channel_name_for_logs}' has expired or is invalid. Exiting."
+            )
+            raise BotFatalError(f"Target channel invite hash expired: {invite_hash}")
+        except ChatIdInvalidError:
+            logger.critical(
+                f"FATAL ERROR: The invite hash '{invite_hash}' for target channel '{target_channel_name_for_logs}' corresponds to an invalid chat ID. Exiting."
+            )
+            raise BotFatalError(
+                f"Target channel invite hash invalid chat ID: {invite_hash}"
+            )
+        except Exception as e:
+            logger.critical(
+                f"FATAL ERROR: An unexpected error occurred while attempting to join target channel '{target_channel_name_for_logs}' with invite hash '{invite_hash}': {e}. Exiting.",
+                exc_info=True,
+            )
+            raise BotFatalError(f"Error joining target channel with invite hash: {e}")
+    elif (
+        target_channel_config.get("type") == "private"
+        and not target_channel_config.get("invite_hash")
+        and target_channel_config.get("id")
+    ):
+        logger.info(
+            f"Target private channel '{target_channel_name_for_logs}' configured with ID only. Assuming account is already a member. Proceeding to get entity."
+        )
+    else:
+        logger.info(
+            f"Target channel '{target_channel_name_for_logs}' is configured as public or has no specific type/invite hash. Proceeding to get entity."
+        )
+
+    try:
+        with TRACER.span("startup.resolve_target"):
+            target_channel_entity = await entity_cache.get_entity(
+                client, target_identifier
+            )
+        logger.info(
+            f"Target channel resolved: {target_channel_entity.title} ({target_identifier})"
+        )
+    except ChannelPrivateError:
+        logger.critical(
+            f"FATAL ERROR: Target channel '{target_channel_name_for_logs}' (ID: {target_identifier}) is private and could not be accessed. Your account must be a member or the invite_hash was incorrect (if applicable). Exiting."
+        )
+        raise BotFatalError(
+            f"Target channel is private and inaccessible: {target_identifier}"
+        )
+    except UserNotParticipantError:
+        logger.critical(
+            f"FATAL ERROR: Your account is not a participant in target channel '{target_channel_name_for_logs}' (ID: {target_identifier}). Please join it first or provide a valid invite_hash if it's private. Exiting."
+        )
+        raise BotFatalError(f"Not a participant in target channel: {target_identifier}")
+    except Exception as e:
+        logger.critical(
+            f"FATAL ERROR: Could not resolve target channel '{target_channel_name_for_logs}' (ID: {target_identifier}). Please check the username/ID and ensure your account can access it: {e}",
+            exc_info=True,
+        )
+        raise BotFatalError(f"Could not resolve target channel: {e}")
+    return target_channel_entity
+
+
+async def run_account(account, login_lock):
+    logger = account.logger
+    client = account.client
+    entity_cache = account.entity_cache
+    logger.info(f"Starting {account.title}...")
+
+    try:
+        logger.info("Connecting Telethon client...")
+        # One login at a time, so interactive code/2FA prompts of different accounts
+        # do not interleave on the console.
+        async with login_lock:
+            with TRACER.span("startup.connect"):
+                await client.start(phone=account.phone_number)
+        logger.info("Telethon client started successfully.")
+        await notify_telegram(
+            client, f"🚀 {account.title} started successfully!", account.env_prefix
+        )
+    except SessionPasswordNeededError:
+        logger.critical(
+            "FATAL ERROR: Two-factor authentication (2FA) is enabled for your account. Please run the script manually once to log in and enter your 2FA password. The script will then save the session, and subsequent runs should work automatically. Exiting."
+        )
+        raise BotFatalError("2FA enabled, manual login required.")
+    except AuthKeyError as e:
+        logger.critical(
+            f"FATAL ERROR: Authentication failed. Please check your API ID, API Hash, and Phone Number in .env. If you recently revoked your session, you might need to delete the 'sessions' folder and try again. Error: {e}. Exiting.",
+            exc_info=True,
+        )
+        raise BotFatalError(f"Authentication failed: {e}")
+    except RPCError as e:
+        logger.critical(
+            f"FATAL ERROR: A Telegram RPC error occurred during client startup: {e}. Exiting.",
+            exc_info=True,
+        )
+        raise BotFatalError(f"Telegram RPC error during startup: {e}")
+    except Exception as e:
+        logger.critical(
+            f"FATAL ERROR: An unexpected error occurred during client startup: {e}. Exiting.",
+            exc_info=True,
+        )
+        raise BotFatalError(f"Unexpected error during client startup: {e}")
+
+    if not await client.is_user_authorized():
+        logger.critical(
+            "FATAL ERROR: Telethon client is not authorized. Please run the script manually once to complete the login process (enter phone number, code, and 2FA if applicable). Exiting."
+        )
+        raise BotFatalError("Telethon client not authorized, manual login required.")
+
+    # Resolve every target, joining private ones by invite hash where needed.
+    for target_channel_config in account.target_channel_configs.values():
+        target_channel_config["entity"] = await resolve_target_channel(
+            account, target_channel_config
+        )
+
+    logger.info(
+        f"Resolving {len(account.source_channel_configs)} source channel(s) with up to {SOURCE_RESOLVE_CONCURRENCY} in parallel..."
+    )
+    with TRACER.span("startup.resolve_sources"):
+        source_channel_entities = await resolve_source_channels(
+            client,
+            account.source_channel_configs,
+            concurrency=SOURCE_RESOLVE_CONCURRENCY,
+            max_flood_wait=MAX_FLOOD_WAIT_SECONDS,
+            entity_cache=entity_cache,
+        )
+    entity_cache.save()
+    logger.info(f"Entity cache after startup: {entity_cache.stats_summary()}")
+
+    if not source_channel_entities:
+        logger.critical(
+            "FATAL ERROR: No valid source channels could be resolved. The bot has nothing to forward from. Exiting."
+        )
+        raise BotFatalError("No valid source channels could be resolved.")
+
+    # Index the resolved sources by their numeric peer id so the handler can find a
+    # message's source configuration with a single dict lookup.
+    source_routing_table = build_routing_table(source_channel_entities)
+    # The resolved entity of every source, by what identifies it in the config, so a
+    # configuration reload only resolves the sources that are new.
+    resolved_by_key = {
+        source_key(source_config): entity
+        for entity, source_config in source_channel_entities
+    }
+
+    # The targets (and forward/copy mode) each source fans out to.
+    route_table = build_route_table(source_routing_table, account.target_channel_configs)
+
+    # The metric series of each source's routes (in route_table order), looked up once
+    # here so recording on the hot path is only a lookup and an in-place increment.
+    account_label = account.env_prefix.rstrip("_")
+    target_labels = {
+        number: "{} ({})".format(
+            target_config.get("title", target_config["entity"].title),
+            utils.get_peer_id(target_config["entity"]),
+        )
+        for number, target_config in account.target_channel_configs.items()
+    }
+
+    def build_route_metrics(source_routing_table, route_table):
+        return {
+            chat_id: [
+                {
+                    "latency": FORWARD_LATENCY.labels(
+                        account_label, target_labels[route.number]
+                    ),
+                    **{
+                        counter: family.labels(
+                            account_label,
+                            "{} ({})".format(
+                                source_routing_table[chat_id].get(
+                                    "title", "Unknown Channel"
+                                ),
+                                chat_id,
+                            ),
+                            target_labels[route.number],
+                        )
+                        for counter, family in (
+                            ("received", MESSAGES_RECEIVED),
+                            ("deduped", MESSAGES_DEDUPED),
+                            ("filtered", MESSAGES_FILTERED),
+                            ("forwarded", MESSAGES_FORWARDED),
+                            ("copied", MESSAGES_COPIED),
+                            ("failed", MESSAGES_FAILED),
+                        )
+                    },
+                }
+                for route in routes
+            ]
+            for chat_id, routes in route_table.items()
+        }
+
+    route_metrics = build_route_metrics(source_routing_table, route_table)
+
+    # Paces sends per destination and retries them after FloodWait.
+    send_scheduler = SendScheduler(
+        rate=SEND_RATE_PER_SECOND,
+        burst=SEND_BURST,
+        max_rate=MAX_SEND_RATE_PER_SECOND,
+        max_flood_wait=MAX_FLOOD_WAIT_SECONDS,
+    )
+
+    # Copies media by file reference, re-uploading only when refused (once per fan-out).
+    media_copier = MediaCopier(client, max_parts_in_flight=MEDIA_UPLOAD_PARTS_IN_FLIGHT)
+    account.components.update(send_scheduler=send_scheduler, media_copier=media_copier)
+
+    # Every received message is logged here before it is queued and marked once it
+    # has been handled, so messages lost to a crash are replayed on the next start.
+    outbox = Outbox(
+        account.state_path("outbox.sqlite"),
+        commit_interval=OUTBOX_COMMIT_INTERVAL_SECONDS,
+        retention_seconds=OUTBOX_RETENTION_HOURS * 3600,
+    )
+    outbox.start()
+    account.components["outbox"] = outbox
+
+    # Drops reposts of content already forwarded from any source within the TTL.
+    dedup_index = None
+    if DEDUP_ENABLED:
+        dedup_index = DedupIndex(
+            account.state_path("dedup.sqlite"),
+            ttl_seconds=DEDUP_TTL_HOURS * 3600,
+            memory_entries=DEDUP_MEMORY_ENTRIES,
+        )
+        asyncio.create_task(
+            dedup_index.log_stats_periodically(FORWARD_QUEUE_STATS_INTERVAL_SECONDS)
+        )
+        account.components["dedup"] = dedup_index
+
+    def discard_dedup_claims(job):
+        """Releases the dedup claims of a job's messages that were not sent anywhere."""
+        if dedup_index is None or not job.messages:
+            return
+        for message in job.messages:
+            dedup_key = content_key(message, DEDUP_MIN_TEXT_LENGTH)
+            if dedup_key is not None:
+                dedup_index.discard(dedup_key)
+
+    async def process_forward_job(job):
+        # A job that raises stays pending in the outbox and is tried again on the next start.
+        try:
+            with TRACER.span("forward.job"):
+                state = await forward_job(job)
+        finally:
+            # Content that was filtered out or not delivered may be forwarded again later.
+            discard_dedup_claims(job)
+        outbox.mark(job.chat_id, job.message_ids, state)
+        return state != STATE_FAILED
+
+    async def forward_job(job):
+        """Forwards one job and returns the outbox state it ends in."""
+        source_channel_config = source_routing_table.get(job.chat_id)
+        if not source_channel_config:
+            logger.warning(
+                f"Could not find configuration for source channel {job.chat_id}. Dropping queued job."
+            )
+            return STATE_SKIPPED
+        # Read together with the config, before any await, so that a configuration
+        # reload swapping the tables meanwhile cannot leave the job half old, half new.
+        routes = route_table[job.chat_id]
+        metrics = route_metrics[job.chat_id]
+        if job.messages is None:
+            # Jobs read back from the spill file only carry ids; fetch the messages again.
+            with TRACER.span("forward.fetch"):
+                fetched = await send_scheduler.send(
+                    job.chat_id,
+                    lambda: client.get_messages(job.chat_id, ids=job.message_ids),
+                    "message fetch",
+                )
+            job.messages = [m for m in fetched if m is not None]
+            if not job.messages:
+                logger.warning(
+                    f"Messages {job.message_ids} from source channel {job.chat_id} no longer exist. Skipping."
+                )
+                return STATE_SKIPPED
+        # The content filter drops messages or narrows the targets they go to.
+        content_filter = source_channel_config.get("content_filter")
+        if content_filter is None:
+            parts = [(None, job.messages)]
+        else:
+            with TRACER.span("forward.filter"):
+                parts = content_filter.split(job.messages)
+            delivered = {route.number: 0 for route in routes}
+            for targets, messages in parts:
+                for number in targets:
+                    delivered[number] += len(messages)
+            for route, route_metric in zip(routes, metrics):
+                if delivered[route.number] < len(job.messages):
+                    route_metric["filtered"].inc(
+                        len(job.messages) - delivered[route.number]
+                    )
+            if not parts:
+                logger.info(
+                    "Messages %s from '%s' were dropped by the content filter.",
+                    job.message_ids,
+                    source_channel_config.get("title", "Unknown Channel"),
+                )
+                return STATE_SKIPPED
+
+        all_sent = True
+        for targets, messages in parts:
+            selected = [
+                (route, route_metric)
+                for route, route_metric in zip(routes, metrics)
+                if targets is None or route.number in targets
+            ]
+            with TRACER.span("forward.send"):
+                results = await send_to_targets(
+                    client,
+                    messages,
+                    source_channel_config,
+                    [route for route, _ in selected],
+                    scheduler=send_scheduler,
+                    media_copier=media_copier,
+                )
+            if dedup_index is not None and any(results):
+                for message in messages:
+                    dedup_key = content_key(message, DEDUP_MIN_TEXT_LENGTH)
+                    if dedup_key is not None:
+                        dedup_index.add(dedup_key)
+            now = time.time()
+            for (route, route_metric), sent in zip(selected, results):
+                if not sent:
+                    route_metric["failed"].inc(len(messages))
+                    continue
+                route_metric["copied" if route.mode == MODE_COPY else "forwarded"].inc(
+                    len(messages)
+                )
+                for message in messages:
+                    if message.date is not None:
+                        route_metric["latency"].observe(now - message.date.timestamp())
+            all_sent = all_sent and all(results)
+        # A job that reached only some of its targets is not retried, so that the
+        # others do not receive it twice.
+        return STATE_SENT if all_sent else STATE_FAILED
+
+    # The handler only enqueues work; forwarding happens on these background workers,
+    # so one slow upload does not hold up Telethon's update dispatch.
+    try:
+        forward_queue = ForwardQueue(
+            process_forward_job,
+            workers=FORWARD_WORKERS,
+            max_depth=FORWARD_QUEUE_MAX_DEPTH,
+            policy=FORWARD_QUEUE_POLICY,
+            spill_path=account.state_path("forward_spill.jsonl"),
+            on_drop=discard_dedup_claims,
+            # Every spilled job is also pending in the outbox, which replays it below;
+            # replaying the spill file as well would send those messages twice.
+            replay_spill=False,
+        )
+    except ValueError as e:
+        logger.critical(f"FATAL ERROR: Invalid forward queue configuration: {e}. Exiting.")
+        raise BotFatalError(f"Invalid forward queue configuration: {e}")
+    forward_queue.start()
+    account.components["forward_queue"] = forward_queue
+    QUEUE_DEPTH.labels(account_label).set_function(lambda: forward_queue.depth)
+    FLOOD_WAIT_SECONDS.labels(account_label).set_function(
+        lambda: send_scheduler.stats["flood_wait_seconds"]
+    )
+
+    replay_jobs = build_replay_jobs(outbox.pending(), source_routing_table)
+    if replay_jobs:
+        logger.info(
+            f"Replaying {sum(len(job.message_ids) for job in replay_jobs)} message(s) left unacknowledged in the outbox by a previous run..."
+        )
+
+        async def replay_outbox():
+            for job in replay_jobs:
+                await forward_queue.put(job)
+
+        # In the background, so a full queue does not delay registering the handler.
+        asyncio.create_task(replay_outbox())
+
+    asyncio.create_task(
+        forward_queue.log_stats_periodically(FORWARD_QUEUE_STATS_INTERVAL_SECONDS)
+    )
+    asyncio.create_task(
+        send_scheduler.log_stats_periodically(FORWARD_QUEUE_STATS_INTERVAL_SECONDS)
+    )
+    asyncio.create_task(
+        outbox.log_stats_periodically(FORWARD_QUEUE_STATS_INTERVAL_SECONDS)
+    )
+
+    trace_recorder = None
+    if TRACE_RECORDING_ENABLED:
+        trace_recorder = TraceRecorder(
+            account.state_path("trace.jsonl"), source_routing_table
+        )
+        account.components["trace"] = trace_recorder
+        asyncio.create_task(trace_recorder.flush_periodically())
+        logger.info(f"Recording a traffic trace to {trace_recorder.path}.")
+
+        # Edits are not forwarded, but they are part of the traffic mix worth replaying.
+        @client.on(
+            events.MessageEdited(func=lambda event: event.chat_id in source_routing_table)
+        )
+        async def edit_recorder(event):
+            trace_recorder.record(event.chat_id, event.message, KIND_EDIT)
+
+    async def flush_batch(key, batch_messages):
+        chat_id = key[0]
+        await forward_queue.put(ForwardJob(chat_id, batch_messages))
+
+    album_batcher = MessageBatcher(
+        flush_batch, window=ALBUM_WINDOW_SECONDS, max_size=MAX_ALBUM_SIZE
+    )
+
+    # Coalescing mode: bursts from a source without copy routes are collected for a short
+    # window and forwarded with one multi-id ForwardMessagesRequest.
+    forward_coalescer = None
+    if FORWARD_COALESCE_WINDOW_SECONDS > 0:
+        forward_coalescer = MessageBatcher(
+            flush_batch,
+            window=FORWARD_COALESCE_WINDOW_SECONDS,
+            max_size=FORWARD_COALESCE_MAX_MESSAGES,
+        )
+        logger.info(
+            f"Forward coalescing enabled: up to {FORWARD_COALESCE_MAX_MESSAGES} messages per source within {FORWARD_COALESCE_WINDOW_SECONDS}s."
+        )
+
+    # The chats are matched against the current routing table rather than a fixed list,
+    # so swapping in a reloaded table also swaps the filter, with no gap in between.
+    @client.on(events.NewMessage(func=lambda event: event.chat_id in source_routing_table))
+    async def handler(event):
+        with TRACER.span("handler.route"):
+            chat = event.chat
+            source_channel_config = source_routing_table.get(event.chat_id)
+
+        # Gracefully handle events with no chat object.
+        if not chat:
+            logger.warning(
+                "Received a message event with no associated chat object. Skipping."
+            )
+            return
+
+        if not source_channel_config:
+            logger.warning(
+                f"Could not find configuration for source channel {event.chat_id}. Skipping."
+            )
+            return
+
+        if trace_recorder is not None:
+            trace_recorder.record(event.chat_id, event.message)
+
+        # Sources still catching up after downtime get their live messages afterwards.
+        if backfiller is not None and backfiller.hold(event.chat_id, event.message):
+            return
+
+        await dispatch(event.chat_id, event.message)
+
+    async def dispatch(chat_id, message):
+        """Dedups, records and queues one message from a configured source."""
+        source_channel_config = source_routing_table.get(chat_id)
+        if source_channel_config is None:
+            return  # The source was removed by a configuration reload.
+        metrics = route_metrics[chat_id]
+        for route in metrics:
+            route["received"].inc()
+
+        if dedup_index is not None:
+            with TRACER.span("dispatch.dedup"):
+                dedup_key = content_key(message, DEDUP_MIN_TEXT_LENGTH)
+                duplicate = dedup_key is not None and dedup_index.claim(dedup_key)
+            if duplicate:
+                for route in metrics:
+                    route["deduped"].inc()
+                logger.info(
+                    "Message %s from '%s' duplicates content forwarded recently. Skipping.",
+                    message.id,
+                    source_channel_config.get("title", "Unknown Channel"),
+                )
+                return
+
+        # Buffered only; the outbox commits it in the background, ahead of its mark.
+        with TRACER.span("dispatch.outbox_record"):
+            outbox.record(chat_id, [message])
+
+        # Forwarded ids keep their album grouping, so with coalescing enabled albums
+        # from sources that only forward simply join the source's burst.
+        if forward_coalescer is not None and not copies(source_channel_config):
+            forward_coalescer.add((chat_id,), message)
+            return
+
+        # Messages of an album share a grouped_id; hold them briefly so the whole
+        # album goes out in one request instead of one request per item.
+        if message.grouped_id:
+            album_batcher.add((chat_id, message.grouped_id), message)
+            return
+
+        with TRACER.span("dispatch.enqueue"):
+            await forward_queue.put(ForwardJob(chat_id, [message]))
+
+    # Messages posted while the bot was down are fetched from each source's history,
+    # starting after the last message id the outbox recorded for it.
+    backfiller = None
+    if BACKFILL_ENABLED:
+        watermarks = {
+            chat_id: last_id
+            for chat_id, last_id in outbox.watermarks().items()
+            if chat_id in source_routing_table
+        }
+        if watermarks:
+            backfiller = Backfiller(
+                client,
+                watermarks,
+                dispatch,
+                concurrency=BACKFILL_CONCURRENCY,
+                max_messages=BACKFILL_MAX_MESSAGES,
+                max_flood_wait=MAX_FLOOD_WAIT_SECONDS,
+            )
+            logger.info(
+                f"Backfilling messages missed while offline from {len(watermarks)} source(s), up to {BACKFILL_CONCURRENCY} in parallel..."
+            )
+            asyncio.create_task(backfiller.run())
+            account.components["backfill"] = backfiller
+
+    reload_lock = asyncio.Lock()
+
+    async def reload_sources():
+        """
+        Re-reads the source channel configs, resolves only the sources that are new and
+        swaps in the new routing tables. The handler keeps running throughout.
+        """
+        nonlocal source_routing_table, route_table, route_metrics, resolved_by_key
+        async with reload_lock:
+            source_configs = account.load_source_channel_configs()
+            if not source_configs:
+                logger.error(
+                    "ERROR: The reloaded configuration has no valid source channels. Keeping the current ones."
+                )
+                return
+            kept, added, removed = diff_sources(resolved_by_key, source_configs)
+            newly_resolved = []
+            if added:
+                logger.info(f"Resolving {len(added)} new source channel(s)...")
+                newly_resolved = await resolve_source_channels(
+                    client,
+                    added,
+                    concurrency=SOURCE_RESOLVE_CONCURRENCY,
+                    max_flood_wait=MAX_FLOOD_WAIT_SECONDS,
+                    entity_cache=entity_cache,
+                )
+                entity_cache.save()
+            resolved = kept + newly_resolved
+            new_source_routing_table = build_routing_table(resolved)
+            new_route_table = build_route_table(
+                new_source_routing_table, account.target_channel_configs
+            )
+            new_route_metrics = build_route_metrics(
+                new_source_routing_table, new_route_table
+            )
+            # Swapped together without an await in between, so every event and job
+            # sees either the old routing or the new one.
+            source_routing_table = new_source_routing_table
+            route_table = new_route_table
+            route_metrics = new_route_metrics
+            resolved_by_key = {
+                source_key(source_config): entity for entity, source_config in resolved
+            }
+            if trace_recorder is not None:
+                trace_recorder.add_sources(source_routing_table)
+            account.source_channel_configs = source_configs
+            logger.info(
+                f"Configuration reloaded: {len(newly_resolved)} source(s) added, {len(removed)} removed, "
+                f"{len(kept)} kept, {len(added) - len(newly_resolved)} could not be resolved. "
+                f"Now forwarding from {len(source_routing_table)} source channel(s)."
+            )
+
+    account.reload_sources = reload_sources
+
+    logger.info(
+        "Bot is now listening for new messages in configured source channels..."
+    )
+    logger.info(
+        "Forwarding messages to: "
+        + ", ".join(
+            f"'{target_config['entity'].title}' (ID: {target_config['entity'].id})"
+            for target_config in account.target_channel_configs.values()
+        )
+    )
+
+    try:
+        await client.run_until_disconnected()
+    finally:
+        await outbox.stop()
+        if dedup_index is not None:
+            dedup_index.close()
+        if trace_recorder is not None:
+            trace_recorder.close()
+
+
+def log_stage_breakdown():
+    if not TRACER.enabled:
+        logger.info(
+            "Stage timings were requested, but tracing is disabled. Set tracing_enabled in proj_config.json to collect them."
+        )
+        return
+    logger.info(f"Stage timings (most recent spans per stage):\n{STAGE_STATS.summary()}")
+
+
+def watched_configuration_files():
+    """.env and the accounts' source channel files, for watch_for_changes()."""
+    return [ENV_RELOADER] + [
+        account.source_channel_file
+        for account in ACCOUNTS
+        if account.source_channel_file is not None
+    ]
+
+
+async def reload_configuration():
+    """Re-reads .env and reloads the source channels of every running account."""
+    changed = ENV_RELOADER.load()
+    logger.info(
+        f"Reloading the source channel configuration ({len(changed)} variable(s) changed in .env)..."
+    )
+    for account in ACCOUNTS:
+        if account.reload_sources is None:
+            continue  # Still starting up; it reads the current configuration anyway.
+        try:
+            await account.reload_sources()
+        except Exception as e:
+            account.logger.error(
+                f"ERROR: Reloading the source channels failed: {e}. Keeping the current ones.",
+                exc_info=True,
+            )
+
+
+async def main(env_prefixes=None, status_file=None, metrics_port=METRICS_HTTP_PORT):
+    """
+    Runs every configured account (or only those whose env_prefix is listed in
+    `env_prefixes`) in this one event loop. An account that fails to load or start is
+    logged and skipped; the others keep running. With `status_file` (set by the
+    supervisor), the accounts' stats are written there periodically as a heartbeat.
+    With a non-zero `metrics_port`, the metrics are served over HTTP on that port.
+    """
+    account_configs = [
+        account_config
+        for account_config in ACCOUNT_CONFIGS
+        if not env_prefixes or account_config.get("env_prefix") in env_prefixes
+    ]
+    for account_config in account_configs:
+        try:
+            ACCOUNTS.append(ForwarderAccount(account_config))
+        except BotFatalError as e:
+            logger.critical(
+                f"FATAL ERROR: Account '{account_config.get('env_prefix')}' could not be loaded ({e}). Skipping it."
+            )
+    if not ACCOUNTS:
+        raise BotFatalError("No account could be loaded.")
+
+    logger.info(
+        f"Starting {BOT_TITLE} with {len(ACCOUNTS)} account(s): {', '.join(a.title for a in ACCOUNTS)}"
+    )
+    if metrics_port:
+        try:
+            await start_metrics_server(METRICS, METRICS_HTTP_HOST, metrics_port)
+        except OSError as e:
+            logger.error(
+                f"ERROR: Could not start the metrics exporter on {METRICS_HTTP_HOST}:{metrics_port}: {e}. Continuing without it."
+            )
+    if status_file:
+        asyncio.create_task(
+            write_status_periodically(
+                status_file, ACCOUNTS, SUPERVISOR_STATUS_INTERVAL_SECONDS
+            )
+        )
+    # SIGTERM (sent by the supervisor) disconnects the clients, so every account
+    # shuts down through its normal path and flushes its outbox and dedup store.
+    try:
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGTERM,
+            lambda: [asyncio.create_task(a.client.disconnect()) for a in ACCOUNTS],
+        )
+    except (NotImplementedError, RuntimeError):
+        pass  # Not available on Windows.
+    # SIGUSR1 logs how long each pipeline and startup stage has been taking.
+    if hasattr(signal, "SIGUSR1"):
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGUSR1, log_stage_breakdown
+        )
+    # SIGHUP (or, with polling enabled, saving .env or a source channel file) adds and
+    # removes source channels without restarting.
+    if hasattr(signal, "SIGHUP"):
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGHUP, lambda: asyncio.create_task(reload_configuration())
+        )
+    if CONFIG_RELOAD_INTERVAL_SECONDS:
+        asyncio.create_task(
+            watch_for_changes(
+                watched_configuration_files,
+                CONFIG_RELOAD_INTERVAL_SECONDS,
+                reload_configuration,
+            )
+        )
+    login_lock = asyncio.Lock()
+    results = await asyncio.gather(
+        *(run_account(account, login_lock) for account in ACCOUNTS),
+        return_exceptions=True,
+    )
+    for account, result in zip(ACCOUNTS, results):
+        if isinstance(result, BotFatalError):
+            account.logger.critical(
+                f"Account stopped due to a fatal configuration or startup error: {result}"
+            )
+        elif isinstance(result, Exception):
+            account.logger.critical(
+                f"CRITICAL APPLICATION ERROR: Account stopped with an unhandled exception: {result}",
+                exc_info=result,
+            )
+    if all(isinstance(result, Exception) for result in results):
+        raise BotFatalError("Every account has stopped.")
+
+
+async def supervise():
+    """
+    Supervisor mode: shards the configured accounts over worker processes (one per CPU
+    core by default), each running this script for its share of the accounts, and
+    restarts workers that crash or hang.
+    """
+    processes = SUPERVISOR_PROCESSES or os.cpu_count() or 1
+    os.makedirs(SESSIONS_DIR, exist_ok=True)
+    shards = [
+        Shard(
+            index,
+            [account_config.get("env_prefix") for account_config in shard_configs],
+            os.path.join(SESSIONS_DIR, f"supervisor_shard_{index}.json"),
+            # Every worker serves its own metrics, on consecutive ports.
+            ["--metrics-port", str(METRICS_HTTP_PORT + index)]
+            if METRICS_HTTP_PORT
+            else [],
+        )
+        for index, shard_configs in enumerate(shard_accounts(ACCOUNT_CONFIGS, processes))
+    ]
+    supervisor = Supervisor(
+        os.path.abspath(__file__),
+        shards,
+        status_interval=SUPERVISOR_STATUS_INTERVAL_SECONDS,
+        health_timeout=SUPERVISOR_HEALTH_TIMEOUT_SECONDS,
+        stats_interval=FORWARD_QUEUE_STATS_INTERVAL_SECONDS,
+    )
+    await supervisor.run()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=BOT_TITLE)
+    arg_parser.add_argument(
+        "env_prefixes",
+        nargs="*",
+        help="Only run the accounts with these env prefixes (default: all accounts in proj_config.json).",
+    )
+    arg_parser.add_argument(
+        "--supervisor",
+        action="store_true",
+        help="Shard the accounts over worker processes and restart them if they crash or hang.",
+    )
+    arg_parser.add_argument(
+        "--status-file", help="Write periodic status for the supervisor to this file."
+    )
+    arg_parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=METRICS_HTTP_PORT,
+        help="Serve metrics at http://<metrics_http_host>:<port>/metrics (0 disables; default: metrics_http_port).",
+    )
+    args = arg_parser.parse_args()
+    exit_code = 0
+    try:
+        try:
+            event_loop_name = install_event_loop_policy(EVENT_LOOP)
+        except ValueError as e:
+            raise BotFatalError(f"Invalid event_loop setting: {e}")
+        logger.info(f"Using the {event_loop_name} event loop.")
+        if args.supervisor:
+            asyncio.run(supervise())
+        else:
+            asyncio.run(main(args.env_prefixes, args.status_file, args.metrics_port))
+    except BotFatalError as e:
+        exit_code = 1
+        logger.critical(
+            f"Bot stopped due to a fatal configuration or startup error: {e}"
+        )
+    except KeyboardInterrupt:
+        logger.info("Interrupted. Shutting down.")
+    except Exception as e:
+        exit_code = 1
+        logger.critical(
+            f"CRITICAL APPLICATION ERROR: Telethon bot encountered an unhandled exception during main execution: {e}",
+            exc_info=True,
+        )
+    finally:
+        for account in ACCOUNTS:
+            client = account.client
+            if client and client.is_connected():
+                account.logger.info("Final cleanup: Disconnecting Telethon client.")
+                try:
+                    asyncio.run(
+                        notify_telegram(
+                            client, f"🛑 {account.title} has stopped.", account.env_prefix
+                        )
+                    )
+                    asyncio.run(client.disconnect())
+                except RuntimeError as e:
+                    account.logger.error(
+                        f"Error during final async cleanup (event loop issue): {e}"
+                    )
+                except Exception as e:
+                    account.logger.error(f"Error during final async cleanup: {e}")
+            else:
+                account.logger.info(
+                    "Client was not connected or already disconnected during final cleanup."
+                )
+    sys.exit(exit_code)